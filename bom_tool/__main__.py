@@ -0,0 +1,12 @@
+# __main__.py
+# python -m bom_tool ... でコマンドラインの一括変換 (cli.py) を実行する
+import os
+import sys
+
+# 各モジュールは bom_tool フォルダ内で互いに直接インポートしているので、このフォルダを検索パスに加える
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,201 @@
 # app.py
-from flask import Flask, request, jsonify, render_template
-import openpyxl
+from flask import Flask, Response, request, jsonify, render_template, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+import os
 import json
-import io
-import traceback
-import xlrd 
+import time
+import logging
+import tempfile
+from urllib.parse import quote
 
 # --- 自作モジュールをインポート ---
-from file_parsers import (
-    parse_single_excel_sheet_rich_text,
-    parse_csv_or_txt,
-    parse_pdf,
-    parse_single_excel_sheet_xls
-)
-from bom_processor import (
-    extract_flat_list_from_rows,
-    group_and_finalize_bom
+from file_parsers import parse_page_range
+from pipeline import ProcessingError, process_file, result_cache
+from batch import process_batch
+from jobs import JobManager, JobQueueFull
+from upload_store import UploadStore
+from workbook_info import list_sheets
+from file_source import FileSource
+from result_store import ResultStore
+from revisions import Revision, TRACK_REVISIONS
+from exporter import select_tab, iter_csv_chunks, write_xlsx
+from response_codec import encode_compact, dumps, supported_encodings, compress
+from result_pages import summarize_result, build_tab_index, PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+from metrics import (
+    registry as metrics_registry,
+    start_request,
+    request_timings,
+    server_timing_header,
+    stage,
+    REQUESTS,
+    REQUEST_SECONDS,
+    ERRORS
 )
+from log_config import configure_logging
 
 # Flaskアプリケーションを作成
 app = Flask(__name__)
 
+# ログの出力レベルと形式 (BOM_LOG_LEVEL / BOM_LOG_FORMAT で設定)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# BOM_MAX_UPLOAD_BYTES: 1リクエストで受け付けるアップロードの上限 (超えたら 413。ワーカーのメモリ/ディスクを守る)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('BOM_MAX_UPLOAD_BYTES', str(256 * 1024 * 1024)))
+
+# --- バックグラウンドの処理ジョブ ---
+# BOM_JOB_WORKERS: 同時に処理するジョブ数, BOM_JOB_TTL: 終わったジョブの結果を保持する秒数
+# BOM_JOB_MAX_PENDING: 待たせておけるジョブ数の上限 (超えたら 503)
+job_manager = JobManager(
+    max_workers=int(os.environ.get('BOM_JOB_WORKERS', '2')),
+    ttl_seconds=int(os.environ.get('BOM_JOB_TTL', '600')),
+    max_pending=int(os.environ.get('BOM_JOB_MAX_PENDING', '32')),
+)
+
+# --- アップロード済みファイルの保管 (/sheets で受け取ったファイルを /process で再利用する) ---
+# BOM_UPLOAD_TTL: 最後に使われてから保持する秒数, BOM_UPLOAD_MAX_BYTES: 保持するファイルの合計サイズの上限
+upload_store = UploadStore(
+    ttl_seconds=int(os.environ.get('BOM_UPLOAD_TTL', '1800')),
+    max_bytes=int(os.environ.get('BOM_UPLOAD_MAX_BYTES', str(1024 * 1024 * 1024))),
+)
+
+# --- 処理結果の保管 (結果IDでエクスポートする) ---
+# BOM_RESULT_TTL: 最後に使われてから保持する秒数, BOM_RESULT_MAX_ENTRIES: 保持する結果の数の上限
+result_store = ResultStore(
+    ttl_seconds=int(os.environ.get('BOM_RESULT_TTL', '1800')),
+    max_entries=int(os.environ.get('BOM_RESULT_MAX_ENTRIES', '32')),
+)
+
+def _store_result(result, revision=None):
+    # 結果をサーバー側に残し、エクスポート用の結果IDを添えて返す
+    # 改訂版の処理なら前の版との差分を添え、次の版のために行ごとの結果 (revisions.Revision) を結果と一緒に残す
+    if revision is not None:
+        diff = revision.diff(result)
+        if diff is not None:
+            result["diff"] = diff
+    derived = {'revision': revision} if revision is not None else None
+    result["result_id"] = result_store.put(result, derived)
+    return result
+
+def _wants_compact():
+    # 'format=compact' (クエリまたはフォーム) なら圧縮形式で返す (response_codec.py)
+    return request.values.get('format') == 'compact'
+
+def _encode_result(result):
+    # 'format=summary' ならタブごとの件数だけにする (行と警告は /results/<結果ID>/<タブ> でページごとに取る)
+    response_format = request.values.get('format')
+    if response_format == 'summary':
+        return summarize_result(result)
+    if response_format == 'compact':
+        return encode_compact(result)
+    return result
+
+def _compact_response(payload):
+    """
+    payload を高速な JSON エンコーダでバイト列にし、Accept-Encoding に応じて brotli / gzip で圧縮して返す。
+    """
+    body, encoding = compress(dumps(payload), request.accept_encodings.best_match(supported_encodings()))
+    response = Response(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _read_upload():
+    """
+    'upload_token' (/sheets で保存したファイル) または 'file' から (ファイル名, FileSource) を返す。
+    アップロードは BOM_SPOOL_THRESHOLD を超えると一時ファイルに書き出す (メモリに全体を読み込まない)。
+    返した FileSource は、使い終わったら呼び出し側で close() する。
+    """
+    token = request.form.get('upload_token')
+    if token:
+        upload = upload_store.get(token)
+        if upload is None:
+            raise ProcessingError("アップロードの有効期限が切れました。もう一度ファイルを選択してください。", 410)
+        return upload.filename, upload.source
+
+    if 'file' not in request.files:
+        logger.info("'file' が request.files に見つかりません")
+        raise ProcessingError("ファイルがありません", 400)
+    file = request.files['file']
+    if file.filename == '':
+        logger.info("ファイル名が空です")
+        raise ProcessingError("ファイルが選択されていません", 400)
+    return file.filename, FileSource.from_stream(file.stream, file.filename)
+
+def _read_process_form():
+    """
+    /process と /jobs に共通のフォーム項目を読み、process_file の引数の辞書を返す。
+    options["file_data"] の FileSource は、処理が終わったら close() する。
+    'previous_result_id' (同じBOMの前の版の結果ID) があれば、options["revision"] に前の版の情報を持つ revisions.Revision を入れる。
+    'track_revisions' が 'true' (または BOM_TRACK_REVISIONS が 1) なら、前の版が無くても次の版のために入れる。
+    """
+    original_filename, source = _read_upload()
+    logger.info("ファイルの処理を開始します", extra={"upload": original_filename})
+    filename = original_filename.lower()
+    options = {
+        "filename": filename,
+        "file_data": source,
+        "remove_parentheses": request.form.get('remove_parentheses', 'true') == 'true',
+        "selected_sheets": None,
+        "page_ranges": None,
+    }
+    try:
+        if filename.endswith(('.xlsx', '.xls')):
+            options["selected_sheets"] = json.loads(request.form.get('sheets', '[]'))
+        elif filename.endswith('.pdf'):
+            # 任意のページ範囲 (例: "2-10,12") で表紙や注記ページを読み飛ばせる
+            try:
+                options["page_ranges"] = parse_page_range(request.form.get('pages', ''))
+            except ValueError as e:
+                raise ProcessingError(str(e), 400)
+
+        previous_result_id = request.form.get('previous_result_id')
+        if previous_result_id:
+            previous_result = result_store.get(previous_result_id)
+            if previous_result is None:
+                raise ProcessingError("前の版の結果の有効期限が切れました。前の版をもう一度処理してください。", 410)
+            previous = result_store.get_derived(previous_result_id, 'revision', lambda result: None)
+            options["revision"] = Revision(previous, previous_result_id, previous_result)
+        elif TRACK_REVISIONS or request.form.get('track_revisions') == 'true':
+            options["revision"] = Revision()
+    except Exception:
+        source.close()
+        raise
+    return options
+
+@app.before_request
+def begin_request_metrics():
+    # このリクエストの段階別の時間を記録し始める (after_request で Server-Timing ヘッダーにする)
+    request.environ['bom.start_time'] = time.perf_counter()
+    start_request()
+
+@app.before_request
+def reject_large_upload():
+    # 本体を読み始める前に Content-Length で断る (各エンドポイントの except で 500 にされないように)
+    limit = app.config['MAX_CONTENT_LENGTH']
+    if request.content_length is not None and request.content_length > limit:
+        raise RequestEntityTooLarge()
+
+@app.after_request
+def finish_request_metrics(response):
+    start_time = request.environ.get('bom.start_time')
+    if start_time is None:
+        return response
+    elapsed = time.perf_counter() - start_time
+    endpoint = request.url_rule.rule if request.url_rule else "unknown"
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    if response.status_code >= 400:
+        ERRORS.inc(endpoint=endpoint, status=response.status_code)
+    response.headers['Server-Timing'] = server_timing_header(request_timings() or {}, elapsed)
+    return response
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    limit = app.config['MAX_CONTENT_LENGTH']
+    return jsonify({"error": f"ファイルが大きすぎます。アップロードできるのは {limit:,} バイトまでです。"}), 413
+
 # --- 1. Webページの表示 ---
 @app.route('/')
 def index():
@@ -29,152 +204,205 @@ def index():
 # --- 2. ファイル処理のエンドポイント ---
 @app.route('/process', methods=['POST'])
 def process_file_endpoint():
-    # ... (デバッグログなどはそのまま) ...
-    print("--- [DEBUG] /process エンドポイントが POST メソッドで呼び出されました ---")
-    
-    if 'file' not in request.files: 
-        print("--- [DEBUG] エラー: 'file' が request.files に見つかりません ---")
-        return jsonify({"error": "ファイルがありません"}), 400
+    try:
+        # ファイル本体の代わりに、/sheets が返した upload_token も受け付ける
+        options = _read_process_form()
+        with options["file_data"]:
+            result = _store_result(process_file(**options), options.get("revision"))
+
+        with stage('serialize'):
+            if _wants_compact():
+                return _compact_response(_encode_result(result))
+            return jsonify(_encode_result(result))
         
-    file = request.files['file']
-    
-    if file.filename == '': 
-        print("--- [DEBUG] エラー: ファイル名が空です ---")
-        return jsonify({"error": "ファイルが選択されていません"}), 400
-    
-    print(f"--- [DEBUG] ファイル '{file.filename}' の処理を開始します ---")
-    
-    filename = file.filename.lower()
-    in_memory_file = io.BytesIO(file.read())
-    
+    except ProcessingError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        logger.exception("/process の処理中に予期せぬエラーが発生しました")
+        return jsonify({"error": f"処理中に予期せぬエラーが発生しました: {e}"}), 500
+
+# --- 3. 複数ファイル (zip 可) の一括処理 ---
+@app.route('/process_batch', methods=['POST'])
+def process_batch_endpoint():
+    # 'files' に複数ファイル、または zip を送る (1ファイルの 'file' も受け付ける)
+    files = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+    if not files:
+        return jsonify({"error": "ファイルがありません"}), 400
+
     remove_parentheses = request.form.get('remove_parentheses', 'true') == 'true'
-    
-    all_flat_data = []
-    all_cancellation_warnings = set()
-    individual_results = {}
-    
+    logger.info("一括処理を開始します", extra={"file_count": len(files)})
+
+    uploads = []
     try:
-        if filename.endswith(('.xlsx', '.xls')):
-            selected_sheets_json = request.form.get('sheets', '[]')
-            selected_sheets = json.loads(selected_sheets_json)
-            
-            if not selected_sheets:
-                return jsonify({"error": "処理するシートが選択されていません。"}), 400
-
-            # --- .xlsx (openpyxl) の処理 ---
-            if filename.endswith('.xlsx'):
-                try:
-                    workbook = openpyxl.load_workbook(in_memory_file, rich_text=True)
-                except Exception as e:
-                    print(traceback.format_exc())
-                    return jsonify({"error": f"Excel (.xlsx) ファイルの読み込みに失敗しました。 (エラー: {e})"}), 500
-                
-                for sheet_name in selected_sheets:
-                    if sheet_name not in workbook.sheetnames:
-                        individual_results[sheet_name] = {"error": "指定されたシートが見つかりません。"}
-                        continue
-                    
-                    sheet = workbook[sheet_name]
-                    
-                    data_2d, cancellation_refs = parse_single_excel_sheet_rich_text(sheet)
-                    
-                    flat_list, error, cancellation_warnings_list = extract_flat_list_from_rows(data_2d, cancellation_refs, remove_parentheses)
-                    
-                    # ▼▼▼ 変更 (ここがバグだった) ▼▼▼
-                    if error:
-                        # ヘッダーエラーなどが発生したら、シート処理を中断し、
-                        # 即座に詳細なエラーメッセージを返す
-                        print(f"--- [DEBUG] ヘッダー検出エラー (.xlsx): {error} ---")
-                        return jsonify({"error": error}), 500
-                    # ▲▲▲ 変更ここまで ▲▲▲
-                    else:
-                        final_data, duplicate_warnings = group_and_finalize_bom(flat_list)
-                        total_warnings = duplicate_warnings + cancellation_warnings_list
-                        individual_results[sheet_name] = {"data": final_data, "warnings": total_warnings}
-                        all_flat_data.extend(flat_list)
-                        all_cancellation_warnings.update(cancellation_warnings_list)
-
-            # --- .xls (xlrd) の処理 ---
-            elif filename.endswith('.xls'):
-                in_memory_file.seek(0)
-                file_contents = in_memory_file.read()
-                
-                try:
-                    book = xlrd.open_workbook(file_contents=file_contents, formatting_info=True, on_demand=True)
-                except Exception as e:
-                    print(traceback.format_exc())
-                    return jsonify({"error": f".xlsファイルの読み込みに失敗しました。 (エラー: {e})"}), 500
-                
-                for sheet_name in selected_sheets:
-                    try:
-                        sheet = book.sheet_by_name(sheet_name)
-                    except xlrd.XLRDError:
-                        individual_results[sheet_name] = {"error": "指定されたシートが見つかりません。"}
-                        continue
-                    
-                    data_2d, cancellation_refs = parse_single_excel_sheet_xls(sheet, book)
-
-                    flat_list, error, cancellation_warnings_list = extract_flat_list_from_rows(data_2d, cancellation_refs, remove_parentheses)
-                    
-                    # ▼▼▼ 変更 (ここも同様に修正) ▼▼▼
-                    if error:
-                        print(f"--- [DEBUG] ヘッダー検出エラー (.xls): {error} ---")
-                        return jsonify({"error": error}), 500
-                    # ▲▲▲ 変更ここまで ▲▲▲
-                    else:
-                        final_data, duplicate_warnings = group_and_finalize_bom(flat_list)
-                        total_warnings = duplicate_warnings + cancellation_warnings_list
-                        individual_results[sheet_name] = {"data": final_data, "warnings": total_warnings}
-                        all_flat_data.extend(flat_list)
-                        all_cancellation_warnings.update(cancellation_warnings_list)
-
-        else:
-            # Excel以外のファイル（PDF, CSV, TXT）の処理
-            data_2d, cancellation_refs = [], set()
-            
-            if filename.endswith('.csv'):
-                data_2d = parse_csv_or_txt(in_memory_file, delimiters=[','])
-            elif filename.endswith('.txt'):
-                data_2d = parse_csv_or_txt(in_memory_file, delimiters=['\t', r'\s{2,}'])
-            elif filename.endswith('.pdf'):
-                data_2d = parse_pdf(in_memory_file)
-            else:
-                return jsonify({"error": "対応していないファイル形式です。"}), 400
-
-            if not data_2d: return jsonify({"error": "ファイルからデータを抽出できませんでした。"}), 500
-            
-            flat_list, error, cancellation_warnings_list = extract_flat_list_from_rows(data_2d, cancellation_refs, remove_parentheses)
-            
-            # (CSVなどは元からこのロジックだった)
-            if error: 
-                print(f"--- [DEBUG] ヘッダー検出エラー (CSV/PDF/TXT): {error} ---")
-                return jsonify({"error": error}), 500
-            
-            all_flat_data.extend(flat_list)
-            all_cancellation_warnings.update(cancellation_warnings_list)
-            individual_results = {}
-
-        # 最終集計
-        combined_data, combined_duplicate_warnings = group_and_finalize_bom(all_flat_data)
-        combined_total_warnings = combined_duplicate_warnings + sorted(list(all_cancellation_warnings))
-        
-        # ▼▼▼ 変更: エラーメッセージを分かりやすく ▼▼▼
-        if not combined_data:
-             print("--- [DEBUG] エラー: 最終集計データが空です (combined_data is empty) ---")
-             return jsonify({"error": "有効なデータが見つかりませんでした。列の名称やデータ行を確認してください。"}), 500
-        # ▲▲▲ 変更ここまで ▲▲▲
-
-        print("--- [DEBUG] 処理成功。JSONを返します ---")
-        return jsonify({
-            "combined": {"data": combined_data, "warnings": combined_total_warnings},
-            "individual": individual_results
-        })
-        
+        for file in files:
+            uploads.append((file.filename, FileSource.from_stream(file.stream, file.filename)))
+        result = process_batch(uploads, remove_parentheses)
+        with stage('serialize'):
+            if _wants_compact():
+                return _compact_response(encode_compact(result))
+            return jsonify(result)
+    except ProcessingError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        logger.exception("/process_batch の処理中に予期せぬエラーが発生しました")
+        return jsonify({"error": f"処理中に予期せぬエラーが発生しました: {e}"}), 500
+    finally:
+        for _, source in uploads:
+            source.close()
+
+# --- 4. バックグラウンド処理 (ジョブの登録 / 進捗の確認 / キャンセル) ---
+@app.route('/jobs', methods=['POST'])
+def create_job_endpoint():
+    # フォームの内容は /process と同じ (upload_token も可)。処理は待たずにジョブIDを返す
+    options = None
+    try:
+        options = _read_process_form()
+        def run_job(progress):
+            return _store_result(process_file(progress=progress, **options), options.get("revision"))
+        # ジョブが終わったら (始まる前のキャンセルや失敗でも) アップロードの一時ファイルを片付ける
+        job = job_manager.submit(run_job, on_finish=options["file_data"].close)
+    except JobQueueFull:
+        options["file_data"].close()
+        return jsonify({"error": "処理待ちのジョブが多すぎます。しばらくしてから再度お試しください。"}), 503
+    except ProcessingError as e:
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
-        print("--- [DEBUG] 処理中に 'except' ブロックでエラーが発生しました ---")
-        print(traceback.format_exc())
+        logger.exception("ジョブの登録中に予期せぬエラーが発生しました")
         return jsonify({"error": f"処理中に予期せぬエラーが発生しました: {e}"}), 500
 
-# --- 5. サーバーの起動 ---
+    logger.info("ジョブを登録しました", extra={"job_id": job.job_id, "upload": options["filename"]})
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_endpoint(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません。期限切れの可能性があります。"}), 404
+    job_dict = job.to_dict()
+    with stage('serialize'):
+        # 結果が付くのは完了したときだけ (進捗だけの応答は小さいので圧縮されない)
+        if "result" in job_dict:
+            job_dict["result"] = _encode_result(job_dict["result"])
+        if _wants_compact():
+            return _compact_response(job_dict)
+        return jsonify(job_dict)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_endpoint(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません。期限切れの可能性があります。"}), 404
+    return jsonify(job.to_dict())
+
+# --- 5. Excel のシート一覧 (メタデータのみ) ---
+@app.route('/sheets', methods=['POST'])
+def list_sheets_endpoint():
+    # セルは読まずにシート名と寸法だけを返す。ファイルはトークンで保管し、/process や /jobs で再利用できる
+    try:
+        original_filename, source = _read_upload()
+    except ProcessingError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    try:
+        if not original_filename.lower().endswith(('.xlsx', '.xls')):
+            source.close()
+            return jsonify({"error": "シート一覧は Excel ファイル (.xlsx / .xls) のみ対応しています。"}), 400
+        sheets = list_sheets(original_filename, source)
+    except Exception as e:
+        source.close()
+        logger.exception("シート一覧の読み込みに失敗しました")
+        return jsonify({"error": f"Excelファイルの読み込みに失敗しました。 (エラー: {e})"}), 500
+
+    # 続く /process でシート名を読み直さずに済むようにしておく
+    result_cache.put((source.file_hash, 'sheetnames'), [sheet["name"] for sheet in sheets])
+    if request.form.get('upload_token'):
+        token = request.form['upload_token']
+        source.close() # 保管済みのファイル (ストアの参照は残る)
+    else:
+        token = upload_store.put(original_filename, source) # 以後の後始末はストアが行う
+    return jsonify({"upload_token": token, "filename": original_filename, "sheets": sheets})
+
+# --- 6. 結果のエクスポート (CSV / Excel) ---
+@app.route('/export/<result_id>', methods=['GET'])
+def export_endpoint(result_id):
+    # ?format=csv|xlsx&tab=combined|シート名 。結果はサーバー側にあるので、ブラウザからデータを送り返す必要はない
+    result = result_store.get(result_id)
+    if result is None:
+        return jsonify({"error": "結果が見つかりません。期限切れの可能性があります。もう一度ファイルを処理してください。"}), 404
+
+    tab = request.args.get('tab', 'combined')
+    rows = select_tab(result, tab)
+    if rows is None:
+        return jsonify({"error": f"タブ '{tab}' の結果がありません。"}), 404
+
+    export_format = request.args.get('format', 'csv')
+    filename = f"{tab}_converted"
+    if export_format == 'csv':
+        # 1行ずつ書き出しながら送る
+        return Response(iter_csv_chunks(rows), mimetype='text/csv', headers={
+            "Content-Disposition": f"attachment; filename=\"converted.csv\"; filename*=UTF-8''{quote(filename + '.csv')}"
+        })
+    if export_format == 'xlsx':
+        # write_only で書き出し、大きなファイルは一時ファイルに溜める
+        xlsx_file = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        write_xlsx(rows, xlsx_file)
+        xlsx_file.seek(0)
+        return send_file(xlsx_file, as_attachment=True, download_name=f"{filename}.xlsx",
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return jsonify({"error": f"対応していない形式です: '{export_format}' (csv または xlsx)"}), 400
+
+# --- 7. 結果のプレビュー (ページ分割と検索) ---
+def _read_page_args():
+    # ?offset=&limit=&q= を読む。不正な値は ProcessingError (400)
+    try:
+        offset = int(request.args.get('offset', '0'))
+        limit = int(request.args.get('limit', str(PAGE_DEFAULT_LIMIT)))
+    except ValueError:
+        raise ProcessingError("offset と limit には整数を指定してください。", 400)
+    if offset < 0 or not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise ProcessingError(f"offset は0以上、limit は1から{PAGE_MAX_LIMIT}までで指定してください。", 400)
+    return offset, limit, request.args.get('q', '')
+
+def _result_page(result_id, tab, kind):
+    try:
+        offset, limit, query = _read_page_args()
+    except ProcessingError as e:
+        return jsonify({"error": e.message}), e.status_code
+    if result_store.get(result_id) is None:
+        return jsonify({"error": "結果が見つかりません。期限切れの可能性があります。もう一度ファイルを処理してください。"}), 404
+    # 検索用の索引はタブごとに最初の1回だけ作り、結果と一緒に保持する
+    tab_index = result_store.get_derived(result_id, ('tab_index', tab), lambda result: build_tab_index(result, tab))
+    if tab_index is None:
+        return jsonify({"error": f"タブ '{tab}' の結果がありません。"}), 404
+
+    items, total = tab_index.page(kind, offset, limit, query)
+    unfiltered_total = len(tab_index.rows if kind == 'rows' else tab_index.warnings)
+    page = {"tab": tab, "offset": offset, "limit": limit, "total": total, "unfiltered_total": unfiltered_total,
+            "data" if kind == 'rows' else "warnings": items}
+    with stage('serialize'):
+        if _wants_compact():
+            return _compact_response(encode_compact(page))
+        return jsonify(page)
+
+@app.route('/results/<result_id>/<tab>', methods=['GET'])
+def result_rows_endpoint(result_id, tab):
+    # ?offset=&limit=&q= 。q は部品番号・型番・メーカーの部分一致 (大文字小文字を区別しない)
+    return _result_page(result_id, tab, 'rows')
+
+@app.route('/results/<result_id>/<tab>/warnings', methods=['GET'])
+def result_warnings_endpoint(result_id, tab):
+    return _result_page(result_id, tab, 'warnings')
+
+# --- 8. キャッシュの統計情報 ---
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats_endpoint():
+    return jsonify(result_cache.stats())
+
+# --- 9. 計測値 (Prometheus のテキスト形式) ---
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+# --- 10. サーバーの起動 ---
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,168 @@
+# batch.py
+import os
+import logging
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# --- 自作モジュールをインポート ---
+from pipeline import (
+    ProcessingError,
+    SUPPORTED_EXTENSIONS,
+    collect_file,
+    finalize_collected
+)
+from file_source import FileSource, as_file_source
+from bom_processor import BomAggregator
+
+logger = logging.getLogger(__name__)
+
+# --- 複数ファイルの一括処理 ---
+# BOM_BATCH_WORKERS: ファイルを並列処理するワーカープロセス数 (既定の 1 なら1ファイルずつ処理)
+# /process_batch のリクエストのスレッドからプロセスプールを作るので、BOM_SHEET_WORKERS / BOM_PDF_WORKERS と同じく
+# 既定では並列処理しない (開発用サーバーや pywebview で動かすときに安全なように)。2 以上を指定したときだけ並列処理する
+BATCH_WORKERS = int(os.environ.get('BOM_BATCH_WORKERS', '1'))
+# BOM_BATCH_MAX_FILES: 1回のバッチで処理するファイル数の上限 (zipの中身も含む)
+BATCH_MAX_FILES = int(os.environ.get('BOM_BATCH_MAX_FILES', '200'))
+# BOM_BATCH_MAX_BYTES: zipを展開した後の合計サイズの上限 (zip爆弾対策)
+BATCH_MAX_BYTES = int(os.environ.get('BOM_BATCH_MAX_BYTES', str(512 * 1024 * 1024)))
+
+
+def _zip_member_name(info):
+    # Windows のエクスプローラで作った zip は、UTF-8 フラグ無しの cp932 でファイル名が入っている
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('cp932')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def expand_uploads(uploads):
+    """
+    (ファイル名, 中身) のリストを受け取り、zip を展開した処理対象のリストを返す。中身は bytes または FileSource。
+    各要素は {"filename": ..., "source": FileSource} または、開けなかったものは {"filename": ..., "error": ...}。
+    zip から取り出したファイル ("extracted": True) は大きければ一時ファイルになるので、呼び出し側で close() する。
+    zip の中の対応していない形式のファイル (readme など) やフォルダは黙って読み飛ばす。
+    件数や展開後のサイズが上限を超えたら ProcessingError (413) を送出する。
+    """
+    entries = []
+    try:
+        _expand_into(uploads, entries)
+    except BaseException:
+        close_extracted(entries)
+        raise
+    return entries
+
+
+def close_extracted(entries):
+    for entry in entries:
+        if entry.get("extracted"):
+            entry["source"].close()
+
+
+def _expand_into(uploads, entries):
+    total_bytes = 0
+    for filename, file_data in uploads:
+        source = as_file_source(file_data)
+        if not filename.lower().endswith('.zip'):
+            entries.append({"filename": filename, "source": source})
+            total_bytes += source.size
+            continue
+
+        try:
+            with zipfile.ZipFile(source.file_or_path()) as archive:
+                for info in archive.infolist():
+                    member_name = _zip_member_name(info)
+                    base_name = member_name.rsplit('/', 1)[-1]
+                    if info.is_dir() or member_name.startswith('__MACOSX/') or base_name.startswith(('.', '~$')):
+                        continue
+                    if not base_name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    # 展開前に宣言サイズで上限を確認する (読み出しも宣言サイズで打ち切られる)
+                    total_bytes += info.file_size
+                    if total_bytes > BATCH_MAX_BYTES:
+                        raise ProcessingError(f"展開後のファイルサイズが上限 ({BATCH_MAX_BYTES:,} バイト) を超えています。", 413)
+                    if len(entries) >= BATCH_MAX_FILES:
+                        raise ProcessingError(f"ファイル数が上限 ({BATCH_MAX_FILES} 件) を超えています。", 413)
+                    with archive.open(info) as member:
+                        member_source = FileSource.from_stream(member, base_name)
+                    entries.append({"filename": f"{filename}/{member_name}", "source": member_source, "extracted": True})
+        except zipfile.BadZipFile as e:
+            entries.append({"filename": filename, "error": f"zipファイルを開けませんでした。 (エラー: {e})"})
+
+    if len(entries) > BATCH_MAX_FILES:
+        raise ProcessingError(f"ファイル数が上限 ({BATCH_MAX_FILES} 件) を超えています。", 413)
+    if total_bytes > BATCH_MAX_BYTES:
+        raise ProcessingError(f"ファイルサイズの合計が上限 ({BATCH_MAX_BYTES:,} バイト) を超えています。", 413)
+
+
+def _process_one(filename, source, remove_parentheses, inner_workers):
+    """
+    ファイル1件を処理し、(ファイルごとの結果, 集計器 (エラー時は None), 取り消し線の警告) を返す。
+    エラーはバッチ全体を止めずに、そのファイルの結果として返す。
+    """
+    try:
+        # 一括処理では全シートが対象なので、表紙などヘッダーの無いシートはそのシートだけエラーにする
+        collected = collect_file(filename, source, remove_parentheses=remove_parentheses,
+                                 sheet_workers=inner_workers, pdf_workers=inner_workers, strict=False)
+        combined = finalize_collected(collected.aggregator, collected.cancellation_warnings)
+    except ProcessingError as e:
+        return {"filename": filename, "error": e.message}, None, set()
+    except Exception as e:
+        logger.exception("一括処理中に予期せぬエラーが発生しました", extra={"upload": filename})
+        return {"filename": filename, "error": f"処理中に予期せぬエラーが発生しました: {e}"}, None, set()
+    result = {"filename": filename, "combined": combined, "individual": collected.individual}
+    return result, collected.aggregator, collected.cancellation_warnings
+
+
+def process_batch(uploads, remove_parentheses=True, max_workers=None):
+    """
+    複数ファイル (zip を含む) を処理し、ファイルごとの結果と全ファイルの合算を返す。
+    uploads: [(ファイル名, bytes または FileSource), ...]
+    返り値: {"files": [...アップロード順...], "combined": {...}, "summary": {"total", "succeeded", "failed"}}
+    """
+    if max_workers is None:
+        max_workers = BATCH_WORKERS
+    entries = expand_uploads(uploads)
+    pending = [(i, entry) for i, entry in enumerate(entries) if "error" not in entry]
+    outcomes = [({"filename": entry["filename"], "error": entry["error"]}, None, set()) if "error" in entry else None
+                for entry in entries]
+
+    workers = max(1, min(max_workers, len(pending)))
+    try:
+        if workers <= 1:
+            # 1ファイルずつ処理するときは、ファイル内のシート/ページの並列処理は従来の設定のまま使う
+            for i, entry in pending:
+                outcomes[i] = _process_one(entry["filename"], entry["source"], remove_parentheses, None)
+        else:
+            # ファイル単位で並列化するので、ワーカーの中ではさらにプロセスを増やさない
+            # (一時ファイルに退避したファイルは、ワーカーにパスだけが渡る)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [(i, executor.submit(_process_one, entry["filename"], entry["source"], remove_parentheses, 1))
+                           for i, entry in pending]
+                for i, future in futures:
+                    outcomes[i] = future.result()
+    finally:
+        close_extracted(entries)
+
+    file_results = []
+    all_aggregator = BomAggregator()
+    all_cancellation_warnings = set()
+    for result, aggregator, cancellation_warnings in outcomes:
+        file_results.append(result)
+        if aggregator is not None:
+            # ファイルごとの集計を合流させる (ワーカーからはフラットリストではなく集計器が返る)
+            all_aggregator.merge(aggregator)
+        all_cancellation_warnings.update(cancellation_warnings)
+
+    try:
+        combined = finalize_collected(all_aggregator, all_cancellation_warnings)
+    except ProcessingError as e:
+        combined = {"error": e.message}
+
+    succeeded = sum(1 for result in file_results if "error" not in result)
+    return {
+        "files": file_results,
+        "combined": combined,
+        "summary": {"total": len(file_results), "succeeded": succeeded, "failed": len(file_results) - succeeded}
+    }
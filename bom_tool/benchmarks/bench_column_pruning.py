@@ -0,0 +1,164 @@
+# bench_column_pruning.py
+# 列の多いBOM (ERP の出力のような、BOM の6列の間に関係の無い列が並ぶもの) で、
+# ヘッダー検出後の列の絞り込み (sheet_table.ColumnProjection) の有無による時間とメモリを比べる。
+#   full:   全列の行を読む (BOM_PRUNE_COLUMNS=0 と同じ)
+#   pruned: ヘッダーが決まった後は部品番号・型番・メーカーの列だけを残す
+# 測るのは、行ジェネレータを extract_flat_list_from_rows で最後まで読み、行の控え (キャッシュ用の SheetTable) を取るところまで。
+# ピークメモリは tracemalloc で測る (時間は tracemalloc を有効にしない状態で別に測る)。
+#
+#   python benchmarks/bench_column_pruning.py [--rows 20000] [--columns 60] [--formats xlsx,xls,csv] [--data-dir DIR]
+import os
+import csv
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xlrd
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from file_parsers import parse_single_excel_sheet_xls, parse_csv_or_txt
+from bom_processor import extract_flat_list_from_rows
+from sheet_table import ColumnProjection, SheetTable
+from bom_generator import HEADER, XLS_MAX_ROWS, generate_lines
+from xlsx_fast import XlsxReader
+
+FORMATS = ('xlsx', 'xls', 'csv')
+
+
+def _wide_layout(column_count):
+    # BOM の6列を、関係の無い列 (ERP01, ERP02, ...) の間に散らばらせる
+    positions = [round(i * (column_count - 1) / (len(HEADER) - 1)) for i in range(len(HEADER))]
+    header = [f"ERP{col:02d}" for col in range(column_count)]
+    for position, name in zip(positions, HEADER):
+        header[position] = name
+    return header, positions
+
+
+def _wide_rows(lines, column_count):
+    """(見出し, [(行のセルのリスト, 取り消し線の列の集合), ...]) を返す。"""
+    header, positions = _wide_layout(column_count)
+    rows = []
+    for i, line in enumerate(lines):
+        row = [f"LOT-{i:06d}-{col}" if col % 3 else str(i * col % 997) for col in range(column_count)]
+        for position, value in zip(positions, line.values()):
+            row[position] = str(value)
+        struck = set()
+        if line.struck_ref is not None:
+            struck.add(positions[1])
+        if line.struck_part:
+            struck.add(positions[2])
+        rows.append((row, struck))
+    return header, rows
+
+
+def write_wide_bom(directory, file_format, row_count, column_count):
+    path = os.path.join(directory, f"wide_{row_count}x{column_count}.{file_format}")
+    if os.path.exists(path):
+        return path
+    header, rows = _wide_rows(generate_lines(row_count), column_count)
+    tmp_path = path + '.tmp.' + file_format
+    if file_format == 'xlsx':
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet('BOM')
+        sheet.append(header)
+        struck_font = Font(strike=True)
+        for row, struck in rows:
+            cells = list(row)
+            for col in struck:
+                cells[col] = WriteOnlyCell(sheet, value=row[col])
+                cells[col].font = struck_font
+            sheet.append(cells)
+        workbook.save(tmp_path)
+    elif file_format == 'xls':
+        import xlwt
+        workbook = xlwt.Workbook(encoding='utf-8')
+        struck_style = xlwt.easyxf('font: struck_out on')
+        sheet = workbook.add_sheet('BOM')
+        for col, value in enumerate(header):
+            sheet.write(0, col, value)
+        for row_index, (row, struck) in enumerate(rows[:XLS_MAX_ROWS], start=1):
+            for col, value in enumerate(row):
+                if col in struck:
+                    sheet.write(row_index, col, value, struck_style)
+                else:
+                    sheet.write(row_index, col, value)
+        workbook.save(tmp_path)
+    else:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(row for row, _ in rows)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _open_rows(path, file_format, projection):
+    # (行ジェネレータ, 取り消し線Ref, 後始末) を返す
+    if file_format == 'xlsx':
+        reader = XlsxReader(path)
+        rows_iter, cancellation_refs = reader.parse_sheet(reader.sheet_names[0], projection)
+        return rows_iter, cancellation_refs, reader.close
+    if file_format == 'xls':
+        book = xlrd.open_workbook(path, formatting_info=True, on_demand=True)
+        rows_iter, cancellation_refs = parse_single_excel_sheet_xls(book.sheet_by_index(0), book, projection)
+        return rows_iter, cancellation_refs, book.release_resources
+    f = open(path, 'rb')
+    return parse_csv_or_txt(f, [','], projection), set(), f.close
+
+
+def run(path, file_format, pruned):
+    """ファイルを読んでフラットリストを作り、(フラットリスト, 行の控え) を返す。"""
+    projection = ColumnProjection() if pruned else None
+    rows_iter, cancellation_refs, close = _open_rows(path, file_format, projection)
+    table = SheetTable()
+
+    def recorded():
+        for row in rows_iter:
+            table.append(row)
+            yield row
+
+    try:
+        flat_list, error, _ = extract_flat_list_from_rows(recorded(), cancellation_refs, projection=projection)
+    finally:
+        close()
+    if error:
+        raise RuntimeError(f"{os.path.basename(path)}: {error}")
+    return flat_list, table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列の絞り込みの有無による時間とメモリを比べる")
+    parser.add_argument('--rows', type=int, default=20000, help="BOMの行数 (.xls は 65,535 行まで)")
+    parser.add_argument('--columns', type=int, default=60, help="列数 (BOM の6列を含む)")
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"対象の形式 ({', '.join(FORMATS)})")
+    parser.add_argument('--data-dir', help="生成したBOMの置き場所 (指定すると次回以降は生成を省略する)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"{'format':<7} {'rows':>8} {'cols':>5} {'mode':<7} {'sec':>8} {'peak MB':>9}")
+        for file_format in [value for value in args.formats.split(',') if value]:
+            path = write_wide_bom(data_dir, file_format, args.rows, args.columns)
+            results = {}
+            for mode in ('full', 'pruned'):
+                start = time.perf_counter()
+                results[mode] = run(path, file_format, mode == 'pruned')[0]
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()
+                run(path, file_format, mode == 'pruned')
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"{file_format:<7} {args.rows:>8,} {args.columns:>5} {mode:<7} {elapsed:>8.3f} {peak / 1e6:>9.1f}")
+            if results['full'] != results['pruned']:
+                raise RuntimeError(f"{file_format}: 絞り込みの有無で結果が異なります")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# bench_manufacturer_rules.py
+# メーカー推測ルールの数を 5 件から 10,000 件まで増やしたときの、型番1件あたりの判定コストを測る。
+# ルールは ManufacturerRules (前方一致のトライ木 + 部分一致のオートマトン) にコンパイルして使う。
+# 比較用に、ルールを上から順に startswith / in で調べる素朴な実装 (従来の detect_manufacturer の書き方) も測る。
+#
+#   python benchmarks/bench_manufacturer_rules.py [型番の件数]
+import os
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manufacturer_rules import ManufacturerRules, load_rules, DEFAULT_RULES_PATH
+
+
+# --- 比較用: ルールを上から順に調べる実装 ---
+def linear_detect(rules, part_number_string):
+    pn_upper = part_number_string.upper()
+    best = None
+    for match, pattern, manufacturer in rules:
+        if match == 'prefix' and pn_upper.startswith(pattern.upper()):
+            if best is None or len(pattern) > len(best[0]):
+                best = (pattern, manufacturer)
+    if best is not None:
+        return best[1]
+    pn_lower = part_number_string.lower()
+    for match, pattern, manufacturer in rules:
+        if match == 'contains' and pattern.lower() in pn_lower:
+            return manufacturer
+    return ""
+
+
+# --- サンプルのルール (同梱のルール + 架空のメーカーの接頭辞・別名) ---
+def make_rules(rule_count, seed=1):
+    rng = random.Random(seed)
+    rules = load_rules(DEFAULT_RULES_PATH)
+    seen = {pattern.upper() for _, pattern, _ in rules}
+    while len(rules) < rule_count:
+        if rng.random() < 0.8:
+            pattern = ''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 6)))
+            match = 'prefix'
+        else:
+            pattern = 'mk' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 8)))
+            match = 'contains'
+        if pattern.upper() in seen:
+            continue
+        seen.add(pattern.upper())
+        rules.append((match, pattern, f"Maker{len(rules)}"))
+    return rules
+
+
+# --- 型番のサンプル (同じ型番がシートをまたいで繰り返し現れる想定) ---
+def make_part_numbers(count, distinct_count=5000, seed=2):
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"GRM155R71C{rng.randint(0, 999):03d}KA88D",
+        lambda: f"CGA3E2X7R1H{rng.randint(0, 999):03d}K",
+        lambda: f"MCR03EZPFX{rng.randint(1000, 9999)}",
+        lambda: f"RC0402FR-07{rng.randint(1, 99)}KL",
+        lambda: f"LM{rng.randint(100, 9999)}DR",
+        lambda: f"Cap 0.1uF (Murata) {rng.randint(0, 99)}",
+        lambda: ''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(12)),
+    ]
+    distinct = [rng.choice(templates)() for _ in range(distinct_count)]
+    return [rng.choice(distinct) for _ in range(count)]
+
+
+def measure(func, part_numbers):
+    start = time.perf_counter()
+    for part_number in part_numbers:
+        func(part_number)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(part_numbers) * 1e6
+
+
+def main():
+    lookup_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    part_numbers = make_part_numbers(lookup_count)
+    distinct = list(dict.fromkeys(part_numbers))
+
+    print(f"{lookup_count:,} lookups ({len(distinct):,} distinct part numbers), usec/lookup")
+    print(f"  {'rules':>7} {'compile':>10} {'linear':>10} {'compiled':>10} {'memoized':>10}")
+    for rule_count in (11, 100, 1000, 10000):
+        rules = make_rules(rule_count)
+
+        start = time.perf_counter()
+        engine = ManufacturerRules(rules, cache_size=0)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        # 結果が素朴な実装と一致することを先に確認する
+        for part_number in distinct:
+            assert engine.detect(part_number) == linear_detect(rules, part_number), part_number
+
+        linear_count = min(lookup_count, 5000) # 素朴な実装は遅いので件数を絞る
+        linear = measure(lambda pn: linear_detect(rules, pn), part_numbers[:linear_count])
+        compiled = measure(engine.detect, part_numbers)
+        memoized = measure(ManufacturerRules(rules).detect, part_numbers)
+        print(f"  {rule_count:>7,} {compile_ms:>8.1f}ms {linear:>10.2f} {compiled:>10.2f} {memoized:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# bench_pipeline.py
+# bom_generator.py で生成したBOMを使い、処理の段階ごとに時間 (行/秒) とピークメモリを測る。
+#   load:    ワークブックを開く (XlsxReader (--xlsx-engine fast / openpyxl) / xlrd formatting_info=True)
+#   parse:   XlsxReader.parse_sheet / parse_single_excel_sheet_xls / parse_csv_or_txt / parse_pdf
+#            (行ジェネレータを最後まで読み、SheetTable にしたところまで)
+#   extract: extract_flat_list_from_rows
+#   group:   group_and_finalize_bom
+# ピークメモリは tracemalloc で測る。tracemalloc を有効にすると遅くなるので、時間は有効にしない状態で別に測る。
+#
+#   python benchmarks/bench_pipeline.py [--rows 1000,10000,100000] [--formats xlsx,xls,...] [--data-dir DIR]
+#                                       [--no-memory] [--pdf-max-rows 10000] [--xlsx-engine fast|openpyxl]
+#                                       [--pdf-table-mode detect|reuse]
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xlrd
+
+from file_parsers import (
+    parse_single_excel_sheet_xls,
+    parse_csv_or_txt,
+    parse_pdf,
+    PDF_TABLE_MODE
+)
+from bom_processor import extract_flat_list_from_rows, group_and_finalize_bom
+from sheet_table import SheetTable
+from bom_generator import FORMATS, write_bom
+from xlsx_fast import XLSX_ENGINE, XlsxReader
+
+_DELIMITERS = {'csv': [','], 'txt': ['\t', r'\s{2,}']}
+
+
+def measure(func, with_memory):
+    """func() を実行し、(結果, 秒, ピークメモリ (バイト) または None) を返す。"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if with_memory:
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _load_and_parse_stages(path, file_format, xlsx_engine=XLSX_ENGINE, pdf_table_mode=PDF_TABLE_MODE):
+    """形式ごとの (段階名, 関数) を順に返す。parse 段階の結果は [(SheetTable, 取り消し線Ref), ...]。"""
+    if file_format == 'xlsx':
+        book = {}
+
+        def load():
+            book['value'] = XlsxReader(path, xlsx_engine)
+            if xlsx_engine == 'openpyxl':
+                book['value']._openpyxl_workbook() # openpyxl はここで全シートを読み込む
+            return book['value']
+
+        def parse():
+            sheets = []
+            for sheet_name in book['value'].sheet_names:
+                rows_iter, cancellation_refs = book['value'].parse_sheet(sheet_name)
+                sheets.append((SheetTable(rows_iter), cancellation_refs))
+            return sheets
+        return [('load', load), ('parse', parse)]
+
+    if file_format == 'xls':
+        book = {}
+
+        def load():
+            with open(path, 'rb') as f:
+                book['value'] = xlrd.open_workbook(file_contents=f.read(), formatting_info=True)
+            return book['value']
+
+        def parse():
+            sheets = []
+            for sheet in book['value'].sheets():
+                rows_iter, cancellation_refs = parse_single_excel_sheet_xls(sheet, book['value'])
+                sheets.append((SheetTable(rows_iter), cancellation_refs))
+            return sheets
+        return [('load', load), ('parse', parse)]
+
+    if file_format == 'pdf':
+        return [('parse', lambda: [(SheetTable(parse_pdf(path, table_mode=pdf_table_mode)), set())])]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    delimiters = _DELIMITERS[file_format.split('-')[0]]
+    return [('parse', lambda: [(SheetTable(parse_csv_or_txt(data, delimiters)), set())])]
+
+
+def bench_file(path, file_format, with_memory, xlsx_engine=XLSX_ENGINE, pdf_table_mode=PDF_TABLE_MODE):
+    """1ファイル分の段階ごとの結果を [(段階名, 秒, ピークメモリ), ...] で返す。"""
+    results = []
+    sheets = None
+    for stage, func in _load_and_parse_stages(path, file_format, xlsx_engine, pdf_table_mode):
+        value, elapsed, peak = measure(func, with_memory)
+        results.append((stage, elapsed, peak))
+        if stage == 'parse':
+            sheets = value
+
+    def extract():
+        flat_data = []
+        for table, cancellation_refs in sheets:
+            flat_list, error, _ = extract_flat_list_from_rows(table, cancellation_refs)
+            if error:
+                raise RuntimeError(f"{os.path.basename(path)}: {error}")
+            flat_data.extend(flat_list)
+        return flat_data
+
+    flat_data, elapsed, peak = measure(extract, with_memory)
+    results.append(('extract', elapsed, peak))
+
+    _, elapsed, peak = measure(lambda: group_and_finalize_bom(flat_data), with_memory)
+    results.append(('group', elapsed, peak))
+    return results, len(flat_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="段階ごとの処理速度とピークメモリを測る")
+    parser.add_argument('--rows', default='1000,10000,100000', help="BOMの行数 (カンマ区切り)")
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"対象の形式 ({', '.join(FORMATS)})")
+    parser.add_argument('--data-dir', help="生成したBOMの置き場所 (指定すると次回以降は生成を省略する)")
+    parser.add_argument('--no-memory', action='store_true', help="ピークメモリを測らない (時間だけを測る)")
+    parser.add_argument('--pdf-max-rows', type=int, default=10000,
+                        help="これより多い行数ではPDFを測らない (PDFの生成と解析には時間がかかるため)")
+    parser.add_argument('--xlsx-engine', choices=('fast', 'openpyxl'), default=XLSX_ENGINE,
+                        help=".xlsx の読み込み方 (既定: BOM_XLSX_ENGINE)")
+    parser.add_argument('--pdf-table-mode', choices=('detect', 'reuse'), default=PDF_TABLE_MODE,
+                        help="PDFの表の読み取り方 (既定: BOM_PDF_TABLE_MODE)")
+    args = parser.parse_args()
+
+    row_counts = [int(value) for value in args.rows.split(',') if value]
+    formats = [value for value in args.formats.split(',') if value]
+    for file_format in formats:
+        if file_format not in FORMATS:
+            parser.error(f"不明な形式です: {file_format}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"{'format':<10} {'rows':>8} {'stage':<8} {'sec':>8} {'rows/sec':>12} {'peak MB':>9}")
+        for row_count in row_counts:
+            for file_format in formats:
+                if file_format == 'pdf' and row_count > args.pdf_max_rows:
+                    print(f"{file_format:<10} {row_count:>8,} (skipped: --pdf-max-rows {args.pdf_max_rows:,})")
+                    continue
+                path = write_bom(data_dir, file_format, row_count)
+                results, item_count = bench_file(path, file_format, not args.no_memory, args.xlsx_engine,
+                                                 args.pdf_table_mode)
+                for stage, elapsed, peak in results:
+                    peak_text = f"{peak / 1e6:>9.1f}" if peak is not None else f"{'-':>9}"
+                    print(f"{file_format:<10} {row_count:>8,} {stage:<8} {elapsed:>8.3f} "
+                          f"{row_count / elapsed:>12,.0f} {peak_text}")
+                print(f"{'':<10} {'':>8} ({item_count:,} flat items, {os.path.getsize(path) / 1e6:.1f} MB file)")
+
+
+if __name__ == '__main__':
+    main()
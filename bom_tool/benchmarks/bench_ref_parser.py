@@ -0,0 +1,139 @@
+# bench_ref_parser.py
+# ref_parser.expand と、従来 extract_flat_list_from_rows にインラインで書かれていた
+# 部品番号の分解・レンジ展開処理の速度 (行/秒) を比較する。
+#
+#   python benchmarks/bench_ref_parser.py [行数]
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ref_pattern, ref_range_pattern
+import ref_parser
+
+
+# --- 比較用: 従来のインライン実装 (bom_processor.py から抜き出したもの) ---
+def legacy_expand(ref_val_raw, remove_parentheses):
+    if remove_parentheses:
+        ref_val = ref_val_raw.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ')
+    else:
+        ref_val = ref_val_raw
+    ref_val_spaced_v2 = re.sub(r'([）)])\s*([（(])', r'\1 \2', ref_val)
+    ref_val_spaced_v2 = re.sub(r'([）)])\s*([A-Z]+[0-9]+)', r'\1 \2', ref_val_spaced_v2, flags=re.IGNORECASE)
+    ref_val_spaced_v2 = re.sub(r'([A-Z]+[0-9]+)\s*([（(])', r'\1 \2', ref_val_spaced_v2, flags=re.IGNORECASE)
+    all_split_parts = [r for r in re.split(r'[,、\s\.\・/\，]+', ref_val_spaced_v2) if r]
+    expanded_refs = []
+    if remove_parentheses:
+        last_prefix = ""
+        prefix_regex = re.compile(r'^([A-Z]+)', re.IGNORECASE)
+        for part in all_split_parts:
+            prefix_match = prefix_regex.match(part)
+            if prefix_match:
+                last_prefix = prefix_match.group(1)
+            current_ref = part
+            if part.isdigit() and last_prefix:
+                current_ref = f"{last_prefix}{part}"
+            range_match = ref_range_pattern.match(current_ref)
+            ref_match = ref_pattern.match(current_ref)
+            if range_match:
+                prefix, start, opt_prefix, end = range_match.groups()
+                if start and end:
+                    try:
+                        if not opt_prefix:
+                            opt_prefix = prefix
+                        if prefix.upper() == opt_prefix.upper():
+                            for i in range(int(start), int(end) + 1):
+                                expanded_refs.append(f"{prefix}{i}")
+                            last_prefix = prefix
+                        else:
+                            expanded_refs.append(current_ref)
+                    except ValueError:
+                        expanded_refs.append(current_ref)
+                else:
+                     expanded_refs.append(current_ref)
+            elif ref_match and ref_match.group(0).upper() == current_ref.upper():
+                expanded_refs.append(current_ref)
+    else:
+        last_prefix = ""
+        prefix_regex = re.compile(r'^([A-Z(（]+)', re.IGNORECASE)
+        for part in all_split_parts:
+            temp_part_for_validation = part.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
+            if not temp_part_for_validation: continue
+            prefix_match = prefix_regex.match(temp_part_for_validation)
+            if prefix_match:
+                last_prefix = prefix_match.group(1)
+            current_ref = part
+            if temp_part_for_validation.isdigit() and last_prefix:
+                current_ref = re.sub(temp_part_for_validation, f"{last_prefix}{temp_part_for_validation}", part, 1)
+            temp_part_for_validation = current_ref.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
+            if not temp_part_for_validation: continue
+            range_match = ref_range_pattern.match(temp_part_for_validation)
+            ref_match = ref_pattern.match(temp_part_for_validation)
+            if range_match:
+                prefix, start, opt_prefix, end = range_match.groups()
+                if start and end:
+                    try:
+                        if not opt_prefix:
+                            opt_prefix = prefix
+                        if not opt_prefix or prefix.upper() == opt_prefix.upper():
+                            for i in range(int(start), int(end) + 1):
+                                expanded_refs.append(f"{prefix}{i}")
+                            last_prefix = prefix
+                        else:
+                            expanded_refs.append(current_ref)
+                    except ValueError:
+                            expanded_refs.append(current_ref)
+                else:
+                     expanded_refs.append(current_ref)
+            elif ref_match and ref_match.group(0).upper() == temp_part_for_validation.upper():
+                expanded_refs.append(current_ref)
+    return expanded_refs
+
+
+# --- 部品番号セルのサンプル (同じ文字列がシートをまたいで繰り返し現れる想定) ---
+def make_ref_cells(row_count, distinct_count=2000, seed=1):
+    rng = random.Random(seed)
+    prefixes = ['C', 'R', 'L', 'U', 'Q', 'D', 'TP', 'CN']
+    templates = [
+        lambda p, n: f"{p}{n}",
+        lambda p, n: f"{p}{n}-{p}{n + rng.randint(1, 40)}",
+        lambda p, n: f"{p}{n}, {p}{n + 1}, {n + 2}, {n + 3}",
+        lambda p, n: f"({p}{n})",
+        lambda p, n: f"{p}{n}({p}{n + 1})",
+        lambda p, n: f"{p}{n}～{n + 5}、{p}{n + 9}",
+        lambda p, n: f"{p}{n} {p}{n + 2} {p}{n + 4}",
+    ]
+    distinct = [rng.choice(templates)(rng.choice(prefixes), rng.randint(1, 500)) for _ in range(distinct_count)]
+    return [rng.choice(distinct) for _ in range(row_count)]
+
+
+def measure(label, func, cells, remove_parentheses):
+    start = time.perf_counter()
+    for cell in cells:
+        func(cell, remove_parentheses)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {len(cells) / elapsed:>12,.0f} rows/sec")
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cells = make_ref_cells(row_count)
+
+    for remove_parentheses in (True, False):
+        # 結果が従来実装と一致することを先に確認する
+        for cell in set(cells):
+            assert list(ref_parser.expand(cell, remove_parentheses)) == legacy_expand(cell, remove_parentheses), cell
+
+        print(f"remove_parentheses={remove_parentheses}, {row_count:,} rows")
+        measure("legacy inline", legacy_expand, cells, remove_parentheses)
+        ref_parser.expand.cache_clear()
+        measure("expand (without memo)", lambda c, rp: ref_parser.expand.__wrapped__(c, rp), cells, remove_parentheses)
+        ref_parser.expand.cache_clear()
+        measure("expand (memoized)", ref_parser.expand, cells, remove_parentheses)
+
+
+if __name__ == '__main__':
+    main()
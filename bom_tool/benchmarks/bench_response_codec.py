@@ -0,0 +1,67 @@
+# bench_response_codec.py
+# /process の応答のサイズと JSON 化の時間を、通常の形式 (jsonify) と圧縮形式 (?format=compact) で比べる。
+# 圧縮形式は encode_compact + orjson (あれば) に、gzip (と brotli があれば brotli) をかけたもの。
+# 入力は bom_generator.py で生成したBOM (全体集計とシート別の結果の両方を含む応答)。
+#
+#   python benchmarks/bench_response_codec.py [--rows 10000,100000] [--formats xlsx,csv-utf8] [--data-dir DIR]
+import os
+import sys
+import time
+import gzip
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, json as flask_json
+
+from pipeline import process_file
+from response_codec import encode_compact, decode_compact, dumps, compress, supported_encodings
+from bom_generator import FORMATS, write_bom
+
+
+def best_of(func, repeat=3):
+    """func() を repeat 回実行し、(結果, 最短の秒数) を返す。"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="応答の形式ごとのサイズと JSON 化の時間を測る")
+    parser.add_argument('--rows', default='10000,100000', help="BOMの行数 (カンマ区切り)")
+    parser.add_argument('--formats', default='xlsx,csv-utf8', help=f"入力の形式 ({', '.join(FORMATS)})")
+    parser.add_argument('--data-dir', help="生成したBOMの置き場所 (指定すると次回以降は生成を省略する)")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp_dir, app.app_context():
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"{'format':<10} {'rows':>8} {'response':<14} {'MB':>8} {'ms':>8}")
+        for row_count in [int(value) for value in args.rows.split(',') if value]:
+            for file_format in [value for value in args.formats.split(',') if value]:
+                path = write_bom(data_dir, file_format, row_count)
+                with open(path, 'rb') as f:
+                    result = process_file(os.path.basename(path), f.read(), strict=False)
+
+                plain, plain_seconds = best_of(lambda: flask_json.dumps(result).encode('utf-8'))
+                compact, compact_seconds = best_of(lambda: dumps(encode_compact(result)))
+                assert decode_compact(flask_json.loads(compact)) == result
+                plain_gzip, gzip_seconds = best_of(lambda: gzip.compress(plain, 5))
+                rows = [('jsonify', plain, plain_seconds),
+                        ('jsonify+gzip', plain_gzip, plain_seconds + gzip_seconds),
+                        ('compact', compact, compact_seconds)]
+                for encoding in supported_encodings():
+                    body, seconds = best_of(lambda: compress(compact, encoding)[0])
+                    rows.append((f"compact+{encoding}", body, compact_seconds + seconds))
+                for name, body, seconds in rows:
+                    print(f"{file_format:<10} {row_count:>8,} {name:<14} {len(body) / 1e6:>8.2f} {seconds * 1000:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# bench_revisions.py
+# 改訂版の処理 (revisions.py) で、前の版と少しだけ違う版を処理する時間を、前の版を使わずに処理した場合と比べる。
+#   full:     新しい版を単独で処理する (process_file)
+#   revision: 前の版を Revision 付きで処理しておき、その Revision を前の版として新しい版を処理する
+# 新しい版は bom_generator.py で生成したBOMから、--changes 行の型番を変え、同じ数の行を削除・挿入したもの。
+# 段階別の時間は metrics の段階 (parse / extract / group) の合計。解析結果キャッシュは使わない。
+#
+#   python benchmarks/bench_revisions.py [--rows 10000,100000] [--formats csv,xlsx,xls] [--changes 20]
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# 同じ内容の2回目の処理がキャッシュから返らないよう、解析結果キャッシュを無効にする
+os.environ['BOM_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import process_file
+from revisions import Revision, diff_results
+from metrics import start_request, request_timings
+from bom_generator import BomLine, XLS_MAX_ROWS, generate_lines, write_xlsx, write_xls, write_csv
+
+FORMATS = ('csv', 'xlsx', 'xls')
+_WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'xls': write_xls}
+
+
+def revise_lines(lines, changes, seed=2):
+    """lines の changes 行の型番を変え、changes 行を削除し、changes 行 (新しい部品番号 TP1, TP2, ...) を挿入した新しい版を返す。"""
+    rng = random.Random(seed)
+    revised = list(lines)
+    for index in rng.sample(range(len(revised)), changes):
+        line = revised[index]
+        revised[index] = BomLine(line.no, line.ref, line.part + '-R2', line.mfg, line.qty, line.description,
+                                 line.struck_ref, line.struck_part)
+    for _ in range(changes):
+        del revised[rng.randrange(len(revised))]
+    for number in range(1, changes + 1):
+        line = rng.choice(lines)
+        revised.insert(rng.randrange(len(revised)), BomLine(line.no, f"TP{number}", line.part, line.mfg, 1,
+                                                             line.description))
+    return revised
+
+
+def run(path, revision=None):
+    """path を処理し、(結果, 秒, {段階: 秒}) を返す。"""
+    with open(path, 'rb') as f:
+        file_data = f.read()
+    start_request()
+    start = time.perf_counter()
+    result = process_file(os.path.basename(path), file_data, strict=False, revision=revision)
+    return result, time.perf_counter() - start, request_timings()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="改訂版の処理で、前の版を使う場合と使わない場合の時間を比べる")
+    parser.add_argument('--rows', default='10000,100000', help="BOMの行数 (カンマ区切り。.xls は 65,535 行まで)")
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"対象の形式 ({', '.join(FORMATS)})")
+    parser.add_argument('--changes', type=int, default=20, help="型番を変える行数 (同じ数の行を削除・挿入する)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'format':<7} {'rows':>8} {'mode':<9} {'sec':>8} {'extract':>8} {'group':>8} {'reused':>8} {'expanded':>9}")
+        for row_count in [int(value) for value in args.rows.split(',') if value]:
+            for file_format in [value for value in args.formats.split(',') if value]:
+                count = min(row_count, XLS_MAX_ROWS - args.changes) if file_format == 'xls' else row_count
+                lines = generate_lines(count)
+                paths = []
+                for name, revision_lines in (('a', lines), ('b', revise_lines(lines, args.changes))):
+                    path = os.path.join(tmp_dir, f"rev_{name}_{count}.{file_format}")
+                    _WRITERS[file_format](path, revision_lines)
+                    paths.append(path)
+
+                full, seconds, timings = run(paths[1])
+                print(f"{file_format:<7} {count:>8,} {'full':<9} {seconds:>8.3f} {timings.get('extract', 0):>8.3f} "
+                      f"{timings.get('group', 0):>8.3f}")
+
+                previous = Revision()
+                previous_result, _, _ = run(paths[0], previous)
+                revision = Revision(previous)
+                result, seconds, timings = run(paths[1], revision)
+                rows = revision.row_counts()
+                print(f"{file_format:<7} {count:>8,} {'revision':<9} {seconds:>8.3f} {timings.get('extract', 0):>8.3f} "
+                      f"{timings.get('group', 0):>8.3f} {rows['reused']:>8,} {rows['expanded']:>9,}")
+                if result != full:
+                    raise RuntimeError(f"{file_format}: 前の版の使い回しの有無で結果が異なります")
+                counts = diff_results(previous_result, result)["counts"]
+                print(f"{'':<7} {'':>8} diff: added {counts['added']}, removed {counts['removed']}, "
+                      f"changed {counts['changed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# bench_sheet_memory.py
+# 1シート分の解析結果を保持するのに必要なメモリを、従来のセルごとの辞書
+# ({"value": ..., "is_struck": ...}) と SheetTable (文字列タプル + 取り消し線ビットマップ) で比較する。
+#
+#   python benchmarks/bench_sheet_memory.py [行数] [列数]
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from openpyxl.styles import Font
+
+from file_parsers import parse_single_excel_sheet_rich_text
+from sheet_table import SheetTable
+
+
+# --- サンプルのワークブック (ERPから出力されたような、空セルの多い横長のBOM) ---
+def write_sample_workbook(path, row_count, col_count, seed=1):
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('BOM')
+    header = [f"Attr{j}" for j in range(col_count)]
+    header[:4] = ['No', 'Ref Des', 'Part Number', 'Manufacturer']
+    sheet.append(header)
+    struck_font = Font(strike=True)
+    for i in range(row_count):
+        row = [i + 1, f"C{i + 1}", f"GRM155R71C{i % 997:03d}KA88D", rng.choice(['Murata', '', '↑'])]
+        for j in range(4, col_count):
+            row.append(f"v{rng.randint(0, 999)}" if rng.random() < 0.4 else None)
+        if i % 50 == 0:
+            cell = openpyxl.cell.WriteOnlyCell(sheet, value=row[1])
+            cell.font = struck_font
+            row[1] = cell
+        sheet.append(row)
+    workbook.save(path)
+
+
+# --- 比較用: 従来の表現 (1セル1辞書, 空セルも辞書) ---
+def legacy_dict_rows(sheet):
+    data = []
+    for row in sheet.iter_rows():
+        row_data = []
+        for cell in row:
+            if cell.value is None:
+                row_data.append({"value": "", "is_struck": False})
+            else:
+                row_data.append({"value": str(cell.value), "is_struck": bool(cell.font and cell.font.strike)})
+        data.append(row_data)
+    return data
+
+
+def measure(label, build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<36} {current / 1e6:>8.1f} MB   ({elapsed:.2f} s)")
+    return result
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    col_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sample.xlsx')
+        write_sample_workbook(path, row_count, col_count)
+        print(f"{row_count:,} rows x {col_count} columns ({os.path.getsize(path) / 1e6:.1f} MB .xlsx)")
+
+        sheet = openpyxl.load_workbook(path, rich_text=True)['BOM']
+        measure("list of {'value', 'is_struck'} dicts", lambda: legacy_dict_rows(sheet))
+        measure("SheetTable", lambda: SheetTable(parse_single_excel_sheet_rich_text(sheet)[0]))
+
+
+if __name__ == '__main__':
+    main()
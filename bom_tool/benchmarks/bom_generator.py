@@ -0,0 +1,225 @@
+# bom_generator.py
+# ベンチマーク用のBOMファイルを、乱数の種を固定して (毎回同じ内容で) 生成する。
+#   .xlsx: リッチテキストの一部だけに取り消し線 (部品番号の一部を削除した行) + セル全体の取り消し線
+#   .xls:  取り消し線のフォントを使ったセル (1シート 65,535 行を超える分は次のシートに書く)
+#   .csv:  UTF-8 / Shift_JIS
+#   .txt:  タブ区切り / 2つ以上の空白区切り
+#   .pdf:  罫線付きの表 (reportlab)
+# 部品番号には範囲 (C1-C4)、カンマ区切りの省略形 (R1,R2,3)、括弧付き ((C10), C11(C12)) を含め、
+# 型番・メーカーには継続記号 (↑, 上↑, ") を混ぜる。
+#
+#   python benchmarks/bom_generator.py 出力先 [行数 ...]
+#
+# .xls と .pdf の生成には xlwt と reportlab が必要 (アプリ本体の依存関係には含まれない)。
+import os
+import csv
+import sys
+import random
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+from openpyxl.styles import Font
+
+HEADER = ['No', 'Ref Des', 'Part Number', 'Manufacturer', 'Qty', 'Description']
+XLS_MAX_ROWS = 65535 # .xls の1シートに書けるデータ行数 (見出し行を除く)
+
+FORMATS = ('xlsx', 'xls', 'csv-utf8', 'csv-sjis', 'txt-tab', 'txt-space', 'pdf')
+
+_PART_FAMILIES = [
+    ('C', lambda rng: f"GRM155R71C{rng.randint(100, 999)}KA88D", 'Murata', 'コンデンサ'),
+    ('C', lambda rng: f"CGA3E2X7R1H{rng.randint(100, 999)}K", 'TDK', 'コンデンサ'),
+    ('C', lambda rng: f"CC0402KRX7R9BB{rng.randint(100, 999)}", 'Yageo', 'コンデンサ'),
+    ('R', lambda rng: f"MCR03EZPFX{rng.randint(1000, 9999)}", 'Rohm', '抵抗'),
+    ('R', lambda rng: f"RC0402FR-07{rng.randint(1, 99)}KL", '', '抵抗'),
+    ('L', lambda rng: f"BLM18AG{rng.randint(100, 999)}SN1D", '', 'フェライトビーズ'),
+    ('U', lambda rng: f"LM{rng.randint(100, 9999)}DR", 'TI', 'IC'),
+    ('Q', lambda rng: f"2N{rng.randint(2000, 7999)}", 'onsemi', 'トランジスタ'),
+    ('D', lambda rng: f"1N{rng.randint(4000, 4999)}", '', 'ダイオード'),
+]
+
+
+class BomLine:
+    """
+    生成したBOMの1行。ref は部品番号セルの文字列。
+    struck_ref: 部品番号セルのうち取り消し線を引く部分 (None なら無し)。struck_part: 型番セル全体に取り消し線。
+    """
+    __slots__ = ('no', 'ref', 'part', 'mfg', 'qty', 'description', 'struck_ref', 'struck_part')
+
+    def __init__(self, no, ref, part, mfg, qty, description, struck_ref=None, struck_part=False):
+        self.no = no
+        self.ref = ref
+        self.part = part
+        self.mfg = mfg
+        self.qty = qty
+        self.description = description
+        self.struck_ref = struck_ref
+        self.struck_part = struck_part
+
+    def values(self):
+        return [self.no, self.ref, self.part, self.mfg, self.qty, self.description]
+
+
+def _ref_cell(rng, prefix, counters):
+    # 部品番号の書き方はいくつかの形式から選ぶ。戻り値は (セルの文字列, 部品番号の数)
+    start = counters.get(prefix, 0) + 1
+    style = rng.random()
+    if style < 0.45:
+        text, count = f"{prefix}{start}", 1
+    elif style < 0.65:
+        count = rng.randint(2, 8)
+        text = f"{prefix}{start}-{prefix}{start + count - 1}"
+    elif style < 0.8:
+        text, count = f"{prefix}{start},{prefix}{start + 1},{start + 2}", 3
+    elif style < 0.9:
+        text, count = f"({prefix}{start})", 1
+    else:
+        text, count = f"{prefix}{start}({prefix}{start + 1})", 2
+    counters[prefix] = start + count - 1
+    return text, count
+
+
+def generate_lines(row_count, seed=1):
+    """row_count 行分の BomLine のリストを返す (同じ引数なら毎回同じ内容)。"""
+    rng = random.Random(seed)
+    counters = {}
+    lines = []
+    previous_part = None
+    for i in range(row_count):
+        prefix, make_part, mfg, description = rng.choice(_PART_FAMILIES)
+        ref, count = _ref_cell(rng, prefix, counters)
+        part = make_part(rng)
+        roll = rng.random()
+        if previous_part is not None and roll < 0.05:
+            part = rng.choice(['上↑', '↑']) # 型番は上の行と同じ
+        elif roll < 0.10:
+            mfg = rng.choice(['↑', '"'])   # メーカーは上の行と同じ
+        elif roll < 0.25:
+            mfg = ''                        # メーカーは型番から推測させる
+        struck_ref = None
+        if count == 1 and rng.random() < 0.02:
+            struck_ref = ref.strip('()')    # 削除された部品番号
+        struck_part = rng.random() < 0.01
+        lines.append(BomLine(i + 1, ref, part, mfg, count, description, struck_ref, struck_part))
+        previous_part = part
+    return lines
+
+
+# --- 形式ごとの書き出し ---
+def write_xlsx(path, lines):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('BOM')
+    sheet.append(['部品表 (ベンチマーク用)'])
+    sheet.append([])
+    sheet.append(HEADER)
+    struck_font = Font(strike=True)
+    for line in lines:
+        row = line.values()
+        if line.struck_ref is not None:
+            # 部品番号の一部 (または全体) だけに取り消し線を引いたリッチテキスト
+            head, _, tail = line.ref.partition(line.struck_ref)
+            runs = [run for run in (head, TextBlock(InlineFont(strike=True), line.struck_ref), tail) if run]
+            row[1] = WriteOnlyCell(sheet, value=CellRichText(runs))
+        if line.struck_part:
+            cell = WriteOnlyCell(sheet, value=line.part)
+            cell.font = struck_font
+            row[2] = cell
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_xls(path, lines):
+    import xlwt
+    workbook = xlwt.Workbook(encoding='utf-8')
+    struck_style = xlwt.easyxf('font: struck_out on')
+    for chunk_index in range(0, max(len(lines), 1), XLS_MAX_ROWS):
+        sheet = workbook.add_sheet(f"BOM{chunk_index // XLS_MAX_ROWS + 1}")
+        for col, value in enumerate(HEADER):
+            sheet.write(0, col, value)
+        for row_index, line in enumerate(lines[chunk_index:chunk_index + XLS_MAX_ROWS], start=1):
+            for col, value in enumerate(line.values()):
+                struck = (col == 1 and line.struck_ref is not None) or (col == 2 and line.struck_part)
+                if struck:
+                    sheet.write(row_index, col, value, struck_style)
+                elif value != '':
+                    sheet.write(row_index, col, value)
+    workbook.save(path)
+
+
+def write_csv(path, lines, encoding='utf-8'):
+    with open(path, 'w', newline='', encoding=encoding, errors='replace') as f:
+        writer = csv.writer(f)
+        writer.writerow(['部品表 (ベンチマーク用)'])
+        writer.writerow(['No', '部品番号', '型番', 'メーカー', '数量', '品名'])
+        for line in lines:
+            writer.writerow(line.values())
+
+
+def write_txt(path, lines, separator='\t'):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        # 空白区切りでは空のセルが詰まって列がずれるので、'-' を入れておく
+        empty = '' if separator == '\t' else '-'
+        f.write(separator.join(HEADER) + '\n')
+        for line in lines:
+            f.write(separator.join(str(value) if value != '' else empty for value in line.values()) + '\n')
+
+
+def write_pdf(path, lines):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+    # reportlab の標準フォントは日本語を描けないので、PDF の品名は英字にする
+    data = [HEADER] + [[str(value) for value in line.values()[:5]] + ['part'] for line in lines]
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.5, colors.black), ('FONTSIZE', (0, 0), (-1, -1), 7)]))
+    SimpleDocTemplate(path, pagesize=A4).build([table])
+
+
+_EXTENSIONS = {'xlsx': '.xlsx', 'xls': '.xls', 'csv-utf8': '.csv', 'csv-sjis': '.csv',
+               'txt-tab': '.txt', 'txt-space': '.txt', 'pdf': '.pdf'}
+
+
+def write_bom(directory, file_format, row_count, seed=1):
+    """
+    directory に file_format の形式で row_count 行のBOMを書き出し、そのパスを返す。
+    同じ形式・行数のファイルが既にあれば作り直さない。
+    """
+    path = os.path.join(directory, f"bom_{row_count}_{file_format}{_EXTENSIONS[file_format]}")
+    if os.path.exists(path):
+        return path
+    lines = generate_lines(row_count, seed)
+    tmp_path = path + '.tmp' + _EXTENSIONS[file_format]
+    if file_format == 'xlsx':
+        write_xlsx(tmp_path, lines)
+    elif file_format == 'xls':
+        write_xls(tmp_path, lines)
+    elif file_format == 'csv-utf8':
+        write_csv(tmp_path, lines, 'utf-8')
+    elif file_format == 'csv-sjis':
+        write_csv(tmp_path, lines, 'shift_jis')
+    elif file_format == 'txt-tab':
+        write_txt(tmp_path, lines, '\t')
+    elif file_format == 'txt-space':
+        write_txt(tmp_path, lines, '    ')
+    else:
+        write_pdf(tmp_path, lines)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f"usage: python {os.path.basename(__file__)} 出力先 [行数 ...]")
+        sys.exit(1)
+    directory = sys.argv[1]
+    row_counts = [int(arg) for arg in sys.argv[2:]] or [1000, 10000, 100000]
+    os.makedirs(directory, exist_ok=True)
+    for row_count in row_counts:
+        for file_format in FORMATS:
+            path = write_bom(directory, file_format, row_count)
+            print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,48 +1,49 @@
 # bom_processor.py
 import re
+import itertools
 
 # --- 自作モジュールからインポート ---
 from utils import (
-    ref_pattern, 
-    ref_range_pattern, 
-    HEADER_KEYWORDS, 
-    detect_manufacturer
+    HEADER_SCAN_ROWS,
+    header_matcher,
+    detect_manufacturer,
+    manufacturer_rules
 )
+from ref_parser import expand as expand_refs, normalize_ref
+from sheet_table import SheetRow
+from metrics import stage
 
 # --- コアロジック 1: 2Dデータからフラットリストを抽出 ---
-def extract_flat_list_from_rows(data_2d, cancellation_refs=set(), remove_parentheses=True):
+# data_2d は SheetRow のリスト・SheetTable・行ジェネレータのいずれでもよい。ヘッダー検出のために先頭 header_scan_rows 行だけをバッファし、
+# 残りの行はストリームとして順に読み進める。
+# projection (sheet_table.ColumnProjection) を行ジェネレータのパーサーと共有していれば、ヘッダーが決まった時点で
+# 部品番号・型番・メーカーの列を指定し、以降の行はパーサーがその列だけに絞って返す。
+# row_memo (revisions.RowMemo) を渡すと、前の版と内容が同じ行は部品番号の展開をやり直さず、前の版の結果を使う。
+def extract_flat_list_from_rows(data_2d, cancellation_refs=set(), remove_parentheses=True, header_scan_rows=HEADER_SCAN_ROWS,
+                                projection=None, row_memo=None):
+    rows_iter = iter(data_2d)
+    header_candidates = []
     header_map, header_row_index, best_score = {}, -1, 0
     best_header_names = {} 
 
-    for i, row in enumerate(data_2d[:20]):
-        if not isinstance(row, list): continue
-        temp_map, used_cols = {}, set()
-        temp_header_names = {} 
-
-        for key in ['ref', 'part', 'mfg']:
-            for keyword in HEADER_KEYWORDS[key]:
-                found = False
-                for j, cell in enumerate(row):
-                    if j in used_cols: continue
-                    
-                    cell_value_str = str(cell.get("value", "")).lower().strip().replace(" ", "")
-                    
-                    if keyword.replace(" ", "") in cell_value_str:
-                        temp_map[key] = j
-                        temp_header_names[key] = str(cell.get("value", "")).strip() 
-                        used_cols.add(j); found = True; break
-                if found: break
+    # ヘッダー検出にかかった時間を計測する (行の読み込みの時間はパーサー側の parse に数える)
+    with stage('header'):
+        for i, row in enumerate(itertools.islice(rows_iter, header_scan_rows)):
+            header_candidates.append(row)
+            if not isinstance(row, SheetRow): continue
+            # 各セルは1回だけ正規化し、全キーワードを1パスで照合する
+            temp_map, temp_header_names = header_matcher.score_row(row.values)
         
-        score = len(temp_map)
+            score = len(temp_map)
         
-        if score > best_score:
-            best_score = score
-            header_map = temp_map 
-            header_row_index = i
-            best_header_names = temp_header_names 
+            if score > best_score:
+                best_score = score
+                header_map = temp_map 
+                header_row_index = i
+                best_header_names = temp_header_names 
             
-            if best_score == 3:
-                break
+                if best_score == 3:
+                    break
     
     if 'ref' not in header_map or 'part' not in header_map:
         
@@ -57,33 +58,31 @@ def extract_flat_list_from_rows(data_2d, cancellation_refs=set(), remove_parenth
             return None, error_msg, []
             
         else:
-            error_msg = "ヘッダー行の特定に失敗しました。先頭20行内に、『部品番号』（例: \"Ref\"）と『型番』（例: \"Part Number\"）の両方に一致するキーワードが見つかりませんでした。"
+            error_msg = f"ヘッダー行の特定に失敗しました。先頭{header_scan_rows}行内に、『部品番号』（例: \"Ref\"）と『型番』（例: \"Part Number\"）の両方に一致するキーワードが見つかりませんでした。"
             return None, error_msg, []
 
     flat_list, last_valid = [], {}
     start_index = header_row_index + 1
-    current_refs_from_last_row = []
+    data_rows = itertools.chain(header_candidates[start_index:], rows_iter)
+    del header_candidates
 
-    cancellation_warnings_set = set() 
-    upper_cancellation_refs = {ref.upper() for ref in cancellation_refs}
-    part_strike_warnings_set = set()
+    ref_col, part_col, mfg_col = header_map['ref'], header_map['part'], header_map.get('mfg')
+    if projection is not None:
+        projection.set_columns(header_map.values())
     part_ref_mismatch_warnings_set = set()
 
-    for i, row in enumerate(data_2d[start_index:]):
-    
-        if not isinstance(row, list) or all(c is None or c.get("value", "").strip() == "" for c in row): continue
-        
-        def get_cell_value(key):
-            idx = header_map.get(key)
-            return row[idx] if idx is not None and len(row) > idx and row[idx] is not None else {"value": "", "is_struck": False}
+    # 取り消し線Refはパーサーが行を読み進めるにつれて集まるため、
+    # 1パス目では取り消しに依存しない情報だけを行ごとの小さなレコードに残し、
+    # 全行を読み終えてから2パス目で除外と集計を行う。
+    row_records = []
 
-        ref_cell_obj = get_cell_value('ref')
-        part_cell_obj = get_cell_value('part')
-        mfg_cell_obj = get_cell_value('mfg')
+    for i, row in enumerate(data_rows):
+    
+        if not isinstance(row, SheetRow) or row.is_blank(): continue
         
-        original_ref_val = ref_cell_obj.get("value", "").strip()
-        original_part_val = part_cell_obj.get("value", "").strip()
-        mfg_val_raw = mfg_cell_obj.get("value", "").strip()
+        original_ref_val = row.value(ref_col).strip()
+        original_part_val = row.value(part_col).strip()
+        mfg_val_raw = row.value(mfg_col).strip() if mfg_col is not None else ""
 
         has_ref = bool(original_ref_val)
         has_part = bool(original_part_val)
@@ -114,154 +113,37 @@ def extract_flat_list_from_rows(data_2d, cancellation_refs=set(), remove_parenth
         if is_mfg_continuation: mfg_val_raw = last_valid.get('mfg', '')
         elif mfg_val_raw: last_valid['mfg'] = mfg_val_raw
 
-        if remove_parentheses:
-            ref_val = ref_val_raw.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ')
-        else:
-            ref_val = ref_val_raw
+        # part_val_raw と mfg_val_raw は継続記号を last_valid で置き換えた後の値なので、
+        # レコードには前の行から引き継いだ型番・メーカーも含まれる
+        row_records.append((ref_val_raw, is_ref_continuation, is_part_continuation, is_mfg_continuation,
+                            row.is_struck(part_col), part_val_raw, mfg_val_raw))
 
-        if ref_val:
-            ref_val_spaced_v2 = re.sub(r'([）)])\s*([（(])', r'\1 \2', ref_val)
-            ref_val_spaced_v2 = re.sub(r'([）)])\s*([A-Z]+[0-9]+)', r'\1 \2', ref_val_spaced_v2, flags=re.IGNORECASE)
-            ref_val_spaced_v2 = re.sub(r'([A-Z]+[0-9]+)\s*([（(])', r'\1 \2', ref_val_spaced_v2, flags=re.IGNORECASE)
-            
-#区切り文字の追加--------[,、\s\.\・/\，]の中に　\追加したい文字　で可能
-            all_split_parts = [r for r in re.split(r'[,、\s\.\・/\，]+', ref_val_spaced_v2) if r]
-            
-            expanded_refs = []
-
-            if remove_parentheses:
-                # --- 括弧削除モード (レンジ展開あり) ---
-                last_prefix = ""
-                prefix_regex = re.compile(r'^([A-Z]+)', re.IGNORECASE) 
-                
-                for part in all_split_parts:
-                    prefix_match = prefix_regex.match(part)
-                    if prefix_match:
-                        last_prefix = prefix_match.group(1)
-                    
-                    current_ref = part
-                    if part.isdigit() and last_prefix:
-                        current_ref = f"{last_prefix}{part}"
-                    
-                    range_match = ref_range_pattern.match(current_ref)
-                    ref_match = ref_pattern.match(current_ref)
-                    
-                    if range_match:
-                        prefix, start, opt_prefix, end = range_match.groups()
-                        if start and end:
-                            try:
-                                if not opt_prefix:
-                                    opt_prefix = prefix
-                                
-                                if prefix.upper() == opt_prefix.upper():
-                                    for i in range(int(start), int(end) + 1): 
-                                        expanded_refs.append(f"{prefix}{i}")
-                                    last_prefix = prefix
-                                else:
-                                    expanded_refs.append(current_ref)
-                            except ValueError:
-                                expanded_refs.append(current_ref)
-                        else:
-                             expanded_refs.append(current_ref)
-                    
-                    elif ref_match and ref_match.group(0).upper() == current_ref.upper():
-                        expanded_refs.append(current_ref)
-            
-            else:
-                # --- 括弧保持モード (レンジ展開 "あり" に修正) ---
-                last_prefix = ""
-                prefix_regex = re.compile(r'^([A-Z(（]+)', re.IGNORECASE) 
-                
-                for part in all_split_parts:
-                    temp_part_for_validation = part.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
-                    if not temp_part_for_validation: continue 
-
-                    prefix_match = prefix_regex.match(temp_part_for_validation)
-                    if prefix_match:
-                        last_prefix = prefix_match.group(1)
-                    
-                    current_ref = part
-                    if temp_part_for_validation.isdigit() and last_prefix:
-                        current_ref = re.sub(temp_part_for_validation, f"{last_prefix}{temp_part_for_validation}", part, 1)
-                    
-                    temp_part_for_validation = current_ref.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
-                    if not temp_part_for_validation: continue
-
-                    range_match = ref_range_pattern.match(temp_part_for_validation)
-                    ref_match = ref_pattern.match(temp_part_for_validation)
-                    
-                    if range_match:
-                        prefix, start, opt_prefix, end = range_match.groups()
-                        if start and end:
-                            try:
-                                if not opt_prefix:
-                                    opt_prefix = prefix
-
-                                if not opt_prefix or prefix.upper() == opt_prefix.upper():
-                                    for i in range(int(start), int(end) + 1): 
-                                        expanded_refs.append(f"{prefix}{i}")
-                                    last_prefix = prefix
-                                else:
-                                    expanded_refs.append(current_ref) 
-                            except ValueError:
-                                    expanded_refs.append(current_ref)
-                        else:
-                             expanded_refs.append(current_ref)
-                    
-                    elif ref_match and ref_match.group(0).upper() == temp_part_for_validation.upper():
-                        expanded_refs.append(current_ref) 
+    # --- 2パス目: 取り消し線Refの除外と、フラットリストの生成 ---
+    # 行の結果はレコードと、前の行から引き継いだ部品番号 (部品番号セルが空で、型番かメーカーが継続記号の行だけが使う) で決まる
+    current_refs_from_last_row = ()
 
-            
-            # --- 共通の除去ロジック ---
-            current_refs_from_last_row = []
-            
-            for r in expanded_refs:
-                if not r:
-                    continue
-                
-                normalized_r = r.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip().upper()
-                
-                if normalized_r:
-                    if normalized_r in upper_cancellation_refs:
-                        cancellation_warnings_set.add(normalized_r)
-                    else:
-                        current_refs_from_last_row.append(r)
-
-        elif not is_part_continuation and not is_mfg_continuation:
-            current_refs_from_last_row = []
-
-        # (型番の取り消し線警告チェック)
-        if part_cell_obj.get("is_struck", False) and part_val_raw and current_refs_from_last_row:
-            refs_str = ", ".join(current_refs_from_last_row)
-            warning_msg = f"警告: 部品番号 {refs_str} の 型番 '{part_val_raw}' に取り消し線があります。"
-            part_strike_warnings_set.add(warning_msg)
-
-        part_val_list = [p.strip() for p in part_val_raw.split('\n') if p.strip()]
-        
-        if (not current_refs_from_last_row and not is_ref_continuation) and \
-           (not part_val_list and not is_part_continuation):
-            continue
-
-        if current_refs_from_last_row and part_val_list:
-            for part_line in part_val_list:
-                part_val = part_line.split()[0] if part_line else ""
-                mfg_val = mfg_val_raw if mfg_val_raw else detect_manufacturer(part_val)
-                if part_val:
-                    for r in current_refs_from_last_row:
-                        flat_list.append({"ref": r, "part": part_val, "mfg": mfg_val})
-        
-        elif current_refs_from_last_row and (not part_val_list and not is_part_continuation):
-            mfg_val = mfg_val_raw
-            for r in current_refs_from_last_row:
-                flat_list.append({"ref": r, "part": "", "mfg": mfg_val})
-
-        elif (not current_refs_from_last_row and not is_ref_continuation) and part_val_list:
-            for part_line in part_val_list:
-                part_val = part_line.split()[0] if part_line else ""
-                mfg_val = mfg_val_raw if mfg_val_raw else detect_manufacturer(part_val)
-                if part_val:
-                    flat_list.append({"ref": "", "part": part_val, "mfg": mfg_val})
-        
+    cancellation_warnings_set = set() 
+    upper_cancellation_refs = {ref.upper() for ref in cancellation_refs}
+    part_strike_warnings_set = set()
+    if row_memo is not None:
+        row_memo.begin((remove_parentheses, manufacturer_rules.fingerprint), upper_cancellation_refs)
+
+    for record in row_records:
+        if row_memo is None:
+            outcome = _expand_row(record, current_refs_from_last_row, remove_parentheses, upper_cancellation_refs)
+        else:
+            key = record + (current_refs_from_last_row,) if not record[0] and (record[2] or record[3]) else record
+            outcome = row_memo.lookup(key)
+            if outcome is None:
+                outcome = _expand_row(record, current_refs_from_last_row, remove_parentheses, upper_cancellation_refs)
+                row_memo.store(key, outcome)
+
+        current_refs_from_last_row, row_items, cancelled_refs, strike_warning = outcome
+        flat_list.extend(row_items)
+        if cancelled_refs:
+            cancellation_warnings_set.update(cancelled_refs)
+        if strike_warning:
+            part_strike_warnings_set.add(strike_warning)
     
     # Ref除外警告
     cancellation_warnings = [f"除外: 取り消し線のため {ref} を集計から除外しました。" for ref in sorted(list(cancellation_warnings_set))]
@@ -273,53 +155,164 @@ def extract_flat_list_from_rows(data_2d, cancellation_refs=set(), remove_parenth
     # すべての警告を結合して返す (不揃い警告を先頭に)
     return flat_list, None, part_ref_mismatch_warnings + cancellation_warnings + part_strike_warnings
 
+def _expand_row(record, current_refs_from_last_row, remove_parentheses, upper_cancellation_refs):
+    """
+    1行分のレコードを展開し、(次の行に引き継ぐ部品番号, フラットリストの要素, 除外した部品番号, 型番の取り消し線警告) を返す。
+    """
+    ref_val_raw, is_ref_continuation, is_part_continuation, is_mfg_continuation, part_is_struck, part_val_raw, mfg_val_raw = record
+    row_items = []
+    cancelled_refs = []
+    strike_warning = None
+
+    if ref_val_raw:
+        # --- 共通の除去ロジック ---
+        # 部品番号セルの分解とレンジ展開 (ref_parser.expand はメモ化されている)
+        refs = []
+        for r in expand_refs(ref_val_raw, remove_parentheses):
+            if not r:
+                continue
+
+            normalized_r = normalize_ref(r)
+
+            if normalized_r:
+                if normalized_r in upper_cancellation_refs:
+                    cancelled_refs.append(normalized_r)
+                else:
+                    refs.append(r)
+        current_refs_from_last_row = tuple(refs)
+
+    elif not is_part_continuation and not is_mfg_continuation:
+        current_refs_from_last_row = ()
+
+    # (型番の取り消し線警告チェック)
+    if part_is_struck and part_val_raw and current_refs_from_last_row:
+        refs_str = ", ".join(current_refs_from_last_row)
+        strike_warning = f"警告: 部品番号 {refs_str} の 型番 '{part_val_raw}' に取り消し線があります。"
+
+    part_val_list = [p.strip() for p in part_val_raw.split('\n') if p.strip()]
+
+    if current_refs_from_last_row and part_val_list:
+        for part_line in part_val_list:
+            part_val = part_line.split()[0] if part_line else ""
+            mfg_val = mfg_val_raw if mfg_val_raw else detect_manufacturer(part_val)
+            if part_val:
+                for r in current_refs_from_last_row:
+                    row_items.append({"ref": r, "part": part_val, "mfg": mfg_val})
+
+    elif current_refs_from_last_row and (not part_val_list and not is_part_continuation):
+        mfg_val = mfg_val_raw
+        for r in current_refs_from_last_row:
+            row_items.append({"ref": r, "part": "", "mfg": mfg_val})
+
+    elif (not current_refs_from_last_row and not is_ref_continuation) and part_val_list:
+        for part_line in part_val_list:
+            part_val = part_line.split()[0] if part_line else ""
+            mfg_val = mfg_val_raw if mfg_val_raw else detect_manufacturer(part_val)
+            if part_val:
+                row_items.append({"ref": "", "part": part_val, "mfg": mfg_val})
+
+    return current_refs_from_last_row, row_items, cancelled_refs, strike_warning
+
 # --- コアロジック 2: フラットリストを集計 ---
-def group_and_finalize_bom(flat_list):
-    # (この関数 (group_and_finalize_bom) は変更なし)
-    ref_to_part_map = {}
-    grouped_map = {}
-    
-    for item in flat_list:
-        key = f"{item['part']}||{item['mfg']}"
-        ref = item['ref']
-        if key not in grouped_map:
-            grouped_map[key] = {'refs': set(), 'part': item['part'], 'mfg': item['mfg']}
-        grouped_map[key]['refs'].add(ref)
-        
-        if ref not in ref_to_part_map:
-            ref_to_part_map[ref] = set()
-        ref_to_part_map[ref].add(key)
-
-    warnings = []
-    for ref, part_keys in ref_to_part_map.items():
-        if len(part_keys) > 1:
-            part_list = [k.split('||')[0] for k in part_keys]
-            warning_message = f"重複警告: 部品番号 '{ref}' が複数の異なる型番に割り当てられています: [{', '.join(part_list)}]"
-            warnings.append(warning_message)
-
-    final_results = []
-    
-    def sort_key_func(ref_string):
-        normalized_ref = ref_string.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
-        parts = re.split('([0-9]+)', normalized_ref)
-        key_parts = []
-        for part in parts:
-            if part.isdigit():
-                key_parts.append(int(part))
+_digits_split_pattern = re.compile('([0-9]+)')
+
+def ref_sort_key(ref_string):
+    # 部品番号の自然順 (C2 < C10) の並べ替えキー
+    normalized_ref = ref_string.replace('(', ' ').replace(')', ' ').replace('（', ' ').replace('）', ' ').strip()
+    return [int(part) if part.isdigit() else part.lower() for part in _digits_split_pattern.split(normalized_ref)]
+
+
+class BomAggregator:
+    """
+    フラットリストを (型番, メーカー) ごとにまとめる集計器。
+    add() でフラットリストを追加し、merge() で別の集計器 (例: 他のシートの集計) を取り込める。
+    finalize() は (集計結果, 重複警告) を返す。previous_groups (前の版の集計器の sorted_groups()) を渡すと、
+    部品番号が前の版と同じグループは並べ替えをやり直さない (sorted_groups() を取った集計器には、それ以上追加しない)。
+    グループと部品番号の並び順は、すべてのフラットリストを順につなげて集計した場合と同じになる。
+    """
+
+    def __init__(self, flat_items=None):
+        self._groups = {}    # (型番, メーカー) -> 部品番号の set
+        self._ref_parts = {} # 部品番号 -> {(型番, メーカー): None} (割り当てられた順)
+        # (型番, メーカー) -> (並べ替えたときの部品番号の数, 並べ替え済みの部品番号)
+        # 部品番号は増えるだけなので、数が変わっていなければ前回の並べ替え結果をそのまま使える
+        self._sorted = {}
+        if flat_items:
+            self.add(flat_items)
+
+    def add(self, flat_items):
+        groups, ref_parts = self._groups, self._ref_parts
+        for item in flat_items:
+            key = (item['part'], item['mfg'])
+            ref = item['ref']
+            refs = groups.get(key)
+            if refs is None:
+                groups[key] = {ref}
             else:
-                key_parts.append(part.lower())
-        return key_parts
+                refs.add(ref)
+            parts = ref_parts.get(ref)
+            if parts is None:
+                ref_parts[ref] = {key: None}
+            else:
+                parts[key] = None
+        return self
 
-    for group in grouped_map.values():
-        sorted_refs = sorted(list(group['refs']), key=sort_key_func)
-        
-        # ▼▼▼ 変更 (ここがバグ修正) ▼▼▼
-        # sorted_refs から "" (空文字列) を除外してから join する
-        filtered_refs = [ref for ref in sorted_refs if ref]
-        # ▲▲▲ 変更ここまで ▲▲▲
+    def merge(self, other):
+        groups, ref_parts = self._groups, self._ref_parts
+        for key, other_refs in other._groups.items():
+            refs = groups.get(key)
+            if refs is None:
+                groups[key] = set(other_refs)
+                # 相手だけにあるグループは、相手の並べ替え結果をそのまま使える
+                if key in other._sorted:
+                    self._sorted[key] = other._sorted[key]
+            else:
+                refs |= other_refs
+        for ref, other_parts in other._ref_parts.items():
+            parts = ref_parts.get(ref)
+            if parts is None:
+                ref_parts[ref] = dict(other_parts)
+            else:
+                parts.update(other_parts)
+        return self
+
+    def finalize(self, previous_groups=None):
+        warnings = []
+        for ref, part_keys in self._ref_parts.items():
+            if len(part_keys) > 1:
+                part_list = [part for part, _ in part_keys]
+                warning_message = f"重複警告: 部品番号 '{ref}' が複数の異なる型番に割り当てられています: [{', '.join(part_list)}]"
+                warnings.append(warning_message)
+
+        final_results = []
+        for key, refs in self._groups.items():
+            cached = self._sorted.get(key)
+            if cached is not None and cached[0] == len(refs):
+                sorted_refs = cached[1]
+            else:
+                previous = previous_groups.get(key) if previous_groups else None
+                if previous is not None and previous[0] == refs:
+                    sorted_refs = previous[1]
+                else:
+                    sorted_refs = self._sort_refs(refs)
+                self._sorted[key] = (len(refs), sorted_refs)
+            part, mfg = key
+            final_results.append({'ref': ', '.join(sorted_refs), 'part': part, 'mfg': mfg})
+
+        return final_results, warnings
 
-        final_results.append({'ref': ', '.join(filtered_refs), 'part': group['part'], 'mfg': group['mfg']})
+    def sorted_groups(self):
+        """finalize() の後に、{(型番, メーカー): (部品番号の set, 並べ替え済みの部品番号)} を返す (次の版の finalize 用)。"""
+        sorted_refs = self._sorted
+        return {key: (refs, sorted_refs[key][1]) for key, refs in self._groups.items()}
 
-    return final_results, warnings
+    def _sort_refs(self, refs):
+        # 空文字列の部品番号は除外して自然順に並べる
+        if len(refs) == 1:
+            return [ref for ref in refs if ref]
+        # 先に文字列として並べておき、自然順で同じになるもの (C1 と c1 など) の順序を毎回同じにする
+        return [ref for ref in sorted(sorted(refs), key=ref_sort_key) if ref]
 
 
+def group_and_finalize_bom(flat_list):
+    return BomAggregator(flat_list).finalize()
@@ -0,0 +1,254 @@
+# cli.py
+import os
+import time
+import fnmatch
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# --- 自作モジュールをインポート ---
+from pipeline import (
+    ProcessingError,
+    SUPPORTED_EXTENSIONS,
+    collect_file,
+    finalize_collected
+)
+from file_source import FileSource
+from workbook_info import list_sheets
+from exporter import write_csv, write_xlsx
+from log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# --- コマンドラインからの一括変換 (Flask を使わない) ---
+#   python -m bom_tool 入力 [入力 ...] -o 出力先 [--sheets 'BOM*'] [--format csv,xlsx] [--workers N]
+# 入力にはファイルまたはフォルダを指定する (フォルダは中の対応形式のファイルをすべて処理する)。
+# 入力ファイルごとに、出力先へ 全体集計の CSV / Excel と警告のテキストファイル (<元のファイル名>.warnings.txt) を書き出す。
+# フォルダの中のファイルは、出力先にも同じフォルダ構成で書き出す。
+# 出力先のファイル名が重なる入力 (別々のフォルダの bom.xlsx を直接指定したときなど) があれば、何も処理せずに止める。
+OUTPUT_FORMATS = ('csv', 'xlsx')
+WARNINGS_SUFFIX = '.warnings.txt'
+
+
+def _is_skipped_name(name):
+    # 隠しファイルや Excel の一時ファイル (~$xxx.xlsx) は対象にしない
+    return name.startswith(('.', '~$'))
+
+
+def find_inputs(paths, recursive=True):
+    """
+    指定されたファイル/フォルダから、(入力ファイルのパス, 出力先からの相対パス) のリストを返す。
+    フォルダの中は名前順に並べ、対応していない形式のファイルは読み飛ばす。直接指定したファイルは形式を問わず含める。
+    同じファイルを2回指定しても1回だけ含める。
+    """
+    inputs = []
+    seen = set()
+    def add(file_path, relative_path):
+        real_path = os.path.realpath(file_path)
+        if real_path not in seen:
+            seen.add(real_path)
+            inputs.append((file_path, relative_path))
+
+    for path in paths:
+        if not os.path.isdir(path):
+            add(path, os.path.basename(path))
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names[:] = sorted(name for name in dir_names if recursive and not _is_skipped_name(name))
+            for name in sorted(file_names):
+                if _is_skipped_name(name) or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                file_path = os.path.join(dir_path, name)
+                add(file_path, os.path.relpath(file_path, path))
+    return inputs
+
+
+def output_clashes(inputs):
+    """
+    find_inputs の結果のうち、出力先からの相対パスが重なる (大文字小文字の違いだけのものも含む) 入力を
+    [(相対パス, [入力ファイルのパス, ...]), ...] で返す。
+    例えば別々のフォルダにある bom.xlsx を2つ直接指定すると、出力がどちらも bom.xlsx.csv になる。
+    """
+    groups = {}
+    for input_path, relative_path in inputs:
+        groups.setdefault(os.path.normcase(relative_path).lower(), []).append((input_path, relative_path))
+    return [(entries[0][1], [input_path for input_path, _ in entries]) for entries in groups.values() if len(entries) > 1]
+
+
+def output_paths(output_base, formats):
+    """出力先の (形式, パス) のリスト。最後は警告ファイル。"""
+    return [(output_format, f"{output_base}.{output_format}") for output_format in formats] + \
+           [('warnings', output_base + WARNINGS_SUFFIX)]
+
+
+def select_sheets(filename, source, sheet_patterns):
+    """
+    Excel ファイルのうち、シート名がいずれかのパターン (glob, 大文字小文字を区別しない) に一致するシート名のリストを返す。
+    パターンが無い、または Excel 以外のファイルなら None (全シート)。
+    """
+    if not sheet_patterns or not filename.lower().endswith(('.xlsx', '.xls')):
+        return None
+    patterns = [pattern.lower() for pattern in sheet_patterns]
+    selected = [sheet["name"] for sheet in list_sheets(filename, source)
+                if any(fnmatch.fnmatchcase(sheet["name"].lower(), pattern) for pattern in patterns)]
+    if not selected:
+        raise ProcessingError(f"指定された条件 ({', '.join(sheet_patterns)}) に一致するシートがありません。", 400)
+    return selected
+
+
+def _write_atomic(path, write):
+    # 途中で止まっても書きかけのファイルが残らないよう、一時ファイルに書いてから置き換える
+    tmp_path = path + '.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_warnings(path, sheet_errors, warnings):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for sheet_name, error in sheet_errors:
+            f.write(f"[{sheet_name}] {error}\n")
+        for warning in warnings:
+            f.write(f"{warning}\n")
+
+
+def convert_file(input_path, output_base, formats, sheet_patterns=None, remove_parentheses=True):
+    """
+    入力ファイル1件を変換して出力ファイルを書き出し、結果の dict を返す (ワーカープロセスで実行する)。
+    {"input", "bytes", "seconds", "rows", "warnings", "error"}。エラーは送出せずに "error" に入れて返す。
+    """
+    start = time.perf_counter()
+    filename = os.path.basename(input_path)
+    outcome = {"input": input_path, "bytes": 0, "rows": 0, "warnings": 0, "error": None}
+    source = FileSource(path=input_path) # 入力ファイルは読むだけ (close() しても削除しない)
+    try:
+        outcome["bytes"] = source.size
+        selected_sheets = select_sheets(filename, source, sheet_patterns)
+        # ファイル単位で並列化するので、ファイルの中のシート/ページは1プロセスで処理する
+        collected = collect_file(filename, source, selected_sheets=selected_sheets, remove_parentheses=remove_parentheses,
+                                 sheet_workers=1, pdf_workers=1, strict=False)
+        combined = finalize_collected(collected.aggregator, collected.cancellation_warnings)
+
+        os.makedirs(os.path.dirname(output_base) or '.', exist_ok=True)
+        sheet_errors = [(sheet_name, sheet["error"]) for sheet_name, sheet in collected.individual.items()
+                        if "error" in sheet]
+        for output_format, path in output_paths(output_base, formats):
+            if output_format == 'csv':
+                _write_atomic(path, lambda tmp_path: write_csv(combined["data"], tmp_path))
+            elif output_format == 'xlsx':
+                _write_atomic(path, lambda tmp_path: write_xlsx(combined["data"], tmp_path))
+            else:
+                _write_atomic(path, lambda tmp_path: _write_warnings(tmp_path, sheet_errors, combined["warnings"]))
+        outcome["rows"] = len(combined["data"])
+        outcome["warnings"] = len(sheet_errors) + len(combined["warnings"])
+    except ProcessingError as e:
+        outcome["error"] = e.message
+    except Exception as e:
+        logger.exception("変換中に予期せぬエラーが発生しました", extra={"upload": input_path})
+        outcome["error"] = f"変換中に予期せぬエラーが発生しました: {e}"
+    finally:
+        source.close()
+    outcome["seconds"] = time.perf_counter() - start
+    return outcome
+
+
+def _report(index, total, outcome):
+    status = 'NG' if outcome["error"] else 'OK'
+    detail = outcome["error"] if outcome["error"] else \
+        f"{outcome['rows']:,} 行, 警告 {outcome['warnings']} 件, {outcome['seconds']:.2f} 秒"
+    print(f"[{index:>{len(str(total))}}/{total}] {status} {outcome['input']}: {detail}", flush=True)
+
+
+def run(tasks, workers, log_level):
+    """
+    tasks: convert_file の引数の dict のリスト。workers 個のプロセスで変換し、結果を完了順に返す。
+    """
+    outcomes = []
+    if workers <= 1:
+        for task in tasks:
+            outcomes.append(convert_file(**task))
+            _report(len(outcomes), len(tasks), outcomes[-1])
+        return outcomes
+
+    # 大きいファイルから先に投入し、最後に大きなファイルが1つだけ残って待たされるのを避ける
+    tasks = sorted(tasks, key=lambda task: os.path.getsize(task["input_path"]), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_logging, initargs=(log_level,)) as executor:
+        futures = [executor.submit(convert_file, **task) for task in tasks]
+        for future in as_completed(futures):
+            outcomes.append(future.result())
+            _report(len(outcomes), len(tasks), outcomes[-1])
+    return outcomes
+
+
+def print_summary(outcomes, skipped, elapsed):
+    failed = [outcome for outcome in outcomes if outcome["error"]]
+    total_bytes = sum(outcome["bytes"] for outcome in outcomes)
+    total_rows = sum(outcome["rows"] for outcome in outcomes)
+    per_second = lambda value: value / elapsed if elapsed > 0 else 0.0
+    print("--- 集計 ---")
+    print(f"ファイル: {len(outcomes) + skipped} 件 (成功 {len(outcomes) - len(failed)} / 失敗 {len(failed)} / スキップ {skipped})")
+    print(f"所要時間: {elapsed:.1f} 秒 ({per_second(len(outcomes)):.2f} ファイル/秒, "
+          f"{per_second(total_bytes) / 1e6:.2f} MB/秒, 出力 {per_second(total_rows):,.0f} 行/秒)")
+    if failed:
+        print("失敗したファイル:")
+        for outcome in sorted(failed, key=lambda outcome: outcome["input"]):
+            print(f"  {outcome['input']}: {outcome['error']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m bom_tool', description="BOMファイルを一括変換する (CSV / Excel と警告ファイルを書き出す)")
+    parser.add_argument('inputs', nargs='+', help="入力ファイルまたはフォルダ")
+    parser.add_argument('-o', '--output-dir', required=True, help="出力先のフォルダ")
+    parser.add_argument('--sheets', action='append', metavar='GLOB',
+                        help="処理するシート名のパターン (例: 'BOM*'。複数指定可。省略すると全シート)")
+    parser.add_argument('--format', default='csv',
+                        help=f"出力形式 ({', '.join(OUTPUT_FORMATS)} をカンマ区切り。既定: csv)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="ワーカープロセス数 (既定: CPU数。1 なら並列化しない)")
+    parser.add_argument('--keep-parentheses', action='store_true', help="部品番号の括弧 () を削除しない")
+    parser.add_argument('--no-recursive', action='store_true', help="フォルダの中のサブフォルダを処理しない")
+    parser.add_argument('--skip-existing', action='store_true', help="出力ファイルがすべて揃っている入力は処理しない")
+    parser.add_argument('-v', '--verbose', action='store_true', help="処理の詳細をログに出す")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    formats = [value for value in args.format.split(',') if value]
+    for output_format in formats:
+        if output_format not in OUTPUT_FORMATS:
+            parser.error(f"不明な出力形式です: {output_format}")
+    for path in args.inputs:
+        if not os.path.exists(path):
+            parser.error(f"入力が見つかりません: {path}")
+
+    log_level = 'INFO' if args.verbose else 'WARNING'
+    configure_logging(log_level)
+
+    inputs = find_inputs(args.inputs, recursive=not args.no_recursive)
+    clashes = output_clashes(inputs)
+    if clashes:
+        # 黙って上書き (--skip-existing なら読み飛ばし) しないよう、処理を始める前に止める
+        lines = [f"  {relative_path}: {', '.join(input_paths)}" for relative_path, input_paths in clashes]
+        parser.error("出力先のファイル名が重なる入力があります (別々の出力先に分けて実行してください):\n" + '\n'.join(lines))
+
+    tasks = []
+    skipped = 0
+    for input_path, relative_path in inputs:
+        # 元の拡張子も残す (同じ名前の .xlsx と .csv があっても出力が重ならないように)
+        output_base = os.path.join(args.output_dir, relative_path)
+        if args.skip_existing and all(os.path.exists(path) for _, path in output_paths(output_base, formats)):
+            skipped += 1
+            continue
+        tasks.append({"input_path": input_path, "output_base": output_base, "formats": formats,
+                      "sheet_patterns": args.sheets, "remove_parentheses": not args.keep_parentheses})
+
+    start = time.perf_counter()
+    outcomes = run(tasks, max(1, min(args.workers, len(tasks))), log_level)
+    print_summary(outcomes, skipped, time.perf_counter() - start)
+    return 1 if any(outcome["error"] for outcome in outcomes) else 0
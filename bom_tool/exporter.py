@@ -0,0 +1,62 @@
+# exporter.py
+import io
+import csv
+import codecs
+
+import openpyxl
+
+# --- 変換結果のファイル書き出し (CSV / Excel) ---
+EXPORT_HEADER = ['部品番号', '部品型番', 'メーカー']
+CSV_FLUSH_ROWS = 1000 # この行数ごとにまとめて送り出す
+
+
+def select_tab(result, tab):
+    """
+    結果からタブ ('combined' またはシート名) の行リストを取り出す。無ければ None。
+    """
+    if not tab or tab == 'combined':
+        return result["combined"]["data"]
+    sheet = result.get("individual", {}).get(tab)
+    if not sheet or "data" not in sheet:
+        return None
+    return sheet["data"]
+
+
+def _export_row(row):
+    return [row.get('ref', ''), row.get('part', ''), row.get('mfg', '')]
+
+
+def iter_csv_chunks(rows):
+    """
+    CSV を BOM付きUTF-8 (Excelで開いても文字化けしない) のバイト列として少しずつ返す。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    yield codecs.BOM_UTF8
+    for i, row in enumerate(rows, 1):
+        writer.writerow(_export_row(row))
+        if i % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_csv(rows, save_path):
+    with open(save_path, 'wb') as f:
+        for chunk in iter_csv_chunks(rows):
+            f.write(chunk)
+
+
+def write_xlsx(rows, target):
+    """
+    openpyxl の write_only モードで Excel ファイルを書き出す (セルのオブジェクトを溜め込まない)。
+    target はパスまたはバイナリのファイルオブジェクト。
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('BOM')
+    sheet.append(EXPORT_HEADER)
+    for row in rows:
+        sheet.append(_export_row(row))
+    workbook.save(target)
@@ -1,24 +1,38 @@
 # file_parsers.py
+import io
+import os
 import re
 import csv
+import itertools
+import math
+import bisect
+import functools
 import pdfplumber
 import xlrd 
+from concurrent.futures import ProcessPoolExecutor
 
 # --- 自作モジュールからインポート ---
 from utils import ref_pattern
+from sheet_table import make_row
+from text_reader import iter_lines
 
 # --- rich_text=True モードで読み込んだExcelセルを処理する ---
-def parse_single_excel_sheet_rich_text(sheet):
-    data = []
+# 行は SheetRow (セル文字列のタプル + 取り消し線ビットマスク) としてジェネレータで遅延的に返す。
+# cancellation_refs は行を読み進めるにつれて埋まる。
+# 各パーサーの projection (sheet_table.ColumnProjection) は、ヘッダーが決まった後の行を必要な列だけに絞るためのもの。
+def parse_single_excel_sheet_rich_text(sheet, projection=None):
     cancellation_refs = set()
-    
+    return _iter_excel_sheet_rich_text(sheet, cancellation_refs, projection), cancellation_refs
+
+def _iter_excel_sheet_rich_text(sheet, cancellation_refs, projection):
     for row in sheet.iter_rows():
-        row_data = []
-        for cell in row:
+        row_values = []
+        row_struck = 0
+        for col, cell in enumerate(row):
             cell_full_text = ""
             
             if cell.value is None:
-                row_data.append({"value": "", "is_struck": False})
+                row_values.append("")
                 continue
 
             if isinstance(cell.value, list):
@@ -35,7 +49,8 @@ def parse_single_excel_sheet_rich_text(sheet):
                                 text_to_cancel += " " + run.text
                                 cell_has_strike = True # 型番警告用にフラグを立てる
                 
-                row_data.append({"value": cell_full_text, "is_struck": cell_has_strike})
+                row_values.append(cell_full_text)
+                if cell_has_strike: row_struck |= 1 << col
                 
                 if text_to_cancel:
                     found_refs = ref_pattern.findall(text_to_cancel)
@@ -49,99 +64,402 @@ def parse_single_excel_sheet_rich_text(sheet):
                 if cell.font and cell.font.strike:
                     cell_is_struck = True
 
-                row_data.append({"value": cell_full_text, "is_struck": cell_is_struck})
+                row_values.append(cell_full_text)
                 
                 if cell_is_struck: # Ref除外ロジックは従来通り
+                    row_struck |= 1 << col
                     found_refs = ref_pattern.findall(cell_full_text)
                     for ref in found_refs:
                         cancellation_refs.add(ref)
         
-        data.append(row_data)
-        
-    return data, cancellation_refs
+        if projection is not None and projection.columns is not None:
+            yield projection.project(len(row_values), row_values.__getitem__, row_struck)
+        else:
+            yield make_row(row_values, row_struck)
 
 # --- xlrd (.xls) 用のパーサー ---
-def parse_single_excel_sheet_xls(sheet, book):
-    data = []
+# 行は SheetRow としてジェネレータで遅延的に返す。cancellation_refs は行を読み進めるにつれて埋まる。
+# セルを1つずつ sheet.cell() で取り出さず、行ごとに値・型・XF番号の配列をまとめて読む。
+# 取り消し線は、取り消し線のフォントを使う XF 番号の集合をシートの読み始めに1度だけ作って判定する。
+# 値は型に合わせて文字列にする (整数の数値は "100.0" ではなく "100"、日付は日時、真偽値は True/False、エラーは "#N/A" など)。
+_XLS_TEXT_TYPES = frozenset((xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_TEXT, xlrd.XL_CELL_BLANK))
+_XLS_MAX_INT_FLOAT = 2 ** 53 # これより大きい数値は整数でも指数表記のまま (float で正確に表せる範囲)
+
+def parse_single_excel_sheet_xls(sheet, book, projection=None):
     cancellation_refs = set()
-    
+    return _iter_excel_sheet_xls(sheet, book, cancellation_refs, projection), cancellation_refs
+
+def struck_xf_indexes(book):
+    """book (formatting_info=True で開いたもの) の XF のうち、取り消し線のフォントを使うものの番号の集合。"""
     fonts = book.font_list
-    
+    return frozenset(
+        xf_index for xf_index, xf in enumerate(book.xf_list)
+        if xf.font_index < len(fonts) and fonts[xf.font_index].struck_out
+    )
+
+def xls_cell_text(cell_type, value, datemode):
+    """xlrd のセルの値を、型に合わせて文字列にする。"""
+    if cell_type in _XLS_TEXT_TYPES:
+        return value
+    if cell_type == xlrd.XL_CELL_NUMBER:
+        if value.is_integer() and abs(value) < _XLS_MAX_INT_FLOAT:
+            return str(int(value))
+        return str(value)
+    if cell_type == xlrd.XL_CELL_DATE:
+        try:
+            date_value = xlrd.xldate_as_datetime(value, datemode)
+        except Exception:
+            return str(value)
+        return str(date_value.time()) if 0 <= value < 1 else str(date_value)
+    if cell_type == xlrd.XL_CELL_BOOLEAN:
+        return str(bool(value))
+    if cell_type == xlrd.XL_CELL_ERROR:
+        return xlrd.error_text_from_code.get(value, f'#ERR{value}')
+    return str(value)
+
+def _xls_text_at(cell_types, cell_values, datemode, col):
+    # 列の絞り込み中に、必要になったセルだけを文字列にする
+    cell_type = cell_types[col]
+    return cell_values[col] if cell_type in _XLS_TEXT_TYPES else xls_cell_text(cell_type, cell_values[col], datemode)
+
+def _iter_excel_sheet_xls(sheet, book, cancellation_refs, projection):
+    struck_xfs = struck_xf_indexes(book) if sheet.formatting_info and book.font_list else frozenset()
+    # セル自身に XF が無い (-1: 空いたセルや、行の長さを揃えるために足されたセル) ときは、
+    # 行・列の書式か既定の XF (15) になる。そのどれかが取り消し線のときだけ、セルごとに調べる。
+    check_missing_xf = bool(struck_xfs) and (
+        15 in struck_xfs
+        or any(info.xf_index in struck_xfs for info in sheet.rowinfo_map.values())
+        or any(info.xf_index in struck_xfs for info in sheet.colinfo_map.values())
+    )
+    # 行ごとの XF 番号の一覧は xlrd の非公開の属性 (Sheet._cell_xf_indexes) なので、xlrd の更新で無くなったときは
+    # 公開の sheet.cell_xf_index で1セルずつ調べる (行・列の書式と既定の XF もそちらで解決される)
+    cell_xf_indexes = getattr(sheet, '_cell_xf_indexes', None)
+    datemode = book.datemode
+    text_types = _XLS_TEXT_TYPES
+    number_type = xlrd.XL_CELL_NUMBER
+    max_int = _XLS_MAX_INT_FLOAT
+
     for r_idx in range(sheet.nrows):
-        row_data = []
-        
-        for c_idx in range(sheet.ncols):
-            cell = sheet.cell(r_idx, c_idx)
-            
-            cell_full_text = str(cell.value)
-            
-            cell_is_struck = False
-            if fonts:
-                try:
-                    xf = book.xf_list[cell.xf_index]
-                    font = fonts[xf.font_index]
-                    if font.struck_out:
-                        cell_is_struck = True
-                except Exception as e:
-                    pass 
-            
-            row_data.append({"value": cell_full_text, "is_struck": cell_is_struck})
-            
-            if cell_is_struck:
-                found_refs = ref_pattern.findall(cell_full_text)
-                for ref in found_refs:
-                    cancellation_refs.add(ref)
-        
-        data.append(row_data)
-        
-    return data, cancellation_refs
+        cell_types = sheet.row_types(r_idx)
+        cell_values = sheet.row_values(r_idx)
+        if projection is None or projection.columns is None:
+            # 文字列と整数の数値 (番号・数量) がほとんどなので、この2つは関数を呼ばずに済ませる
+            row_values = [
+                value if cell_type in text_types
+                else str(int(value)) if cell_type == number_type and value.is_integer() and -max_int < value < max_int
+                else xls_cell_text(cell_type, value, datemode)
+                for cell_type, value in zip(cell_types, cell_values)
+            ]
+            text_of = row_values.__getitem__
+        else:
+            row_values = None
+            text_of = functools.partial(_xls_text_at, cell_types, cell_values, datemode)
+        row_struck = 0
+
+        if struck_xfs:
+            if cell_xf_indexes is not None:
+                xf_row = cell_xf_indexes[r_idx]
+            else:
+                xf_row = [sheet.cell_xf_index(r_idx, c_idx) for c_idx in range(len(cell_types))]
+            if not struck_xfs.isdisjoint(xf_row) or (check_missing_xf and -1 in xf_row):
+                for c_idx, xf_index in enumerate(xf_row):
+                    if xf_index < 0 and check_missing_xf:
+                        xf_index = sheet.cell_xf_index(r_idx, c_idx)
+                    if xf_index in struck_xfs:
+                        row_struck |= 1 << c_idx
+                        cancellation_refs.update(ref_pattern.findall(text_of(c_idx)))
 
+        if row_values is None:
+            yield projection.project(len(cell_values), text_of, row_struck)
+        else:
+            yield make_row(row_values, row_struck)
 
-# --- CSV / TXT パーサー ---
-def parse_csv_or_txt(file_stream, delimiters):
-    file_stream.seek(0)
-    try: text_data = file_stream.read().decode('utf-8')
-    except UnicodeDecodeError:
-        file_stream.seek(0)
-        text_data = file_stream.read().decode('shift_jis', errors='replace')
-    lines = text_data.splitlines()
-    data_2d = []
+
+# --- CSV / TXT パーサー (行ジェネレータ) ---
+# file_stream はバイナリストリームのほか、bytes / mmap も受け付ける。デコードは text_reader で少しずつ行う。
+# delimiters は拡張子から決まる既定の区切り ([','] なら CSV、それ以外は正規表現で分割する TXT)。
+# 先頭 SNIFF_LINES 行から区切り文字を推測する:
+#   CSV: ',' / ';' / タブ / '|' のうち、最も多くの行に出てくるもの (同数なら ',')
+#   TXT: 既定の区切りが1つも無い場合だけ、',' / ';' / '|' で区切られた CSV として読む
+SNIFF_LINES = 50
+_CSV_DELIMITERS = (',', ';', '\t', '|')
+_TXT_FALLBACK_DELIMITERS = (',', ';', '|') # タブや連続した空白で区切られていない .txt 用
+
+_splitters = {} # 区切りの正規表現 -> コンパイル済みの split
+
+def _get_splitter(delimiters):
+    delimiter_regex = '|'.join(delimiters)
+    splitter = _splitters.get(delimiter_regex)
+    if splitter is None:
+        splitter = _splitters[delimiter_regex] = re.compile(delimiter_regex).split
+    return splitter
+
+def _sniff_delimiter(sample, candidates):
+    # sample の行のうち、最も多くの行に出てくる区切り文字 (同数なら candidates の先のもの)。どれも無ければ None
+    counts = [(sum(1 for line in sample if candidate in line), candidate) for candidate in candidates]
+    best_count, best = max(counts, key=lambda item: item[0])
+    return best if best_count else None
+
+def _clean_cell(cell):
+    return cell.strip().strip('"').strip(',').strip()
+
+def _make_text_row(cells, projection):
+    # 列の絞り込み中は、必要な列のセルだけを整える
+    if projection is None or projection.columns is None:
+        return make_row(list(map(_clean_cell, cells)))
+    return projection.project(len(cells), lambda col: _clean_cell(cells[col]))
+
+def parse_csv_or_txt(file_stream, delimiters, projection=None):
+    lines = iter_lines(file_stream)
+    sample = list(itertools.islice(lines, SNIFF_LINES))
+    lines = itertools.chain(sample, lines)
     if len(delimiters) == 1: # CSV
-        reader = csv.reader(lines)
-        for row in reader:
-            cleaned_row = []
-            for cell in row:
-                cleaned_cell = cell.strip().strip('"').strip(',').strip()
-                cleaned_row.append({"value": cleaned_cell, "is_struck": False})
-            data_2d.append(cleaned_row)
+        candidates = delimiters + [candidate for candidate in _CSV_DELIMITERS if candidate not in delimiters]
+        delimiter = _sniff_delimiter(sample, candidates) or delimiters[0]
     else: # TXT
-        delimiter_regex = '|'.join(delimiters)
-        for line in lines:
-            split_row = re.split(delimiter_regex, line)
-            cleaned_row = []
-            for cell in split_row:
-                cleaned_cell = cell.strip().strip('"').strip(',').strip()
-                cleaned_row.append({"value": cleaned_cell, "is_struck": False})
-            data_2d.append(cleaned_row)
-    return data_2d
-
-# --- PDF パーサー ---
-def parse_pdf(file_stream):
-    data_2d = []
-    with pdfplumber.open(file_stream) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table()
-            if table: data_2d.extend(table)
+        splitter = _get_splitter(delimiters)
+        delimiter = None
+        if not any(len(splitter(line, 1)) > 1 for line in sample):
+            delimiter = _sniff_delimiter(sample, _TXT_FALLBACK_DELIMITERS)
+        if delimiter is None:
+            for line in lines:
+                yield _make_text_row(splitter(line), projection)
+            return
+    for row in csv.reader(lines, delimiter=delimiter):
+        yield _make_text_row(row, projection)
+
+# --- PDF のページ範囲指定 ("2-10,12,15-" 形式, 1始まり) ---
+_page_range_item_pattern = re.compile(r'^(\d+)\s*(?:-\s*(\d*))?$')
+
+def parse_page_range(spec):
+    """
+    ページ範囲の文字列を [(開始, 終了 or None), ...] に変換する。空文字なら None (全ページ)。
+    書式が不正な場合は ValueError を送出する。
+    """
+    if spec is None or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.replace('，', ',').split(','):
+        item = item.strip()
+        if not item: continue
+        m = _page_range_item_pattern.match(item)
+        if not m:
+            raise ValueError(f"ページ範囲の指定が不正です: '{item}'")
+        start = int(m.group(1))
+        if m.group(2) is None: end = start            # "5"
+        elif m.group(2) == '': end = None             # "5-" (最後まで)
+        else: end = int(m.group(2))                   # "5-8"
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"ページ範囲の指定が不正です: '{item}'")
+        ranges.append((start, end))
+    return ranges or None
+
+def _select_page_indices(page_ranges, page_count):
+    # 0始まりのページ番号を、ページ順・重複なしで返す
+    if not page_ranges:
+        return list(range(page_count))
+    selected = set()
+    for start, end in page_ranges:
+        last = page_count if end is None else min(end, page_count)
+        selected.update(range(start - 1, last))
+    return sorted(selected)
+
+# --- PDF 1ページ分の生の行 (セルは str または None) を取り出す ---
+def _extract_page_rows(page):
+    page_rows = []
+    table = page.extract_table()
+    if table: page_rows.extend(table)
+    else: page_rows.extend(_split_text_rows(page))
+    # 処理済みページのキャッシュ (文字・図形オブジェクト) を解放する
+    if hasattr(page, 'close'): page.close()
+    return page_rows
+
+def _split_text_rows(page):
+    # 表の無いページは、テキストの各行を2つ以上の空白で区切る
+    text = page.extract_text()
+    if not text:
+        return []
+    return [re.split(r'\s{2,}', line) for line in text.split('\n')]
+
+# --- PDF の表の列の境界の使い回し (BOM_PDF_TABLE_MODE=reuse) ---
+# 仕入先のBOMのPDFはどのページも同じ形の表なので、最初に表を検出したページの列の境界 (x座標) を覚えておき、
+# 後のページは表を検出し直さずに、extract_words() の単語を覚えた境界で列に振り分ける。
+#   罫線のあるページ: 縦線が覚えた境界と同じ位置にあれば、横線の間を1行とする (表の外の単語は使わない)
+#   罫線の無いページ: 上端の位置が近い単語を1行とする (テキストを空白で区切るより列の位置が揃う)
+# 縦線の位置が違う・単語が境界をまたぐ・単語が表の幅からはみ出すページは、表を検出し直して境界を覚え直す。
+# BOM_PDF_TABLE_MODE: 'detect' (既定。ページごとに extract_table() で表を検出する) / 'reuse'
+PDF_TABLE_MODE = os.environ.get('BOM_PDF_TABLE_MODE', 'detect').lower()
+_PDF_TOLERANCE = 3 # 同じ位置とみなす座標の差 (pdfplumber の snap_tolerance / x_tolerance の既定値)
+
+def _cluster_positions(values):
+    # 差が _PDF_TOLERANCE 以内で続く座標を1つにまとめ、それぞれの最初の値を昇順で返す
+    positions = []
+    previous = None
+    for value in sorted(values):
+        if previous is None or value - previous > _PDF_TOLERANCE:
+            positions.append(value)
+        previous = value
+    return positions
+
+def _learn_page_table(page):
+    """
+    ページの表を検出し、(行, 列の境界のリスト) を返す。表が無ければ (None, None)。
+    行は extract_table() と同じ (複数の表があれば、セルの最も多い表)。
+    """
+    tables = page.find_tables()
+    if not tables:
+        return None, None
+    table = min(tables, key=lambda table: (-len(table.cells), table.bbox[1], table.bbox[0]))
+    edges = _cluster_positions([x for cell in table.cells for x in (cell[0], cell[2])])
+    return table.extract(), edges
+
+def _cell_text(words):
+    # extract_table() のセルの文字列と同じく、同じ行の単語は空白で、行と行は改行でつなぐ
+    lines = []
+    line_top = None
+    for word in words:
+        if line_top is None or abs(word['top'] - line_top) > _PDF_TOLERANCE:
+            lines.append([])
+            line_top = word['top']
+        lines[-1].append(word['text'])
+    return '\n'.join(' '.join(line) for line in lines)
+
+def _bin_page_words(page, edges):
+    """
+    覚えた列の境界 edges でページの単語を行・列に振り分けた行のリストを返す。
+    ページの表の形が edges と合わなければ None (表を検出し直す)。
+    """
+    left, right = edges[0], edges[-1]
+    inner = edges[1:-1]
+    column_count = len(edges) - 1
+
+    # 表の幅にかかる横線を行の境界にする
+    row_bounds = _cluster_positions([
+        edge['top'] for edge in page.horizontal_edges
+        if edge['x1'] > left + _PDF_TOLERANCE and edge['x0'] < right - _PDF_TOLERANCE
+    ])
+    words = page.extract_words()
+    if len(row_bounds) >= 2:
+        top, bottom = row_bounds[0], row_bounds[-1]
+        vertical = _cluster_positions([
+            edge['x0'] for edge in page.vertical_edges
+            if edge['bottom'] > top + _PDF_TOLERANCE and edge['top'] < bottom - _PDF_TOLERANCE
+        ])
+        if len(vertical) != len(edges) or any(abs(a - b) > _PDF_TOLERANCE for a, b in zip(vertical, edges)):
+            return None
+        # 表の外 (見出しやページ番号など) の単語は、extract_table() と同じく使わない
+        words = [word for word in words
+                 if top <= (word['top'] + word['bottom']) / 2 <= bottom and left <= (word['x0'] + word['x1']) / 2 <= right]
+    elif page.vertical_edges:
+        return None # 縦線だけがあるページは別の形の表とみなす
+
+    if len(row_bounds) < 2:
+        # 罫線が無ければ、上端の位置が近い単語を1行とする
+        row_bounds = _cluster_positions([word['top'] for word in words])
+        row_count = len(row_bounds)
+        position = lambda word: word['top']
+    else:
+        row_count = len(row_bounds) - 1 # 単語の無い行も、extract_table() と同じく空の行として返す
+        position = lambda word: (word['top'] + word['bottom']) / 2
+
+    rows = [[[] for _ in range(column_count)] for _ in range(row_count)]
+    for word in words:
+        x0, x1 = word['x0'], word['x1']
+        if x0 < left - _PDF_TOLERANCE or x1 > right + _PDF_TOLERANCE:
+            return None
+        col = bisect.bisect_right(inner, (x0 + x1) / 2)
+        if (col > 0 and x0 < inner[col - 1] - _PDF_TOLERANCE) or (col < len(inner) and x1 > inner[col] + _PDF_TOLERANCE):
+            return None # 単語が列の境界をまたいでいる
+        row = min(max(bisect.bisect_right(row_bounds, position(word)) - 1, 0), row_count - 1)
+        rows[row][col].append(word)
+    return [[_cell_text(cell_words) for cell_words in row] for row in rows]
+
+class _PdfTableReader:
+    """
+    ページごとの生の行を取り出す。table_mode が 'reuse' なら、表を検出したページの列の境界を後のページで使い回す。
+    """
+    def __init__(self, table_mode=None):
+        self.reuse = (table_mode or PDF_TABLE_MODE) == 'reuse'
+        self.edges = None
+
+    def read(self, page):
+        if not self.reuse:
+            return _extract_page_rows(page)
+        page_rows = _bin_page_words(page, self.edges) if self.edges is not None else None
+        if page_rows is None:
+            page_rows, edges = _learn_page_table(page)
+            if page_rows:
+                self.edges = edges
             else:
-                text = page.extract_text()
-                if text:
-                    for line in text.split('\n'): data_2d.append(re.split(r'\s{2,}', line))
-    cleaned_data_2d = []
-    for row in data_2d:
+                page_rows = _split_text_rows(page)
+        if hasattr(page, 'close'): page.close()
+        return page_rows
+
+def _clean_pdf_cell(cell):
+    return str(cell).strip().strip('"').strip(',').strip() if cell is not None else ""
+
+def _clean_pdf_rows(page_rows, projection=None):
+    for row in page_rows:
         if isinstance(row, list):
-             cleaned_row = []
-             for cell in row:
-                cell_val = str(cell).strip().strip('"').strip(',').strip() if cell is not None else ""
-                cleaned_row.append({"value": cell_val, "is_struck": False})
-             cleaned_data_2d.append(cleaned_row)
-    return cleaned_data_2d
\ No newline at end of file
+            if projection is not None and projection.columns is not None:
+                yield projection.project(len(row), lambda col: _clean_pdf_cell(row[col]))
+            else:
+                yield make_row(list(map(_clean_pdf_cell, row)))
+
+# --- PDF のページ並列抽出 (ワーカーごとにPDFを1回だけ開く) ---
+_pdf_worker_state = {}
+
+def _init_pdf_worker(pdf_file, table_mode=None):
+    # pdf_file: PDFのパス、または中身の bytes
+    _pdf_worker_state.clear()
+    _pdf_worker_state['pdf_file'] = pdf_file
+    _pdf_worker_state['reader'] = _PdfTableReader(table_mode)
+
+def _extract_page_slice_in_worker(page_indices):
+    if 'pdf' not in _pdf_worker_state:
+        pdf_file = _pdf_worker_state['pdf_file']
+        _pdf_worker_state['pdf'] = pdfplumber.open(pdf_file if isinstance(pdf_file, str) else io.BytesIO(pdf_file))
+    pdf = _pdf_worker_state['pdf']
+    reader = _pdf_worker_state['reader']
+    return [reader.read(pdf.pages[i]) for i in page_indices]
+
+# --- PDF パーサー (行ジェネレータ) ---
+# page_ranges: parse_page_range() の戻り値 (None なら全ページ)
+# file_stream: PDFのパス、またはバイナリストリーム
+# max_workers: 2 以上ならページをスライスに分けてプロセスプールで抽出し、ページ順に繋ぎ直す
+# table_mode: 'detect' / 'reuse' (None なら BOM_PDF_TABLE_MODE)
+def parse_pdf(file_stream, page_ranges=None, max_workers=1, progress=None, projection=None, table_mode=None):
+    # progress: 指定されていれば、ページを読み終えるたびに progress('pages', 済んだページ数, 全ページ数) を呼ぶ
+    with pdfplumber.open(file_stream) as pdf:
+        page_indices = _select_page_indices(page_ranges, len(pdf.pages))
+        reader = _PdfTableReader(table_mode)
+
+        if max_workers <= 1 or len(page_indices) < 2:
+            for done, i in enumerate(page_indices, 1):
+                yield from _clean_pdf_rows(reader.read(pdf.pages[i]), projection)
+                if progress:
+                    progress('pages', done, len(page_indices))
+            return
+
+    # 負荷の偏りを抑えるため、ワーカー数の数倍のスライスに分ける
+    workers = min(max_workers, len(page_indices))
+    slice_size = max(1, math.ceil(len(page_indices) / (workers * 4)))
+    page_slices = [page_indices[i:i + slice_size] for i in range(0, len(page_indices), slice_size)]
+
+    if isinstance(file_stream, str):
+        pdf_file = file_stream # パスならワーカーにはパスだけを渡す
+    else:
+        file_stream.seek(0)
+        pdf_file = file_stream.read()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_file, table_mode))
+    try:
+        done = 0
+        for slice_rows in executor.map(_extract_page_slice_in_worker, page_slices):
+            for page_rows in slice_rows:
+                yield from _clean_pdf_rows(page_rows, projection)
+            done += len(slice_rows)
+            if progress:
+                progress('pages', done, len(page_indices))
+    finally:
+        # 途中で打ち切られた (キャンセルなど) ときは、まだ始まっていないスライスを捨てる
+        executor.shutdown(wait=True, cancel_futures=True)
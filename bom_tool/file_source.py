@@ -0,0 +1,146 @@
+# file_source.py
+import io
+import os
+import mmap
+import hashlib
+import tempfile
+import threading
+
+# --- アップロードの一時ファイルへの退避 ---
+# BOM_SPOOL_THRESHOLD: これより大きいアップロードはメモリに読み込まず一時ファイルに書き出す (バイト)
+# BOM_SPOOL_DIR: 一時ファイルの保存先 (未指定ならOSの既定の一時ディレクトリ)
+SPOOL_THRESHOLD = int(os.environ.get('BOM_SPOOL_THRESHOLD', str(8 * 1024 * 1024)))
+SPOOL_DIR = os.environ.get('BOM_SPOOL_DIR') or None
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+class FileSource:
+    """
+    処理対象のファイル1件。小さいものはメモリ上の bytes、大きいものは一時ファイルとして持つ。
+    パーサーにはコピーを作らずに渡せる形 (パス / mmap / bytes) で中身を渡す。
+      file_or_path(): openpyxl や pdfplumber に渡すパス (メモリ上なら BytesIO)
+      buffer():       xlrd の file_contents や CSV のデコードに渡す bytes / mmap
+    一時ファイルは close() (または with 文の終わり) で削除する。
+    複数の利用者で共有するときは retain() で参照を増やし、それぞれが close() する (最後の close() で削除)。
+    プロセスプールへは pickle でパスだけが渡る (ワーカー側では一時ファイルを削除しない)。
+    """
+
+    def __init__(self, data=None, path=None, file_hash=None, owns_path=False):
+        self.data = data
+        self.path = path
+        self._file_hash = file_hash
+        self._owns_path = owns_path
+        self._mmap = None
+        self._mmap_file = None
+        self._refs = 1
+        self._refs_lock = threading.Lock()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data=data)
+
+    @classmethod
+    def from_stream(cls, stream, filename='', threshold=None, spool_dir=None):
+        """
+        ストリームを少しずつ読み、ハッシュを計算しながら、threshold を超えたら一時ファイルに書き出す。
+        一時ファイルには filename と同じ拡張子を付ける (openpyxl はパスの拡張子で形式を判定するため)。
+        """
+        if threshold is None:
+            threshold = SPOOL_THRESHOLD
+        hasher = hashlib.sha256()
+        buffer = io.BytesIO()
+        spool_file = None
+        try:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                if spool_file is None and buffer.tell() + len(chunk) > threshold:
+                    spool_file = tempfile.NamedTemporaryFile(prefix='bom_upload_', suffix=os.path.splitext(filename)[1].lower(),
+                                                             dir=spool_dir or SPOOL_DIR, delete=False)
+                    spool_file.write(buffer.getbuffer())
+                    buffer = None
+                (spool_file or buffer).write(chunk)
+        except BaseException:
+            if spool_file is not None:
+                spool_file.close()
+                os.unlink(spool_file.name)
+            raise
+
+        if spool_file is None:
+            return cls(data=buffer.getvalue(), file_hash=hasher.hexdigest())
+        spool_file.close()
+        return cls(path=spool_file.name, file_hash=hasher.hexdigest(), owns_path=True)
+
+    @property
+    def file_hash(self):
+        if self._file_hash is None:
+            self._file_hash = hashlib.sha256(self.buffer()).hexdigest()
+        return self._file_hash
+
+    @property
+    def size(self):
+        return len(self.data) if self.path is None else os.path.getsize(self.path)
+
+    def file_or_path(self):
+        return self.path if self.path is not None else io.BytesIO(self.data)
+
+    def buffer(self):
+        if self.path is None:
+            return self.data
+        if self._mmap is not None and self._mmap.closed:
+            # xlrd の release_resources() は渡した mmap を閉じてしまうので、開き直す
+            self._mmap_file.close()
+            self._mmap = self._mmap_file = None
+        if self._mmap is None:
+            if os.path.getsize(self.path) == 0:
+                return b''  # 空のファイルは mmap できない
+            self._mmap_file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._mmap_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def retain(self):
+        with self._refs_lock:
+            self._refs += 1
+        return self
+
+    def close(self):
+        with self._refs_lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # まだどこかで参照されている (参照が無くなれば解放される)
+            self._mmap = None
+        if self._mmap_file is not None:
+            self._mmap_file.close()
+            self._mmap_file = None
+        if self._owns_path and self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self._owns_path = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def __getstate__(self):
+        # ワーカープロセスへはデータ (またはパス) とハッシュだけを渡す
+        return {'data': self.data, 'path': self.path, 'file_hash': self._file_hash}
+
+    def __setstate__(self, state):
+        self.__init__(state['data'], state['path'], state['file_hash'])
+
+
+def as_file_source(file_data):
+    # bytes をそのまま渡された場合も FileSource として扱えるようにする
+    return file_data if isinstance(file_data, FileSource) else FileSource.from_bytes(file_data)
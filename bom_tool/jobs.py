@@ -0,0 +1,182 @@
+# jobs.py
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 自作モジュールをインポート ---
+from pipeline import ProcessingError
+from metrics import ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """ジョブがキャンセルされたときに、進捗の通知から送出して処理を中断する。"""
+
+
+class JobQueueFull(Exception):
+    """待ち行列が上限に達していて、新しいジョブを受け付けられない。"""
+
+
+class Job:
+    """
+    バックグラウンドで処理中のファイル1件。
+    status: 'queued' -> 'running' -> 'done' / 'error' / 'cancelled'
+    stage, current, total: 処理中の段階と進捗 (例: 'sheets', 3, 30)
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.current = None
+        self.total = None
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.on_finish = None
+
+    def to_dict(self):
+        job = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": {"current": self.current, "total": self.total},
+        }
+        if self.status == 'done':
+            job["result"] = self.result
+        elif self.status == 'error':
+            job["error"] = self.error
+            job["status_code"] = self.status_code
+        return job
+
+
+# --- 処理ジョブの管理 (上限付きのスレッドプール + 結果の有効期限) ---
+class JobManager:
+    """
+    submit() したジョブをスレッドプールで順に処理する。終わったジョブの結果は ttl_seconds 秒だけ保持する。
+    ワーカー数は max_workers、待っているジョブの数は max_pending までに制限する。
+    """
+
+    def __init__(self, max_workers=2, ttl_seconds=600, max_pending=32):
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bom-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, on_finish=None):
+        """
+        func(progress) を実行するジョブを登録し、Job を返す。
+        progress(stage, current=None, total=None) は進捗を記録し、キャンセルされていれば JobCancelled を送出する。
+        func が送出した ProcessingError はジョブのエラーとして記録する。
+        on_finish() はジョブが終わったとき (完了・エラー・始まる前のキャンセルのいずれでも) に1度だけ呼ぶ (アップロードの後片付け用)。
+        """
+        with self._lock:
+            self._purge_expired()
+            pending = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if pending >= self.max_pending:
+                raise JobQueueFull()
+            job = Job(uuid.uuid4().hex)
+            job.on_finish = on_finish
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        ジョブをキャンセルする。まだ始まっていなければその場で、処理中なら次の進捗の通知で止まる。
+        ジョブが見つからなければ None を返す。
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            cancelled_before_start = False
+            if job.status in ('queued', 'running'):
+                job.cancel_event.set()
+                if job.future is not None and job.future.cancel():
+                    self._finish(job, 'cancelled')
+                    cancelled_before_start = True
+        if cancelled_before_start:
+            # _run は呼ばれないので、ここで後片付けをする
+            self._call_on_finish(job)
+        return job
+
+    def _run(self, job, func):
+        try:
+            self._run_job(job, func)
+        finally:
+            self._call_on_finish(job)
+
+    def _run_job(self, job, func):
+        def progress(stage, current=None, total=None):
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            job.stage, job.current, job.total = stage, current, total
+
+        with self._lock:
+            if job.cancel_event.is_set():
+                self._finish(job, 'cancelled')
+                return
+            job.status = 'running'
+            job.stage = 'starting'
+
+        try:
+            result = func(progress)
+        except JobCancelled:
+            with self._lock:
+                self._finish(job, 'cancelled')
+            return
+        except ProcessingError as e:
+            ERRORS.inc(endpoint='job', status=e.status_code)
+            with self._lock:
+                job.error, job.status_code = e.message, e.status_code
+                self._finish(job, 'error')
+            return
+        except Exception as e:
+            logger.exception("ジョブの処理中に予期せぬエラーが発生しました", extra={"job_id": job.job_id})
+            ERRORS.inc(endpoint='job', status=500)
+            with self._lock:
+                job.error, job.status_code = f"処理中に予期せぬエラーが発生しました: {e}", 500
+                self._finish(job, 'error')
+            return
+
+        with self._lock:
+            job.result = result
+            self._finish(job, 'done')
+
+    def _call_on_finish(self, job):
+        with self._lock:
+            on_finish, job.on_finish = job.on_finish, None
+        if on_finish is None:
+            return
+        try:
+            on_finish()
+        except Exception:
+            logger.exception("ジョブの後片付けに失敗しました", extra={"job_id": job.job_id})
+
+    def _finish(self, job, status):
+        job.status = status
+        job.stage = status
+        job.finished_at = time.monotonic()
+
+    def _purge_expired(self):
+        # 終わってから ttl_seconds 以上たったジョブを捨てる (処理中のジョブは残す)
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
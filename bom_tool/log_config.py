@@ -0,0 +1,60 @@
+# log_config.py
+import os
+import json
+import logging
+
+# --- ログの設定 ---
+# BOM_LOG_LEVEL: 出力するログのレベル (DEBUG / INFO / WARNING / ERROR)
+# BOM_LOG_FORMAT: 'text' (既定, 1行に "メッセージ key=value ...") または 'json' (1行1オブジェクト)
+LOG_LEVEL = os.environ.get('BOM_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('BOM_LOG_FORMAT', 'text').lower()
+
+# LogRecord が最初から持っている属性 (これ以外は logger.info(..., extra={...}) で渡された項目)
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """'時刻 レベル ロガー名 メッセージ key=value ...' の1行にする。"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            head, sep, tail = line.partition('\n') # 例外のトレースバックはメッセージの後ろに置く
+            line = head + ''.join(f" {key}={value!r}" if isinstance(value, str) and ' ' in value else f" {key}={value}"
+                                  for key, value in fields.items()) + sep + tail
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """1件のログを1行の JSON にする (extra の項目もそのまま含める)。"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, log_format=None):
+    """ルートロガーに標準エラー出力へのハンドラを1つだけ設定する (既に設定されていれば何もしない)。"""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == 'json' else TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
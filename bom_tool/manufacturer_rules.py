@@ -0,0 +1,96 @@
+# manufacturer_rules.py
+import os
+import csv
+import json
+import hashlib
+from functools import lru_cache
+
+# --- 自作モジュールをインポート ---
+from matchers import AhoCorasick
+
+# --- 型番 -> メーカーの推測ルール ---
+# BOM_MANUFACTURER_RULES: ルールファイル (.csv / .json) のパス (未指定なら data/manufacturer_rules.csv)
+# BOM_MANUFACTURER_CACHE_SIZE: 型番ごとの判定結果を覚えておく件数
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'manufacturer_rules.csv')
+RULES_PATH = os.environ.get('BOM_MANUFACTURER_RULES') or DEFAULT_RULES_PATH
+CACHE_SIZE = int(os.environ.get('BOM_MANUFACTURER_CACHE_SIZE', '65536'))
+
+MATCH_TYPES = ('prefix', 'contains')
+
+
+def load_rules(path):
+    """
+    ルールファイルを読み、[(match, pattern, manufacturer), ...] をファイル内の順に返す。
+    CSV は match,pattern,manufacturer の3列 (見出し行と '#' で始まる行は読み飛ばす)。
+    JSON は [{"match": ..., "pattern": ..., "manufacturer": ...}, ...] のリスト。
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            records = [(item.get('match', ''), item.get('pattern', ''), item.get('manufacturer', '')) for item in json.load(f)]
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            records = [tuple(row[:3]) for row in csv.reader(f)
+                       if len(row) >= 3 and row[0].strip() and not row[0].lstrip().startswith('#')]
+
+    rules = []
+    for match, pattern, manufacturer in records:
+        match, pattern, manufacturer = match.strip().lower(), pattern.strip(), manufacturer.strip()
+        if match == 'match' and pattern.lower() == 'pattern':
+            continue # 見出し行
+        if match not in MATCH_TYPES:
+            raise ValueError(f"{path}: 不明な match の種類です: {match!r} (prefix / contains のいずれか)")
+        if pattern and manufacturer:
+            rules.append((match, pattern, manufacturer))
+    return rules
+
+
+# --- ルールをコンパイルしたもの (前方一致のトライ木 + 部分一致のオートマトン) ---
+class ManufacturerRules:
+    """
+    前方一致のルールはトライ木にまとめ、型番を先頭から1回たどって最も長く一致したものを採る
+    (同じ接頭辞が複数あればファイル内で先のもの)。
+    部分一致のルールは AhoCorasick にまとめ、1回の走査で一致したもののうちファイル内で最も先のものを採る。
+    前方一致で決まらなかったときだけ部分一致を見る (従来の detect_manufacturer と同じ順序)。
+    """
+
+    def __init__(self, rules, cache_size=CACHE_SIZE):
+        self.rules = list(rules)
+        self._prefix_root = {}
+        contains_patterns = []
+        self._contains_manufacturers = []
+        for match, pattern, manufacturer in self.rules:
+            if match == 'prefix':
+                node = self._prefix_root
+                for ch in pattern.upper():
+                    node = node.setdefault(ch, {})
+                node.setdefault(None, manufacturer) # 値はキー None に持つ (先に登録したものを優先)
+            else:
+                contains_patterns.append(pattern.lower())
+                self._contains_manufacturers.append(manufacturer)
+        self._contains = AhoCorasick(contains_patterns)
+        # ルールの内容が変わったら解析結果のキャッシュも別物として扱えるように、内容のハッシュを持っておく
+        self.fingerprint = hashlib.sha256(repr(self.rules).encode('utf-8')).hexdigest()[:16]
+        # 同じ型番は何度も現れるので、型番ごとの判定結果を覚えておく
+        self.detect = lru_cache(maxsize=cache_size)(self._detect)
+
+    @classmethod
+    def from_file(cls, path, cache_size=CACHE_SIZE):
+        return cls(load_rules(path), cache_size)
+
+    def _match_prefix(self, pn_upper):
+        node, found = self._prefix_root, None
+        for ch in pn_upper:
+            node = node.get(ch)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    def _detect(self, part_number_string):
+        manufacturer = self._match_prefix(part_number_string.upper())
+        if manufacturer is not None:
+            return manufacturer
+        found = self._contains.find_all(part_number_string.lower())
+        if found:
+            return self._contains_manufacturers[min(found)]
+        return ""
@@ -0,0 +1,115 @@
+# matchers.py
+from collections import deque
+from functools import lru_cache
+
+
+# --- 複数キーワードの部分一致を1パスで探す (Aho-Corasick) ---
+class AhoCorasick:
+    """
+    patterns の各文字列が、検索対象の文字列のどこかに含まれているかを1回の走査で調べる。
+    find_all() は含まれていたパターンの番号 (patterns 内の位置) を返す。
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue # 空文字のパターンは何にでも一致してしまうので登録しない
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = next_state
+                state = next_state
+            self._out[state] = self._out[state] + (pattern_id,)
+
+        # 幅優先で失敗遷移を張り、出力を失敗先から引き継ぐ
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state = self._fail[state]
+                while fail_state and ch not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                fallback = self._goto[fail_state].get(ch, 0)
+                self._fail[next_state] = fallback if fallback != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find_all(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+# --- ヘッダー行の判定 (HEADER_KEYWORDS を1つのオートマトンにまとめたもの) ---
+class HeaderMatcher:
+    """
+    HEADER_KEYWORDS を一度だけコンパイルし、ヘッダー候補の行を1パスで採点する。
+    列の割り当ては従来どおり、項目 ref -> part -> mfg の順に、
+    キーワードの優先順位 (リスト内の順番) が高いものから、左の列を優先して決める。
+    """
+
+    FIELDS = ('ref', 'part', 'mfg')
+
+    def __init__(self, header_keywords, cache_size=4096):
+        patterns = []
+        self._pattern_fields = [] # パターン番号 -> [(項目の番号, 優先順位), ...]
+        pattern_ids = {}
+        for field_index, field in enumerate(self.FIELDS):
+            for priority, keyword in enumerate(header_keywords.get(field, [])):
+                normalized = keyword.replace(" ", "")
+                if normalized not in pattern_ids:
+                    pattern_ids[normalized] = len(patterns)
+                    patterns.append(normalized)
+                    self._pattern_fields.append([])
+                self._pattern_fields[pattern_ids[normalized]].append((field_index, priority))
+        self._automaton = AhoCorasick(patterns)
+        # 同じ見出し文字列は何度も現れるので、セルごとの判定結果を覚えておく
+        self._cell_priorities = lru_cache(maxsize=cache_size)(self._compute_cell_priorities)
+
+    def _compute_cell_priorities(self, normalized_cell):
+        # 項目ごとに、このセルに含まれるキーワードの最も高い優先順位 (無ければ None)
+        best = [None] * len(self.FIELDS)
+        for pattern_id in self._automaton.find_all(normalized_cell):
+            for field_index, priority in self._pattern_fields[pattern_id]:
+                if best[field_index] is None or priority < best[field_index]:
+                    best[field_index] = priority
+        return tuple(best)
+
+    def score_row(self, cell_values):
+        """
+        1行分のセル文字列のリストを採点し、(header_map, header_names) を返す。
+        header_map は {'ref': 列番号, ...}、header_names は見つかった見出しの文字列。
+        """
+        priorities = [self._cell_priorities(str(value).lower().strip().replace(" ", "")) for value in cell_values]
+
+        header_map, header_names, used_cols = {}, {}, set()
+        for field_index, field in enumerate(self.FIELDS):
+            best_col, best_priority = None, None
+            for j, cell_priorities in enumerate(priorities):
+                priority = cell_priorities[field_index]
+                if priority is None or j in used_cols:
+                    continue
+                if best_priority is None or priority < best_priority:
+                    best_col, best_priority = j, priority
+            if best_col is not None:
+                header_map[field] = best_col
+                header_names[field] = str(cell_values[best_col]).strip()
+                used_cols.add(best_col)
+        return header_map, header_names
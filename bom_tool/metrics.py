@@ -0,0 +1,222 @@
+# metrics.py
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- 処理段階ごとの計測 (Server-Timing ヘッダーと /metrics 用) ---
+# 段階の名前:
+#   load      ワークブックを開く (openpyxl / xlrd)
+#   parse     パーサーが行を返すまで (行ジェネレータの next() にかかった時間の合計)
+#   header    ヘッダー行の検出
+#   extract   フラットリストの抽出 (parse / header を除いた残り)
+#   group     型番ごとの集計
+#   parallel  シートのプロセスプール処理 (ワーカー内の内訳は計測しない)
+#   serialize レスポンスのJSON化
+# 段階は入れ子にでき、外側の段階には内側の段階を除いた時間 (自分自身の時間) だけを記録する。
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """増えるだけの値 (ラベルの組ごと)。"""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """値の分布 (ラベルの組ごとに、バケットごとの件数・合計・件数)。"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {} # ラベルの組 -> [バケットごとの件数..., 合計, 件数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(entry)) for key, entry in self._values.items())
+        for key, entry in items:
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:len(self.buckets)] + [entry[-1]]):
+                labels = _format_labels(self.label_names, key, [('le', _format_number(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(entry[-2])}")
+            lines.append(f"{self.name}_count{labels} {entry[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus のテキスト形式 (version 0.0.4) で全メトリクスを返す。"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram('bom_stage_duration_seconds', "処理段階ごとの所要時間 (秒)", ('stage',))
+REQUEST_SECONDS = registry.histogram('bom_request_duration_seconds', "エンドポイントごとの応答時間 (秒)", ('endpoint',))
+REQUESTS = registry.counter('bom_requests_total', "エンドポイントとステータスごとのリクエスト数", ('endpoint', 'status'))
+ERRORS = registry.counter('bom_errors_total', "エラーで終わったリクエスト・ジョブの数", ('endpoint', 'status'))
+FILES = registry.counter('bom_files_processed_total', "処理したファイル数 (拡張子ごと)", ('file_type',))
+ROWS = registry.counter('bom_rows_processed_total', "パーサーから読み込んだ行数 (拡張子ごと)", ('file_type',))
+
+
+# --- リクエスト内の段階別の時間 ---
+_request_timings = contextvars.ContextVar('bom_request_timings', default=None)
+_stage_stack = contextvars.ContextVar('bom_stage_stack', default=None)
+
+
+def start_request():
+    """このリクエスト (スレッド) の段階別の時間の記録を始める。"""
+    _request_timings.set({})
+
+
+def request_timings():
+    """start_request() 以降に記録した {段階: 秒} を返す (記録していなければ None)。"""
+    return _request_timings.get()
+
+
+def record_stage(stage_name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage_name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + seconds
+
+
+def _add_to_parent(seconds):
+    # 外側の段階から、内側で使った時間を差し引けるようにしておく
+    stack = _stage_stack.get()
+    if stack:
+        stack[-1][0] += seconds
+
+
+@contextmanager
+def stage(stage_name):
+    """with stage('group'): ... の中でかかった時間を stage_name として記録する。"""
+    stack = _stage_stack.get()
+    token = None
+    if stack is None:
+        stack = []
+        token = _stage_stack.set(stack)
+    frame = [0.0] # 内側の段階で使った時間
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        if token is not None:
+            _stage_stack.reset(token)
+        record_stage(stage_name, elapsed - frame[0])
+
+
+class TimedRows:
+    """
+    行ジェネレータを包み、next() にかかった時間を 'parse' として、読んだ行数を ROWS に記録する。
+    行はそのまま (読み込みを先取りせずに) 流す。
+    """
+
+    def __init__(self, rows_iter, file_type):
+        self._rows_iter = rows_iter
+        self.file_type = file_type
+        self.seconds = 0.0
+        self.rows = 0
+
+    def __iter__(self):
+        perf_counter = time.perf_counter
+        rows_iter = iter(self._rows_iter)
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    row = next(rows_iter)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed = perf_counter() - start
+                    self.seconds += elapsed
+                    _add_to_parent(elapsed)
+                self.rows += 1
+                yield row
+        finally:
+            record_stage('parse', self.seconds)
+            ROWS.inc(self.rows, file_type=self.file_type)
+
+
+def server_timing_header(timings, total_seconds=None):
+    """{段階: 秒} を Server-Timing ヘッダーの値 ("parse;dur=12.3, group;dur=4.5") にする。"""
+    entries = [f"{stage_name};dur={seconds * 1000:.1f}" for stage_name, seconds in timings.items()]
+    if total_seconds is not None:
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ', '.join(entries)
@@ -0,0 +1,61 @@
+# parallel_sheets.py
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import xlrd
+
+# --- 自作モジュールをインポート ---
+from file_parsers import parse_single_excel_sheet_xls
+from xlsx_fast import XlsxReader
+from bom_processor import extract_flat_list_from_rows
+from sheet_table import new_projection
+
+# --- ワーカープロセスごとの状態 (ファイル本体はプロセスごとに1部だけ持つ) ---
+_worker_state = {}
+
+def _init_worker(source, file_kind):
+    _worker_state.clear()
+    _worker_state['source'] = source
+    _worker_state['file_kind'] = file_kind
+
+def _get_worker_book():
+    # ワークブックはワーカー内で最初に必要になったときに1回だけ開く
+    if 'book' not in _worker_state:
+        source = _worker_state['source']
+        if _worker_state['file_kind'] == 'xlsx':
+            _worker_state['book'] = XlsxReader(source.file_or_path())
+        else:
+            _worker_state['book'] = xlrd.open_workbook(file_contents=source.buffer(), formatting_info=True, on_demand=True)
+    return _worker_state['book']
+
+def _process_sheet_in_worker(sheet_name, remove_parentheses):
+    book = _get_worker_book()
+    projection = new_projection()
+    if _worker_state['file_kind'] == 'xlsx':
+        rows_iter, cancellation_refs = book.parse_sheet(sheet_name, projection)
+    else:
+        rows_iter, cancellation_refs = parse_single_excel_sheet_xls(book.sheet_by_name(sheet_name), book, projection)
+    return extract_flat_list_from_rows(rows_iter, cancellation_refs, remove_parentheses, projection=projection)
+
+# --- 複数シートをプロセスプールで並列に処理する ---
+def extract_sheets_parallel(source, file_kind, sheet_names, remove_parentheses, max_workers, progress=None):
+    """
+    sheet_names の各シートについて extract_flat_list_from_rows の結果
+    (flat_list, error, warnings) を、sheet_names と同じ順序のリストで返す。
+    source は FileSource (一時ファイルならワーカーにはパスだけが渡る)。file_kind は 'xlsx' または 'xls'。
+    progress: 指定されていれば、シートが終わるたびに progress(済んだシート数) を呼ぶ。
+    """
+    if not sheet_names:
+        return []
+    workers = max(1, min(max_workers, len(sheet_names)))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source, file_kind))
+    try:
+        results = []
+        for result in executor.map(_process_sheet_in_worker, sheet_names, itertools.repeat(remove_parentheses)):
+            results.append(result)
+            if progress:
+                progress(len(results))
+        return results
+    finally:
+        # 途中で打ち切られた (キャンセルなど) ときは、まだ始まっていないシートを捨てる
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,391 @@
+# pipeline.py
+import os
+import logging
+import itertools
+
+import xlrd
+
+# --- 自作モジュールをインポート ---
+from file_parsers import (
+    parse_csv_or_txt,
+    parse_pdf,
+    parse_single_excel_sheet_xls,
+    PDF_TABLE_MODE
+)
+from bom_processor import (
+    extract_flat_list_from_rows,
+    BomAggregator
+)
+from result_cache import ResultCache
+from file_source import as_file_source
+from xlsx_fast import XlsxReader
+from sheet_table import SheetTable, new_projection
+from utils import manufacturer_rules, HEADER_SCAN_ROWS
+from metrics import stage, TimedRows, FILES
+from parallel_sheets import extract_sheets_parallel
+
+logger = logging.getLogger(__name__)
+
+# --- 解析結果キャッシュ (同じファイルの再送信時に再解析しない) ---
+# BOM_CACHE_SIZE: メモリに保持するエントリ数 (0 で無効), BOM_CACHE_DIR: ディスク層の保存先 (未指定なら無効)
+# BOM_CACHE_MAX_ROWS: data_2d をキャッシュするシートの最大行数 (これを超えるシートはストリーム処理のみ)
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('BOM_CACHE_SIZE', '64')),
+    disk_dir=os.environ.get('BOM_CACHE_DIR') or None,
+)
+CACHE_MAX_ROWS = int(os.environ.get('BOM_CACHE_MAX_ROWS', '50000'))
+
+# --- 複数シートの並列処理 ---
+# BOM_SHEET_WORKERS: シートを並列処理するワーカープロセス数 (1 以下なら従来どおり1シートずつ処理)
+SHEET_WORKERS = int(os.environ.get('BOM_SHEET_WORKERS', '1'))
+# BOM_PDF_WORKERS: PDFのページ抽出を並列に行うワーカープロセス数 (1 以下なら1ページずつ処理)
+PDF_WORKERS = int(os.environ.get('BOM_PDF_WORKERS', '1'))
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.txt', '.pdf')
+
+
+class ProcessingError(Exception):
+    """
+    ファイル1件の処理を中断するエラー。message はそのまま利用者に返し、
+    status_code は /process が返す HTTP ステータスになる。
+    """
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class _RowRecorder:
+    """
+    行ジェネレータをそのまま流しつつ、max_rows 行までは SheetTable に控えを取っておく。
+    最後まで読み切り、かつ上限以内だったときだけ rows が使える (キャッシュ用)。
+    """
+    def __init__(self, rows_iter, max_rows):
+        self._rows_iter = rows_iter
+        self._max_rows = max_rows
+        self.rows = SheetTable()
+        self.complete = False
+
+    def __iter__(self):
+        for row in self._rows_iter:
+            if self.rows is not None:
+                if len(self.rows) < self._max_rows:
+                    self.rows.append(row)
+                else:
+                    self.rows = None # 大きすぎるシートは控えを捨てる
+            yield row
+        self.complete = self.rows is not None
+
+def _peek_rows(rows_iter):
+    """
+    行ジェネレータが空なら None を、そうでなければ先頭行を戻したイテレータを返す。
+    """
+    first_row = next(rows_iter, None)
+    if first_row is None:
+        return None
+    return itertools.chain([first_row], rows_iter)
+
+def _flat_key(file_hash, sheet_key, remove_parentheses):
+    # メーカー推測ルールやヘッダー行を探す範囲が変わったら、以前のフラットリスト (ディスク層に残ったものも含む) は使わない
+    return (file_hash, 'flat', sheet_key, remove_parentheses, manufacturer_rules.fingerprint, HEADER_SCAN_ROWS)
+
+def _get_cached_flat_list(file_hash, sheet_key, remove_parentheses, load_rows, file_type, row_memo=None):
+    """
+    extract_flat_list_from_rows の結果を (シート, 括弧削除オプション) ごとにキャッシュする。
+    load_rows(projection) は (行ジェネレータ, 取り消し線Ref) を返す。load_rows() が None (行が無い) ならこの関数も None を返す。
+    projection (sheet_table.ColumnProjection または None) はパーサーに渡し、ヘッダーが決まった後の行を必要な列だけに絞らせる。
+    file_type は計測用の拡張子 ('xlsx', 'csv' など)。
+    row_memo (revisions.RowMemo) は extract_flat_list_from_rows に渡す。row_memo があるときは、次の版のために
+    行ごとの結果を作る必要があるので、フラットリストのキャッシュは使わない (行のキャッシュは使う)。
+    シートの data_2d と取り消し線Refも、行数が CACHE_MAX_ROWS 以内ならキャッシュする。
+    """
+    flat_key = _flat_key(file_hash, sheet_key, remove_parentheses)
+    if row_memo is None:
+        result = result_cache.get(flat_key)
+        if result is not None:
+            return result
+
+    rows_key = (file_hash, 'rows', sheet_key)
+    parsed = result_cache.get(rows_key)
+    if parsed is not None:
+        data_2d, cancellation_refs = parsed
+        with stage('extract'):
+            result = extract_flat_list_from_rows(data_2d, cancellation_refs, remove_parentheses, row_memo=row_memo)
+    else:
+        projection = new_projection()
+        loaded = load_rows(projection)
+        if loaded is None:
+            return None
+        rows_iter, cancellation_refs = loaded
+        recorder = _RowRecorder(TimedRows(rows_iter, file_type), CACHE_MAX_ROWS)
+        with stage('extract'):
+            result = extract_flat_list_from_rows(recorder, cancellation_refs, remove_parentheses, projection=projection,
+                                                 row_memo=row_memo)
+        if recorder.complete:
+            result_cache.put(rows_key, (recorder.rows, cancellation_refs))
+
+    result_cache.put(flat_key, result)
+    return result
+
+def _prefetch_sheets_parallel(source, file_kind, file_hash, sheet_names, remove_parentheses, sheet_workers,
+                              progress=None):
+    """
+    キャッシュに無いシートをプロセスプールでまとめて処理し、{シート名: 結果} を返す。
+    並列処理が無効、または処理するシートが1枚以下なら空の辞書を返す (呼び出し側で従来どおり処理する)。
+    """
+    pending = [name for name in dict.fromkeys(sheet_names)
+               if _flat_key(file_hash, name, remove_parentheses) not in result_cache]
+    if sheet_workers <= 1 or len(pending) < 2:
+        return {}
+
+    on_sheet_done = (lambda done: progress('sheets', done, len(pending))) if progress else None
+    with stage('parallel'):
+        results = extract_sheets_parallel(source, file_kind, pending, remove_parentheses, sheet_workers, on_sheet_done)
+    prefetched = {}
+    for sheet_name, result in zip(pending, results):
+        result_cache.put(_flat_key(file_hash, sheet_name, remove_parentheses), result)
+        prefetched[sheet_name] = result
+    return prefetched
+
+
+# --- Excel の各シートを処理する ---
+def _collect_excel_sheets(filename, source, file_hash, selected_sheets, remove_parentheses,
+                          sheet_workers, strict, collected, progress, revision):
+
+    # --- .xlsx (xlsx_fast / openpyxl) の処理 ---
+    if filename.endswith('.xlsx'):
+        file_kind = 'xlsx'
+        # ワークブックは、シート名がキャッシュに無いか、キャッシュに無いシートがあるときだけ開く
+        reader_holder = {}
+        def get_reader():
+            if 'reader' not in reader_holder:
+                with stage('load'):
+                    reader_holder['reader'] = XlsxReader(source.file_or_path())
+            return reader_holder['reader']
+
+        try:
+            sheet_names = result_cache.get((file_hash, 'sheetnames'))
+            if sheet_names is None:
+                sheet_names = list(get_reader().sheet_names)
+                result_cache.put((file_hash, 'sheetnames'), sheet_names)
+        except Exception as e:
+            logger.exception("Excel (.xlsx) ファイルの読み込みに失敗しました")
+            raise ProcessingError(f"Excel (.xlsx) ファイルの読み込みに失敗しました。 (エラー: {e})")
+
+        def load_sheet(sheet_name, projection):
+            # 共有文字列・スタイルの読み込み (初回のみ) も load に数える
+            with stage('load'):
+                return get_reader().parse_sheet(sheet_name, projection)
+
+    # --- .xls (xlrd) の処理 ---
+    else:
+        file_kind = 'xls'
+        # ワークブックは、キャッシュに無いシートがあるときだけ読み込む
+        book_holder = {}
+        def get_book():
+            if 'book' not in book_holder:
+                with stage('load'):
+                    book_holder['book'] = xlrd.open_workbook(file_contents=source.buffer(), formatting_info=True, on_demand=True)
+            return book_holder['book']
+
+        try:
+            sheet_names = result_cache.get((file_hash, 'sheetnames'))
+            if sheet_names is None:
+                sheet_names = list(get_book().sheet_names())
+                result_cache.put((file_hash, 'sheetnames'), sheet_names)
+        except Exception as e:
+            logger.exception(".xls ファイルの読み込みに失敗しました")
+            raise ProcessingError(f".xlsファイルの読み込みに失敗しました。 (エラー: {e})")
+
+        load_sheet = lambda sheet_name, projection: parse_single_excel_sheet_xls(
+            get_book().sheet_by_name(sheet_name), get_book(), projection)
+
+    if selected_sheets is None:
+        selected_sheets = sheet_names
+
+    prefetched = _prefetch_sheets_parallel(
+        source, file_kind, file_hash,
+        [name for name in selected_sheets if name in sheet_names], remove_parentheses, sheet_workers, progress
+    )
+
+    for sheet_index, sheet_name in enumerate(selected_sheets):
+        if not prefetched:
+            # 並列処理したときは、シートの進捗はワーカーの完了ごとに通知済み
+            progress('sheets', sheet_index, len(selected_sheets))
+        if sheet_name not in sheet_names:
+            collected.individual[sheet_name] = {"error": "指定されたシートが見つかりません。"}
+            continue
+
+        if sheet_name in prefetched:
+            flat_list, error, cancellation_warnings_list = prefetched[sheet_name]
+        else:
+            flat_list, error, cancellation_warnings_list = _get_cached_flat_list(
+                file_hash, sheet_name, remove_parentheses, lambda projection: load_sheet(sheet_name, projection), file_kind,
+                revision.row_memo(sheet_name) if revision is not None else None
+            )
+
+        if error:
+            logger.info("ヘッダー検出エラー", extra={"file_type": file_kind, "sheet": sheet_name, "error": error})
+            if strict:
+                # ヘッダーエラーなどが発生したら、シート処理を中断し、詳細なエラーメッセージを返す
+                raise ProcessingError(error)
+            collected.individual[sheet_name] = {"error": error}
+            continue
+
+        with stage('group'):
+            sheet_aggregator = BomAggregator(flat_list)
+            if revision is None:
+                final_data, duplicate_warnings = sheet_aggregator.finalize()
+            else:
+                final_data, duplicate_warnings = sheet_aggregator.finalize(revision.previous_groups(sheet_name))
+                revision.keep_groups(sheet_name, sheet_aggregator)
+            total_warnings = duplicate_warnings + cancellation_warnings_list
+            collected.individual[sheet_name] = {"data": final_data, "warnings": total_warnings}
+            # 全体集計にはシートの集計をそのまま合流させる (フラットリストを集計し直さない)
+            collected.merge(sheet_aggregator, cancellation_warnings_list)
+    progress('sheets', len(selected_sheets), len(selected_sheets))
+
+
+# --- Excel以外のファイル (PDF, CSV, TXT) を処理する ---
+def _collect_flat_file(filename, source, file_hash, remove_parentheses, page_ranges, pdf_workers, collected, progress,
+                       revision):
+    sheet_key = None
+    file_type = os.path.splitext(filename)[1].lstrip('.')
+    if filename.endswith('.csv'):
+        parse_rows = lambda projection: parse_csv_or_txt(source.buffer(), [','], projection)
+    elif filename.endswith('.txt'):
+        parse_rows = lambda projection: parse_csv_or_txt(source.buffer(), ['\t', r'\s{2,}'], projection)
+    else:
+        # 任意のページ範囲 (例: "2-10,12") で表紙や注記ページを読み飛ばせる
+        if page_ranges:
+            sheet_key = ('pages', tuple(page_ranges))
+        # 列の境界を使い回すモードでは行が変わることがあるので、検出し直すモードの結果とは別にキャッシュする
+        if PDF_TABLE_MODE != 'detect':
+            sheet_key = (sheet_key, PDF_TABLE_MODE)
+        parse_rows = lambda projection: parse_pdf(source.file_or_path(), page_ranges, pdf_workers, progress, projection)
+
+    progress('reading')
+
+    def load_rows(projection):
+        rows_iter = _peek_rows(parse_rows(projection))
+        return (rows_iter, set()) if rows_iter is not None else None
+
+    flat_result = _get_cached_flat_list(file_hash, sheet_key, remove_parentheses, load_rows, file_type,
+                                        revision.row_memo(sheet_key) if revision is not None else None)
+
+    if flat_result is None:
+        raise ProcessingError("ファイルからデータを抽出できませんでした。")
+
+    flat_list, error, cancellation_warnings_list = flat_result
+
+    if error:
+        logger.info("ヘッダー検出エラー", extra={"file_type": file_type, "error": error})
+        raise ProcessingError(error)
+
+    with stage('group'):
+        collected.add(flat_list, cancellation_warnings_list)
+
+
+class CollectedFile:
+    """
+    ファイル1件分の中間結果。
+    individual はシートごとの結果、aggregator と cancellation_warnings は全体集計 (combined) の材料。
+    """
+    def __init__(self):
+        self.individual = {}
+        self.aggregator = BomAggregator()
+        self.cancellation_warnings = set()
+
+    def add(self, flat_list, cancellation_warnings_list):
+        self.aggregator.add(flat_list)
+        self.cancellation_warnings.update(cancellation_warnings_list)
+
+    def merge(self, aggregator, cancellation_warnings_list):
+        self.aggregator.merge(aggregator)
+        self.cancellation_warnings.update(cancellation_warnings_list)
+
+
+def _no_progress(stage, current=None, total=None):
+    pass
+
+
+def collect_file(filename, file_data, selected_sheets=None, remove_parentheses=True, page_ranges=None,
+                 sheet_workers=None, pdf_workers=None, strict=True, file_hash=None, progress=None, revision=None):
+    """
+    ファイル1件を解析し、集計前の CollectedFile を返す。
+    file_data: ファイルの中身 (bytes または FileSource。大きなアップロードは一時ファイルのまま渡せる)
+    selected_sheets: 処理する Excel のシート名のリスト (None なら全シート)
+    strict: True ならシートのヘッダーエラーでファイル全体を中断する (/process の従来の動作)。
+            False ならそのシートだけをエラーとして individual に記録し、残りのシートを処理する。
+    progress: 進捗の通知先 progress(stage, current=None, total=None)。
+              stage は 'reading' (CSV/TXT/PDFの読み込み開始), 'sheets' (シート i/N), 'pages' (PDFのページ i/N)。
+              例外を送出すれば処理をその場で中断できる (ジョブのキャンセルに使う)。
+    revision: revisions.Revision。渡すと前の版と同じ行の結果を使い回し、次の版のための行ごとの結果を記録する。
+              前の版があるときはシートの並列処理をしない (ワーカープロセスで処理したシートは行ごとの結果を記録しない)。
+    処理を続けられないときは ProcessingError を送出する。
+    """
+    filename = filename.lower()
+    if not filename.endswith(SUPPORTED_EXTENSIONS):
+        raise ProcessingError("対応していないファイル形式です。", 400)
+    source = as_file_source(file_data)
+    if file_hash is None:
+        file_hash = source.file_hash
+    if sheet_workers is None:
+        sheet_workers = SHEET_WORKERS
+    if revision is not None:
+        # 行ごとの結果 (RowMemo) はこのプロセスで作る必要があるので、シートは並列処理しない
+        sheet_workers = 1
+    if pdf_workers is None:
+        pdf_workers = PDF_WORKERS
+    if progress is None:
+        progress = _no_progress
+    FILES.inc(file_type=os.path.splitext(filename)[1].lstrip('.'))
+
+    collected = CollectedFile()
+    if filename.endswith(('.xlsx', '.xls')):
+        if selected_sheets is not None and not selected_sheets:
+            raise ProcessingError("処理するシートが選択されていません。", 400)
+        _collect_excel_sheets(filename, source, file_hash, selected_sheets, remove_parentheses,
+                              sheet_workers, strict, collected, progress, revision)
+    else:
+        _collect_flat_file(filename, source, file_hash, remove_parentheses, page_ranges, pdf_workers, collected,
+                           progress, revision)
+    return collected
+
+
+def finalize_collected(aggregator, cancellation_warnings, revision=None):
+    """
+    集計器 (BomAggregator) の内容を最終集計し、{"data", "warnings"} を返す。集計結果が空なら ProcessingError を送出する。
+    revision (revisions.Revision) を渡すと、前の版の全体集計の並べ替え結果を使い回し、次の版のために残す。
+    """
+    with stage('group'):
+        if revision is None:
+            combined_data, combined_duplicate_warnings = aggregator.finalize()
+        else:
+            combined_data, combined_duplicate_warnings = aggregator.finalize(revision.previous_groups('combined'))
+            revision.keep_groups('combined', aggregator)
+    combined_total_warnings = combined_duplicate_warnings + sorted(list(cancellation_warnings))
+
+    if not combined_data:
+        logger.info("最終集計データが空です")
+        raise ProcessingError("有効なデータが見つかりませんでした。列の名称やデータ行を確認してください。")
+    return {"data": combined_data, "warnings": combined_total_warnings}
+
+
+def process_file(filename, file_data, selected_sheets=None, remove_parentheses=True, page_ranges=None,
+                 sheet_workers=None, pdf_workers=None, strict=True, file_hash=None, progress=None, revision=None):
+    """
+    ファイル1件を処理し、/process と同じ形式の {"combined": ..., "individual": ...} を返す。
+    引数は collect_file と同じ。revision は処理が終わると前の版への参照を切る (revision.finish())。
+    """
+    try:
+        collected = collect_file(filename, file_data, selected_sheets, remove_parentheses, page_ranges,
+                                 sheet_workers, pdf_workers, strict, file_hash, progress, revision)
+        if progress:
+            progress('aggregating')
+        combined = finalize_collected(collected.aggregator, collected.cancellation_warnings, revision)
+    finally:
+        if revision is not None:
+            revision.finish()
+    # CSV/PDF/TXT はシートの区別が無いので individual は空
+    return {"combined": combined, "individual": collected.individual}
@@ -0,0 +1,121 @@
+# ref_parser.py
+import re
+from functools import lru_cache
+
+# --- 自作モジュールからインポート ---
+from utils import ref_pattern, ref_range_pattern
+
+# --- 部品番号セル (例: "C1-C48, R3(R4)") の分解とレンジ展開 ---
+
+# 括弧を空白に置き換えるための変換表 (replace を4回繰り返す代わり)
+_paren_to_space = str.maketrans({'(': ' ', ')': ' ', '（': ' ', '）': ' '})
+
+#区切り文字の追加--------[,、\s\.\・/\，]の中に　\追加したい文字　で可能
+_separator_pattern = re.compile(r'[,、\s\.\・/\，]+')
+
+# 括弧の前後で区切る位置。従来の3つの re.sub と同じ位置に空白を入れる:
+#   ")(" の間 / ")" と "C1" の間 / "C1" と "(" の間
+_paren_boundary_pattern = re.compile(r'(?<=[）)])(?=[（(]|[A-Z]+[0-9])|(?<=[A-Z])([0-9]+)(?=[（(])', re.IGNORECASE)
+
+_prefix_pattern = re.compile(r'^([A-Z]+)', re.IGNORECASE)
+_keep_mode_prefix_pattern = re.compile(r'^([A-Z(（]+)', re.IGNORECASE)
+
+# 同じ部品番号の文字列はシートやリビジョンをまたいで何度も現れるため、展開結果を覚えておく
+EXPAND_CACHE_SIZE = 65536
+
+
+def normalize_ref(ref):
+    # 括弧を取り除き、大文字にした比較用の部品番号 (取り消し線Refとの照合に使う)
+    return ref.translate(_paren_to_space).strip().upper()
+
+
+def _insert_boundary(match):
+    return (match.group(1) or '') + ' '
+
+def tokenize(ref_string):
+    """
+    部品番号セルの文字列を区切り文字と括弧の境界で分割したトークンのリストにする。
+    """
+    if '(' in ref_string or ')' in ref_string or '（' in ref_string or '）' in ref_string:
+        ref_string = _paren_boundary_pattern.sub(_insert_boundary, ref_string)
+    return [token for token in _separator_pattern.split(ref_string) if token]
+
+
+def _expand_range(range_match, current_ref, expanded_refs):
+    # "C1-C5" / "C1-5" を展開する。展開できたら接頭辞を、できなければ None を返す
+    prefix, start, opt_prefix, end = range_match.groups()
+    if not (start and end):
+        expanded_refs.append(current_ref)
+        return None
+    try:
+        if not opt_prefix:
+            opt_prefix = prefix
+        if prefix.upper() == opt_prefix.upper():
+            expanded_refs.extend([f"{prefix}{i}" for i in range(int(start), int(end) + 1)])
+            return prefix
+        expanded_refs.append(current_ref)
+    except ValueError:
+        expanded_refs.append(current_ref)
+    return None
+
+
+def _expand_removing_parentheses(tokens):
+    # --- 括弧削除モード (レンジ展開あり) ---
+    expanded_refs = []
+    last_prefix = ""
+    for part in tokens:
+        prefix_match = _prefix_pattern.match(part)
+        if prefix_match:
+            last_prefix = prefix_match.group(1)
+
+        current_ref = part
+        if part.isdigit() and last_prefix:
+            current_ref = f"{last_prefix}{part}"
+
+        range_match = ref_range_pattern.match(current_ref)
+        if range_match:
+            range_prefix = _expand_range(range_match, current_ref, expanded_refs)
+            if range_prefix:
+                last_prefix = range_prefix
+        elif ref_pattern.fullmatch(current_ref):
+            expanded_refs.append(current_ref)
+    return expanded_refs
+
+
+def _expand_keeping_parentheses(tokens):
+    # --- 括弧保持モード (レンジ展開あり, 出力は括弧付きのまま) ---
+    expanded_refs = []
+    last_prefix = ""
+    for part in tokens:
+        bare_part = part.translate(_paren_to_space).strip()
+        if not bare_part: continue
+
+        prefix_match = _keep_mode_prefix_pattern.match(bare_part)
+        if prefix_match:
+            last_prefix = prefix_match.group(1)
+
+        current_ref = part
+        if bare_part.isdigit() and last_prefix:
+            current_ref = part.replace(bare_part, f"{last_prefix}{bare_part}", 1)
+            bare_part = current_ref.translate(_paren_to_space).strip()
+
+        range_match = ref_range_pattern.match(bare_part)
+        if range_match:
+            range_prefix = _expand_range(range_match, current_ref, expanded_refs)
+            if range_prefix:
+                last_prefix = range_prefix
+        elif ref_pattern.fullmatch(bare_part):
+            expanded_refs.append(current_ref)
+    return expanded_refs
+
+
+@lru_cache(maxsize=EXPAND_CACHE_SIZE)
+def expand(ref_string, remove_parentheses=True):
+    """
+    部品番号セルの文字列を、個々の部品番号のタプルに展開する (取り消し線による除外は行わない)。
+    例: "C1-C3, R5" -> ("C1", "C2", "C3", "R5")
+    remove_parentheses=False の場合、"(C1)" のような括弧付きの表記はそのまま残す。
+    """
+    if remove_parentheses:
+        return tuple(_expand_removing_parentheses(tokenize(ref_string.translate(_paren_to_space))))
+    return tuple(_expand_keeping_parentheses(tokenize(ref_string)))
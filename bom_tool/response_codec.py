@@ -0,0 +1,184 @@
+# response_codec.py
+import os
+import json
+import gzip
+
+# orjson / brotli は無くても動く (あれば JSON 化を orjson で、圧縮を brotli でも行う)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- 大きな処理結果の圧縮形式 (?format=compact) ---
+# 通常の結果 {"combined": {"data": [{"ref", "part", "mfg"}, ...], "warnings": [...]}, "individual": {...}} を、
+#   {"format": "compact-v1", "parts": [型番...], "mfgs": [メーカー...], "result": {...}}
+# にする。result の中の {"data": [...]} を持つ表は、"data" の代わりに列ごとの配列 "columns" を持つ:
+#   "columns": {"ref": [部品番号...], "part": [parts の番号...], "mfg": [mfgs の番号...]}
+# 型番とメーカーは全シート共通の辞書 (parts / mfgs) の番号で表す。
+# 部品番号は ", " 区切りの文字列のまま、または連番を [接頭辞, 最初の番号, 最後の番号] に縮めた配列で表す:
+#   "C1, C2, C3, C4, R7" -> [["C", 1, 4], "R7"]
+# 復元は index.html の decodeCompact() (と decode_compact()) で行う。
+COMPACT_FORMAT = 'compact-v1'
+
+# BOM_COMPRESS_MIN_BYTES: これより小さい応答は圧縮しない
+# BOM_GZIP_LEVEL / BOM_BROTLI_QUALITY: 圧縮レベル (応答のたびに圧縮するので、速さ寄りの値を既定にする)
+COMPRESS_MIN_BYTES = int(os.environ.get('BOM_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('BOM_GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.environ.get('BOM_BROTLI_QUALITY', '5'))
+
+_DIGITS = '0123456789'
+_MAX_DIGITS = 15 # 連番にする番号の桁数の上限 (JavaScript の数値で正確に扱える範囲)
+_MIN_RUN = 3 # これ以上続く連番だけを範囲にする
+
+
+def _ref_number(ref, prefix):
+    # 'C10' (接頭辞 'C') -> 10。番号が無い・先頭が0 ('C01') など、文字列に戻すと変わってしまうものは None
+    digits = ref[len(prefix):]
+    if not digits or len(digits) > _MAX_DIGITS or (digits[0] == '0' and len(digits) > 1):
+        return None
+    return int(digits)
+
+
+def encode_refs(ref_text):
+    """
+    ", " 区切りの部品番号を、連番を範囲にした配列にする。縮められる連番が無ければ文字列のまま返す。
+    """
+    refs = ref_text.split(', ')
+    if len(refs) < _MIN_RUN:
+        return ref_text
+    prefixes = [ref.rstrip(_DIGITS) for ref in refs]
+    items = []
+    has_run = False
+    i = 0
+    while i < len(refs):
+        # refs[i] から、同じ接頭辞で番号が1ずつ増える間を1つの連番とみなす
+        prefix = prefixes[i]
+        end = i + 1
+        number = _ref_number(refs[i], prefix)
+        if number is not None:
+            while end < len(refs) and prefixes[end] == prefix and _ref_number(refs[end], prefix) == number + (end - i):
+                end += 1
+        if end - i >= _MIN_RUN:
+            items.append([prefix, number, number + (end - i) - 1])
+            has_run = True
+        else:
+            items.extend(refs[i:end])
+        i = end
+    return items if has_run else ref_text
+
+
+def decode_refs(value):
+    if isinstance(value, str):
+        return value
+    refs = []
+    for item in value:
+        if isinstance(item, str):
+            refs.append(item)
+        else:
+            prefix, first, last = item
+            refs.extend(f"{prefix}{number}" for number in range(first, last + 1))
+    return ', '.join(refs)
+
+
+class _Dictionary:
+    """文字列 -> 番号 の辞書 (出てきた順に番号を振る)。"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _encode_table(table, parts, mfgs, encoded_refs):
+    rows = table["data"]
+    encoded = {key: value for key, value in table.items() if key != "data"}
+    ref_column = []
+    for row in rows:
+        ref_text = row.get('ref', '')
+        value = encoded_refs.get(ref_text)
+        if value is None:
+            value = encoded_refs[ref_text] = encode_refs(ref_text)
+        ref_column.append(value)
+    encoded["columns"] = {
+        "ref": ref_column,
+        "part": [parts.code(row.get('part', '')) for row in rows],
+        "mfg": [mfgs.code(row.get('mfg', '')) for row in rows],
+    }
+    return encoded
+
+
+def encode_compact(result):
+    """
+    処理結果 (/process, /process_batch, ジョブの結果) を compact-v1 の形式にする。
+    """
+    parts = _Dictionary()
+    mfgs = _Dictionary()
+    # 同じ部品番号の並びは全体集計とシート別の結果の両方に出てくるので、縮めた結果を使い回す
+    encoded_refs = {}
+
+    def encode(value):
+        if isinstance(value, dict):
+            if isinstance(value.get("data"), list):
+                return _encode_table(value, parts, mfgs, encoded_refs)
+            return {key: encode(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [encode(item) for item in value]
+        return value
+
+    body = encode(result)
+    return {"format": COMPACT_FORMAT, "parts": parts.values, "mfgs": mfgs.values, "result": body}
+
+
+def decode_compact(payload):
+    """encode_compact() の逆 (元の処理結果に戻す)。"""
+    parts = payload["parts"]
+    mfgs = payload["mfgs"]
+
+    def decode(value):
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        decoded = {}
+        for key, item in value.items():
+            if key == "columns" and isinstance(item, dict) and isinstance(item.get("part"), list):
+                decoded["data"] = [{'ref': decode_refs(ref), 'part': parts[part], 'mfg': mfgs[mfg]}
+                                   for ref, part, mfg in zip(item["ref"], item["part"], item["mfg"])]
+            else:
+                decoded[key] = decode(item)
+        return decoded
+
+    return decode(payload["result"])
+
+
+def dumps(value):
+    """JSON のバイト列にする (orjson があれば orjson で)。"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def supported_encodings():
+    """圧縮に使える Content-Encoding (優先する順)。"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(body, encoding):
+    """body を encoding ('br' / 'gzip' / None) で圧縮する。小さいものは圧縮せず (body, None) を返す。"""
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
@@ -0,0 +1,138 @@
+# result_cache.py
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# --- 解析結果のキャッシュ (メモリ上のLRU + 任意のディスク層) ---
+class ResultCache:
+    """
+    同じファイルを再送信したときに、シートの解析結果やフラットリストを再利用するためのキャッシュ。
+    キーはファイル内容のSHA-256を先頭に含むタプル。
+    メモリから追い出されたエントリは、disk_dir が指定されていればディスクへ退避する。
+    """
+
+    def __init__(self, max_entries=64, disk_dir=None, max_disk_entries=512):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        # ディスクから読めたものはメモリ層に戻す
+        self.put(key, value)
+        return value
+
+    def __contains__(self, key):
+        # 統計 (ヒット/ミス) を変えずに、キーがメモリ層かディスク層にあるかだけを調べる
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        spilled = []
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                spilled.append(self._entries.popitem(last=False))
+                self.evictions += 1
+        for old_key, old_value in spilled:
+            self._write_disk(old_key, old_value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "disk_enabled": bool(self.disk_dir),
+            }
+
+    # --- ディスク層 ---
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if stored_key != key:
+            return None
+        try:
+            os.utime(path)  # ディスク層のLRU判定用に更新時刻を進める
+        except OSError:
+            pass
+        return value
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        try:
+            names = [n for n in os.listdir(self.disk_dir) if n.endswith('.pkl')]
+        except OSError:
+            return
+        if len(names) <= self.max_disk_entries:
+            return
+        paths = [os.path.join(self.disk_dir, n) for n in names]
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.disk_evictions += 1
+            except OSError:
+                pass
@@ -0,0 +1,118 @@
+# result_pages.py
+import os
+import bisect
+import threading
+from collections import OrderedDict
+
+# --- 保管した結果のページ分割と検索 (プレビュー用) ---
+# ブラウザには結果全体を送らず、/results/<結果ID>/<タブ>?offset=&limit=&q= で表示する分だけを返す。
+# 検索は部品番号・型番・メーカーの部分一致 (大文字小文字を区別しない)。
+# タブごとに、全行を小文字にして1つの文字列につないだ索引を作っておき、str.find で探す。
+# BOM_PAGE_DEFAULT_LIMIT: limit を省略したときの行数, BOM_PAGE_MAX_LIMIT: 1回に返す行数の上限
+PAGE_DEFAULT_LIMIT = int(os.environ.get('BOM_PAGE_DEFAULT_LIMIT', '100'))
+PAGE_MAX_LIMIT = int(os.environ.get('BOM_PAGE_MAX_LIMIT', '1000'))
+
+_ROW_SEPARATOR = '\n'
+_FIELD_SEPARATOR = '\x1f' # 部品番号と型番にまたがって一致しないよう、列の間に入れる
+_QUERY_CACHE_SIZE = 8 # タブごとに、直近の検索結果 (一致した行番号) を保持する数
+
+
+def _clean(text):
+    return str(text).replace(_ROW_SEPARATOR, ' ').replace(_FIELD_SEPARATOR, ' ').lower()
+
+
+class TextIndex:
+    """
+    文字列のリストの部分一致検索用の索引。全件を1つの文字列につなぎ、各要素の開始位置を持つ。
+    """
+
+    def __init__(self, texts):
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + 1
+        self._starts = starts
+        self._text = _ROW_SEPARATOR.join(texts)
+
+    def search(self, query):
+        """query を含む要素の番号のリストを返す (番号順)。"""
+        matches = []
+        text = self._text
+        starts = self._starts
+        position = text.find(query)
+        while position >= 0:
+            index = bisect.bisect_right(starts, position) - 1
+            matches.append(index)
+            if index + 1 >= len(starts):
+                break
+            # 同じ要素の中の2つめ以降の一致は数えず、次の要素から探す
+            position = text.find(query, starts[index + 1])
+        return matches
+
+
+class TabIndex:
+    """1つのタブ (全体集計またはシート) の行と警告の索引。"""
+
+    def __init__(self, rows, warnings):
+        self.rows = rows
+        self.warnings = warnings
+        self._row_index = TextIndex([
+            _FIELD_SEPARATOR.join((_clean(row.get('ref', '')), _clean(row.get('part', '')), _clean(row.get('mfg', ''))))
+            for row in rows
+        ])
+        self._warning_index = TextIndex([_clean(warning) for warning in warnings])
+        self._matches = OrderedDict() # (種類, 検索語) -> 一致した番号のリスト
+        self._lock = threading.Lock()
+
+    def _search(self, kind, index, query):
+        # 次のページを取りに来たときに探し直さずに済むよう、直近の検索結果を残しておく
+        key = (kind, query)
+        with self._lock:
+            matches = self._matches.get(key)
+            if matches is not None:
+                self._matches.move_to_end(key)
+                return matches
+        matches = index.search(query)
+        with self._lock:
+            self._matches[key] = matches
+            while len(self._matches) > _QUERY_CACHE_SIZE:
+                self._matches.popitem(last=False)
+        return matches
+
+    def page(self, kind, offset, limit, query=''):
+        """
+        kind ('rows' / 'warnings') の offset 件目から limit 件を返す。query があれば一致するものだけを数える。
+        返り値は (要素のリスト, 一致した件数)。
+        """
+        items = self.rows if kind == 'rows' else self.warnings
+        query = _clean(query.strip())
+        if not query:
+            return items[offset:offset + limit], len(items)
+        index = self._row_index if kind == 'rows' else self._warning_index
+        matches = self._search(kind, index, query)
+        return [items[i] for i in matches[offset:offset + limit]], len(matches)
+
+
+def summarize_result(result):
+    """
+    結果から行と警告を除き、タブごとの件数だけを返す (?format=summary)。
+    {"result_id", "combined": {"count", "warning_count"}, "individual": {シート名: {"count", "warning_count"} または {"error"}}}
+    """
+    def summarize(table):
+        if "data" not in table:
+            return {"error": table.get("error", "")}
+        return {"count": len(table["data"]), "warning_count": len(table.get("warnings", []))}
+
+    summary = {key: value for key, value in result.items() if key not in ("combined", "individual")}
+    summary["combined"] = summarize(result["combined"])
+    summary["individual"] = {sheet_name: summarize(table) for sheet_name, table in result.get("individual", {}).items()}
+    return summary
+
+
+def build_tab_index(result, tab):
+    """結果のタブ ('combined' またはシート名) の TabIndex を作る。タブが無ければ None。"""
+    table = result["combined"] if tab == 'combined' else result.get("individual", {}).get(tab)
+    if not table or "data" not in table:
+        return None
+    return TabIndex(table["data"], table.get("warnings", []))
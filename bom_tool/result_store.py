@@ -0,0 +1,70 @@
+# result_store.py
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+
+# --- 処理結果の保管 (エクスポートやプレビューで結果IDから参照する) ---
+class ResultStore:
+    """
+    /process やジョブの結果 ({"combined": ..., "individual": ...}) を結果IDに結び付けて保持する。
+    最後に使われてから ttl_seconds 秒たったもの、または max_entries を超えたときの古いものから捨てる。
+    """
+
+    def __init__(self, ttl_seconds=1800, max_entries=32):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._results = OrderedDict() # 結果ID -> [結果, 最後に使われた時刻, 結果から作ったもの {key: 値}]
+        self._lock = threading.Lock()
+
+    def put(self, result, derived=None):
+        """結果を保管して結果IDを返す。derived には、結果と一緒に保持するもの {key: 値} を最初から入れておける。"""
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._purge_expired()
+            self._results[result_id] = [result, time.monotonic(), dict(derived or {})]
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result_id
+
+    def _touch(self, result_id):
+        # 呼び出し側で self._lock を取っておく
+        self._purge_expired()
+        entry = self._results.get(result_id)
+        if entry is not None:
+            entry[1] = time.monotonic()
+            self._results.move_to_end(result_id)
+        return entry
+
+    def get(self, result_id):
+        """結果IDに対応する結果を返す。期限切れや不明なIDなら None。"""
+        with self._lock:
+            entry = self._touch(result_id)
+            return entry[0] if entry is not None else None
+
+    def get_derived(self, result_id, key, build):
+        """
+        結果から build(結果) で作るもの (プレビューの索引など) を返す。key ごとに1度だけ作り、結果と一緒に保持する
+        (結果が捨てられれば一緒に捨てる)。結果が見つからなければ None。
+        """
+        with self._lock:
+            entry = self._touch(result_id)
+            if entry is None:
+                return None
+            derived = entry[2]
+            if key in derived:
+                return derived[key]
+        # 作るのに時間がかかることがあるので、ロックの外で作る (同時に作られたら先に入ったほうを使う)
+        value = build(entry[0])
+        with self._lock:
+            return derived.setdefault(key, value)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        # 先頭ほど最後に使われたのが古いので、期限内のものに当たったら止める
+        while self._results:
+            result_id, (_, last_used, _) = next(iter(self._results.items()))
+            if now - last_used <= self.ttl_seconds:
+                break
+            del self._results[result_id]
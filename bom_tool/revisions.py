@@ -0,0 +1,173 @@
+# revisions.py
+import os
+
+# --- 自作モジュールをインポート ---
+from bom_processor import ref_sort_key
+from ref_parser import normalize_ref
+
+# --- 改訂版の処理 (前の版の結果IDを添えて、同じBOMの新しい版を送る) ---
+# /process と /jobs のフォームに previous_result_id (前の版の結果ID) を送ると、
+#   1. 前の版と内容が同じ行は、前の版で作ったフラットリストの要素を使い、変わった行だけ部品番号を展開し直す
+#   2. 部品番号の集合が前の版と同じグループは、部品番号の並べ替えをやり直さない
+#   3. 全体集計を前の版と部品番号ごとに比べた差分を、結果の "diff" として返す
+# 行の内容は extract_flat_list_from_rows の1パス目のレコード (部品番号・型番・メーカーのセルの値、継続記号、
+# 型番の取り消し線。型番とメーカーは last_valid で継続記号を置き換えた後の値) で、
+# 前の行の部品番号を引き継ぐ行はその部品番号も含める。行の内容のタプルを辞書のキー (内容のハッシュ) にして前の版の結果を探す。
+# 行ごとの結果は結果と同じくらいのメモリを使うので、次の版のために保管するのは、フォームで track_revisions=true を送ったとき
+# (previous_result_id を送ったときも、その次の版のために保管する) か、BOM_TRACK_REVISIONS が 1 のときだけ。
+# 保管していない版を前の版に指定したときは、差分だけを返す (全行を展開し直す)。
+# BOM_TRACK_REVISIONS: 1 なら、すべての結果について行ごとの結果を保管する
+TRACK_REVISIONS = int(os.environ.get('BOM_TRACK_REVISIONS', '0'))
+
+
+class RowMemo:
+    """
+    シート1枚分の、行の内容 -> 行の処理結果 (bom_processor._expand_row の返り値)。
+    前の版の同じシートの RowMemo を previous に渡すと、内容が同じ行の結果を使い回す。
+    """
+
+    def __init__(self, previous=None):
+        self._previous = previous
+        self._previous_rows = {}
+        self.context = None
+        self.cancellation_refs = frozenset()
+        self.rows = {}
+        self.reused = 0
+        self.expanded = 0
+
+    def begin(self, context, cancellation_refs):
+        """
+        context は全行の結果に効く設定 (括弧削除オプション・メーカー推測ルール) で、前の版と同じときだけ前の版の結果を使う。
+        cancellation_refs (大文字にした取り消し線Ref) が前の版から増減していれば、増減した部品番号を含む行の結果は使わない。
+        """
+        previous = self._previous
+        self._previous = None
+        self.context = context
+        self.cancellation_refs = frozenset(cancellation_refs)
+        self.rows = {}
+        if previous is None or previous.context != context:
+            self._previous_rows = {}
+            return
+        changed = previous.cancellation_refs ^ self.cancellation_refs
+        if not changed:
+            self._previous_rows = previous.rows
+            return
+        # 行の結果は (引き継ぐ部品番号, フラットリストの要素, 除外した部品番号, 型番の取り消し線警告)
+        self._previous_rows = {
+            key: outcome for key, outcome in previous.rows.items()
+            if changed.isdisjoint(outcome[2]) and changed.isdisjoint(map(normalize_ref, outcome[0]))
+        }
+
+    def lookup(self, key):
+        """前の版 (またはこの版の前の行) に同じ内容の行があればその結果を、無ければ None を返す。"""
+        outcome = self.rows.get(key)
+        if outcome is None:
+            outcome = self._previous_rows.get(key)
+            if outcome is None:
+                return None
+            self.rows[key] = outcome
+        self.reused += 1
+        return outcome
+
+    def store(self, key, outcome):
+        self.rows[key] = outcome
+        self.expanded += 1
+
+    def release_previous(self):
+        self._previous = None
+        self._previous_rows = {}
+
+
+class Revision:
+    """
+    ファイル1件の処理で作る、次の版の処理のための情報。previous は前の版の Revision (無ければ None)。
+    previous_result_id と previous_result は差分を取る前の版の結果ID と結果。
+    sheets はシートのキー -> RowMemo、groups はタブ ('combined' またはシート名) -> BomAggregator.sorted_groups()。
+    """
+
+    def __init__(self, previous=None, previous_result_id=None, previous_result=None):
+        self.previous = previous
+        self.previous_result_id = previous_result_id
+        self.previous_result = previous_result
+        self.sheets = {}
+        self.groups = {}
+
+    def row_memo(self, sheet_key):
+        previous = self.previous.sheets.get(sheet_key) if self.previous is not None else None
+        memo = self.sheets[sheet_key] = RowMemo(previous)
+        return memo
+
+    def previous_groups(self, tab):
+        return self.previous.groups.get(tab) if self.previous is not None else None
+
+    def keep_groups(self, tab, aggregator):
+        self.groups[tab] = aggregator.sorted_groups()
+
+    def finish(self):
+        """処理が終わったら前の版への参照を切る (版を重ねても古い版が残り続けないように)。"""
+        self.previous = None
+        for memo in self.sheets.values():
+            memo.release_previous()
+
+    def diff(self, result):
+        """前の版の結果があれば、result との差分 (diff_results に前の版の結果IDと行数を加えたもの) を返す。無ければ None。"""
+        if self.previous_result is None:
+            return None
+        diff = diff_results(self.previous_result, result)
+        diff["previous_result_id"] = self.previous_result_id
+        diff["rows"] = self.row_counts()
+        self.previous_result = None
+        return diff
+
+    def row_counts(self):
+        """{"reused": 前の版の結果を使った行数, "expanded": 展開し直した行数}"""
+        return {"reused": sum(memo.reused for memo in self.sheets.values()),
+                "expanded": sum(memo.expanded for memo in self.sheets.values())}
+
+
+def _assignments(table):
+    # {部品番号: {(型番, メーカー): None}} (部品番号の無い型番は '' にまとめる)
+    assignments = {}
+    for row in table.get("data", []):
+        key = (row['part'], row['mfg'])
+        for ref in (row['ref'].split(', ') if row['ref'] else ['']):
+            parts = assignments.get(ref)
+            if parts is None:
+                assignments[ref] = {key: None}
+            else:
+                parts[key] = None
+    return assignments
+
+
+def _part_list(part_keys):
+    return [{"part": part, "mfg": mfg} for part, mfg in part_keys]
+
+
+def diff_results(previous, result):
+    """
+    前の版の結果 previous と result の全体集計を部品番号ごとに比べ、
+    {"added": [...], "removed": [...], "changed": [...], "counts": {"added", "removed", "changed"}} を返す。
+    added / removed の要素は {"ref", "part", "mfg"}、changed の要素は {"ref", "before": [{"part", "mfg"}], "after": [...]}。
+    部品番号の無い型番は ref を "" として added / removed に入れる。部品番号は自然順に並べる。
+    """
+    before = _assignments(previous["combined"])
+    after = _assignments(result["combined"])
+    added, removed, changed = [], [], []
+
+    for ref in sorted(sorted(before.keys() | after.keys()), key=ref_sort_key):
+        old_parts = before.get(ref, {})
+        new_parts = after.get(ref, {})
+        if old_parts.keys() == new_parts.keys():
+            continue
+        if ref and old_parts and new_parts:
+            changed.append({"ref": ref, "before": _part_list(old_parts), "after": _part_list(new_parts)})
+            continue
+        removed.extend({"ref": ref, "part": part, "mfg": mfg} for part, mfg in old_parts if (part, mfg) not in new_parts)
+        added.extend({"ref": ref, "part": part, "mfg": mfg} for part, mfg in new_parts if (part, mfg) not in old_parts)
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "counts": {"added": len(added), "removed": len(removed), "changed": len(changed)},
+    }
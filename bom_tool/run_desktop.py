@@ -1,15 +1,14 @@
 import webview
 import json
-import csv
-import openpyxl # Excel書き出し用にインポート
-from app import app # app.pyからFlaskの 'app' オブジェクトをインポート
+from app import app, result_store # app.pyからFlaskの 'app' オブジェクトと処理結果の保管場所をインポート
+from exporter import select_tab, write_csv, write_xlsx
 
 # 1. Python側の処理をまとめたAPIクラスを定義
 class Api:
-    def save_file_dialog(self, data_json, file_type):
+    def _ask_save_path(self, file_type):
         """
-        JavaScriptから呼び出される関数。
-        ファイル保存ダイアログを開き、指定された形式でファイルを保存する。
+        「名前を付けて保存」ダイアログを開き、(保存パス, エラーの応答) を返す。
+        キャンセルや不明な形式の場合は保存パスが None になり、エラーの応答をそのまま JavaScript に返す。
         """
         window = webview.active_window()
         
@@ -20,7 +19,7 @@ class Api:
             file_types = ('CSV File (*.csv)',)
             default_extension = '.csv'
         else:
-            return {'status': 'error', 'message': 'Unknown file type'}
+            return None, {'status': 'error', 'message': 'Unknown file type'}
 
         # 2. 「名前を付けて保存」ダイアログを表示
         result = window.create_file_dialog(
@@ -30,7 +29,7 @@ class Api:
         )
         
         if not result:
-            return {'status': 'cancelled', 'message': 'Save cancelled'}
+            return None, {'status': 'cancelled', 'message': 'Save cancelled'}
         
         # 3. ユーザーが選択した保存パスを取得
         save_path = result[0] if isinstance(result, (list, tuple)) else result
@@ -38,6 +37,42 @@ class Api:
         # 4. 拡張子を強制
         if not save_path.lower().endswith(default_extension):
             save_path += default_extension
+        return save_path, None
+
+    def save_result(self, result_id, tab, file_type):
+        """
+        JavaScriptから呼び出される関数。
+        サーバー側に保管された処理結果 (result_id) のタブを、JSONを経由せずにそのまま保存する。
+        """
+        data = result_store.get(result_id)
+        if data is None:
+            return {'status': 'error', 'message': '結果が見つかりません。もう一度ファイルを処理してください。'}
+        rows = select_tab(data, tab)
+        if rows is None:
+            return {'status': 'error', 'message': f"タブ '{tab}' の結果がありません。"}
+
+        save_path, response = self._ask_save_path(file_type)
+        if save_path is None:
+            return response
+
+        try:
+            if file_type == 'excel':
+                write_xlsx(rows, save_path)
+            else:
+                write_csv(rows, save_path)
+            return {'status': 'success', 'path': save_path}
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
+    def save_file_dialog(self, data_json, file_type):
+        """
+        JavaScriptから呼び出される関数。
+        ファイル保存ダイアログを開き、指定された形式でファイルを保存する。
+        (結果IDが無い場合の従来の経路。通常は save_result を使う)
+        """
+        save_path, response = self._ask_save_path(file_type)
+        if save_path is None:
+            return response
 
         try:
             # 5. JavaScriptから渡されたJSONデータをPythonの辞書リストに戻す
@@ -59,35 +94,15 @@ class Api:
     
     def _save_excel(self, data, save_path):
         """
-        openpyxlを使ってExcelファイルを作成・保存する
+        openpyxl の write_only モードでExcelファイルを作成・保存する
         """
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'BOM'
-        
-        # ヘッダー
-        ws.append(['部品番号', '部品型番', 'メーカー'])
-        
-        # データ
-        for row in data:
-            ws.append([row.get('ref', ''), row.get('part', ''), row.get('mfg', '')])
-            
-        wb.save(save_path) # 指定されたパスに保存
+        write_xlsx(data, save_path)
 
     def _save_csv(self, data, save_path):
         """
-        csvモジュールを使ってCSVファイルを作成・保存する
+        BOM付きUTF-8のCSVファイルを作成・保存する (Excelで開いたときに文字化けしない)
         """
-        # utf-8-sig にするとExcelで開いたときに文字化けしない
-        with open(save_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            
-            # ヘッダー
-            writer.writerow(['部品番号', '部品型番', 'メーカー'])
-            
-            # データ
-            for row in data:
-                writer.writerow([row.get('ref', ''), row.get('part', ''), row.get('mfg', '')])
+        write_csv(data, save_path)
 
 # -----------------
 # メインの処理
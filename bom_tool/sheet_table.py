@@ -0,0 +1,116 @@
+# sheet_table.py
+import os
+
+# --- 1行分のセル (セルごとの辞書の代わりに、文字列のタプル + 取り消し線のビットマスク) ---
+class SheetRow:
+    """
+    values: セルの文字列のタプル (末尾の空セルは省略される)
+    struck: 取り消し線のあるセルの列番号をビットで表した整数 (列 j なら 1 << j)
+    """
+    __slots__ = ('values', 'struck')
+
+    def __init__(self, values, struck=0):
+        self.values = values
+        self.struck = struck
+
+    def value(self, col):
+        values = self.values
+        return values[col] if col < len(values) else ""
+
+    def is_struck(self, col):
+        return (self.struck >> col) & 1 == 1
+
+    def is_blank(self):
+        for value in self.values:
+            if value.strip():
+                return False
+        return True
+
+    def __repr__(self):
+        return f"SheetRow({self.values!r}, struck={bin(self.struck)})"
+
+
+def make_row(values, struck=0):
+    # 末尾の空セルは持たない (範囲外の列は空文字として扱われるので結果は変わらない)
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    return SheetRow(tuple(values[:end]) if end != len(values) else tuple(values), struck)
+
+
+# --- ヘッダー検出後の列の絞り込み ---
+# ヘッダーが決まった後の行で必要なのは、部品番号・型番・メーカーの3列の文字列と、
+# 行が空かどうか (他の列だけに文字がある行は空行ではない) だけ。
+# 他の列の取り消し線の部品番号はパーサーが cancellation_refs に集めるので、行には残さない。
+# BOM_PRUNE_COLUMNS: 0 なら絞り込まない (全列の行を読む)
+PRUNE_COLUMNS = int(os.environ.get('BOM_PRUNE_COLUMNS', '1'))
+OTHER_TEXT = '*' # 残さなかった列に文字があったことを表す印 (残す列のどれよりも右に置く)
+
+
+class ColumnProjection:
+    """
+    パーサーと extract_flat_list_from_rows が共有する、残す列の指定。
+    columns が None の間 (ヘッダー検出中) はパーサーは全列の行を返す。
+    extract_flat_list_from_rows がヘッダーを決めると set_columns() で残す列を指定し、
+    以降の行はパーサーが project() で、その列だけを元の位置に持つ SheetRow にする。
+    """
+    __slots__ = ('columns', 'width', '_column_set', '_mask')
+
+    def __init__(self):
+        self.columns = None
+        self.width = 0
+        self._column_set = frozenset()
+        self._mask = 0
+
+    def set_columns(self, columns):
+        self.columns = tuple(sorted(set(columns)))
+        self.width = self.columns[-1] + 1
+        self._column_set = frozenset(self.columns)
+        self._mask = sum(1 << col for col in self.columns)
+
+    def project(self, width, text_of, struck=0):
+        """
+        width 列の行を、残す列だけの SheetRow にする。text_of(列番号) はその列のセルの文字列を返す。
+        残さない列の text_of は、残す列がすべて空の行で、空行かどうかを決めるときにだけ呼ぶ。
+        """
+        values = [""] * self.width
+        for col in self.columns:
+            if col < width:
+                values[col] = text_of(col)
+        if not any(value.strip() for value in values):
+            column_set = self._column_set
+            if any(text_of(col).strip() for col in range(width) if col not in column_set):
+                values.append(OTHER_TEXT)
+        return make_row(values, struck & self._mask)
+
+
+def new_projection():
+    """パーサーと extract_flat_list_from_rows に渡す ColumnProjection (絞り込まない設定なら None)。"""
+    return ColumnProjection() if PRUNE_COLUMNS else None
+
+
+# --- シート全体を保持するコンパクトな表 (キャッシュ用) ---
+class SheetTable:
+    """
+    行ごとの文字列タプルの表と、取り消し線のある行だけを持つ疎なビットマップで1シートを保持する。
+    反復すると SheetRow を1行ずつ返すので、extract_flat_list_from_rows にそのまま渡せる。
+    """
+
+    def __init__(self, rows=()):
+        self._values = []
+        self._struck = {} # 行番号 -> 取り消し線のビットマスク (取り消し線の無い行は持たない)
+        for row in rows:
+            self.append(row)
+
+    def append(self, row):
+        if row.struck:
+            self._struck[len(self._values)] = row.struck
+        self._values.append(row.values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        struck = self._struck
+        for i, values in enumerate(self._values):
+            yield SheetRow(values, struck.get(i, 0))
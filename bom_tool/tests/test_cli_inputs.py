@@ -0,0 +1,45 @@
+# test_cli_inputs.py
+# コマンドラインの一括変換 (cli.py) で、出力先が重なる入力を処理の前に止めることのテスト
+#   python -m pytest bom_tool/tests
+import os
+import sys
+
+import pytest
+
+BOM_TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOM_TOOL_DIR)
+
+from cli import find_inputs, output_clashes, main
+
+CSV_TEXT = "Ref,Part Number,Manufacturer\nR1,RC0402,Yageo\n"
+
+
+def _write_bom(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / "bom.csv"
+    path.write_text(CSV_TEXT, encoding='utf-8')
+    return str(path)
+
+
+def test_same_name_in_two_inputs_is_a_clash(tmp_path):
+    first = _write_bom(tmp_path / "a")
+    second = _write_bom(tmp_path / "b")
+    assert output_clashes(find_inputs([first, second])) == [("bom.csv", [first, second])]
+    # 同じ名前のファイルを含むフォルダを2つ指定しても重なる
+    assert output_clashes(find_inputs([str(tmp_path / "a"), str(tmp_path / "b")])) == [("bom.csv", [first, second])]
+
+
+def test_same_file_twice_is_not_a_clash(tmp_path):
+    path = _write_bom(tmp_path / "a")
+    inputs = find_inputs([path, path, str(tmp_path / "a")])
+    assert inputs == [(path, "bom.csv")]
+    assert output_clashes(inputs) == []
+
+
+def test_main_stops_before_writing_clashing_outputs(tmp_path, capsys):
+    output_dir = tmp_path / "out"
+    with pytest.raises(SystemExit) as excinfo:
+        main([_write_bom(tmp_path / "a"), _write_bom(tmp_path / "b"), '-o', str(output_dir), '-j', '1'])
+    assert excinfo.value.code == 2
+    assert "bom.csv" in capsys.readouterr().err
+    assert not output_dir.exists()
@@ -0,0 +1,59 @@
+# test_header_scan_rows.py
+# ヘッダー行を探す範囲 (BOM_HEADER_SCAN_ROWS) のテスト
+#   python -m pytest bom_tool/tests
+import os
+import sys
+import json
+import subprocess
+
+BOM_TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOM_TOOL_DIR)
+
+from utils import read_header_scan_rows, DEFAULT_HEADER_SCAN_ROWS
+
+# 表題と注記が24行あり、25行目にヘッダーがある CSV
+NOTE_ROWS = 24
+CSV_TEXT = ''.join(f"注記 {i}\n" for i in range(NOTE_ROWS)) + "Ref,Part Number,Manufacturer\nC1-C2,GRM155,Murata\nR1,RC0402,Yageo\n"
+
+_PROCESS_SCRIPT = """
+import sys, json
+from pipeline import process_file, ProcessingError
+try:
+    result = process_file('bom.csv', sys.stdin.buffer.read())
+    print(json.dumps({"data": result["combined"]["data"]}))
+except ProcessingError as e:
+    print(json.dumps({"error": e.message}))
+"""
+
+
+def _process_csv(header_scan_rows=None):
+    # HEADER_SCAN_ROWS は読み込み時に決まるので、環境変数を設定した別プロセスで処理する
+    env = dict(os.environ, BOM_CACHE_SIZE='0')
+    env.pop('BOM_HEADER_SCAN_ROWS', None)
+    if header_scan_rows is not None:
+        env['BOM_HEADER_SCAN_ROWS'] = header_scan_rows
+    completed = subprocess.run([sys.executable, '-c', _PROCESS_SCRIPT], input=CSV_TEXT.encode('utf-8'),
+                               capture_output=True, cwd=BOM_TOOL_DIR, env=env, check=True)
+    return json.loads(completed.stdout)
+
+
+def test_read_header_scan_rows():
+    assert read_header_scan_rows({}) == DEFAULT_HEADER_SCAN_ROWS
+    assert read_header_scan_rows({'BOM_HEADER_SCAN_ROWS': '50'}) == 50
+    # 不正な値は既定値に戻す
+    assert read_header_scan_rows({'BOM_HEADER_SCAN_ROWS': 'abc'}) == DEFAULT_HEADER_SCAN_ROWS
+    assert read_header_scan_rows({'BOM_HEADER_SCAN_ROWS': '0'}) == DEFAULT_HEADER_SCAN_ROWS
+    assert read_header_scan_rows({'BOM_HEADER_SCAN_ROWS': '-5'}) == DEFAULT_HEADER_SCAN_ROWS
+
+
+def test_header_below_default_range_is_not_found():
+    result = _process_csv()
+    assert "ヘッダー行の特定に失敗しました" in result["error"]
+
+
+def test_header_below_row_20_is_found_when_range_is_raised():
+    result = _process_csv('30')
+    assert result["data"] == [
+        {"ref": "C1, C2", "part": "GRM155", "mfg": "Murata"},
+        {"ref": "R1", "part": "RC0402", "mfg": "Yageo"},
+    ]
@@ -0,0 +1,30 @@
+# test_revision_reuse.py
+# 改訂版の処理 (revisions.py) で、解析結果キャッシュにある版を前の版にしても行の結果を使い回すことのテスト
+#   python -m pytest bom_tool/tests
+import os
+import sys
+
+BOM_TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOM_TOOL_DIR)
+
+from pipeline import process_file
+from revisions import Revision
+
+HEADER = "Ref,Part Number,Manufacturer\n"
+LINES = [f"R{i},RC0402-{i},Yageo\n" for i in range(1, 21)]
+VERSION_1 = (HEADER + ''.join(LINES)).encode('utf-8')
+# 1行だけ型番を変えた次の版
+VERSION_2 = (HEADER + ''.join(LINES[:-1]) + "R20,RC0603-20,Yageo\n").encode('utf-8')
+
+
+def test_same_file_twice_then_revised_file_reuses_rows():
+    first = Revision()
+    process_file('bom_reuse.csv', VERSION_1, revision=first)
+    # 同じファイルをもう一度送る (フラットリストは解析結果キャッシュにある)
+    second = Revision()
+    process_file('bom_reuse.csv', VERSION_1, revision=second)
+    assert second.row_counts()["expanded"] == len(LINES)
+
+    revised = Revision(second)
+    process_file('bom_reuse.csv', VERSION_2, revision=revised)
+    assert revised.row_counts() == {"reused": len(LINES) - 1, "expanded": 1}
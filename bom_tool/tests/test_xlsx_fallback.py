@@ -0,0 +1,84 @@
+# test_xlsx_fallback.py
+# 高速版 (xlsx_fast.FastXlsxWorkbook) で読めないシートを openpyxl で読み直すことのテスト
+#   python -m pytest bom_tool/tests
+import io
+import os
+import re
+import sys
+import zipfile
+
+import openpyxl
+import pytest
+
+BOM_TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOM_TOOL_DIR)
+
+from pipeline import process_file
+from xlsx_fast import FastXlsxWorkbook, XlsxReader, UnsupportedXlsx
+
+ROWS = [
+    ["Ref", "Part Number", "Manufacturer"],
+    ["C1-C2", "GRM155", "Murata"],
+    ["R1", "RC0402", "Yageo"],
+]
+
+
+def _xlsx_bytes():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in ROWS:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _rewrite_sheet(data, rewrite):
+    # xl/worksheets/sheet1.xml だけを rewrite(XMLのバイト列) で置き換えた .xlsx を返す
+    source = zipfile.ZipFile(io.BytesIO(data))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            content = source.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                content = rewrite(content)
+            target.writestr(item, content)
+    return buffer.getvalue()
+
+
+def _swap_last_rows(xml):
+    # 2行目と3行目の <row> の並びを入れ替える (行番号 r はそのまま)
+    rows = re.findall(rb'<row\b.*?</row>', xml, re.S)
+    return xml.replace(rows[1] + rows[2], rows[2] + rows[1])
+
+
+def _read_rows(data, engine):
+    reader = XlsxReader(io.BytesIO(data), engine)
+    try:
+        rows, cancellation_refs = reader.parse_sheet(reader.sheet_names[0])
+        return [(row.values, row.struck) for row in rows], cancellation_refs
+    finally:
+        reader.close()
+
+
+def test_fast_workbook_rejects_out_of_order_rows():
+    workbook = FastXlsxWorkbook(io.BytesIO(_rewrite_sheet(_xlsx_bytes(), _swap_last_rows)))
+    with pytest.raises(UnsupportedXlsx):
+        workbook.parse_sheet(workbook.sheet_names[0])
+    workbook.close()
+
+
+def test_reader_falls_back_to_openpyxl():
+    data = _rewrite_sheet(_xlsx_bytes(), _swap_last_rows)
+    rows, _ = _read_rows(data, 'fast')
+    assert rows == _read_rows(data, 'openpyxl')[0]
+    # openpyxl は行番号の順に返す
+    assert rows == [(tuple(row), 0) for row in ROWS]
+
+
+def test_process_file_reads_out_of_order_rows():
+    result = process_file('bom.xlsx', _rewrite_sheet(_xlsx_bytes(), _swap_last_rows), selected_sheets=['Sheet'])
+    assert result["combined"]["data"] == [
+        {"ref": "C1, C2", "part": "GRM155", "mfg": "Murata"},
+        {"ref": "R1", "part": "RC0402", "mfg": "Yageo"},
+    ]
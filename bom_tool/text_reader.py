@@ -0,0 +1,109 @@
+# text_reader.py
+import re
+import codecs
+
+# --- CSV / TXT のバイト列を少しずつデコードして1行ずつ返す ---
+# ファイル全体を一度に文字列にせず、CHUNK_BYTES ずつデコードする (全体のデコードのやり直しや、行のリストも作らない)。
+# 文字コードは先頭から判定する:
+#   1. BOM があれば、それに従う (UTF-8 / UTF-16)
+#   2. ASCII だけのチャンクはどの文字コードでも同じなので、判定を後回しにしてそのままデコードする
+#   3. 最初に ASCII 以外を含むチャンク (と、DETECT_BYTES に届くまでの続き) が UTF-8 として正しければ UTF-8、
+#      そうでなければ CP932 (Shift_JIS に NEC/IBM 拡張文字を加えたもの)
+# 判定の範囲より後ろに不正なバイトがあっても最初からやり直さず、その部分だけ置換文字 (U+FFFD) にする。
+CHUNK_BYTES = 1 << 20
+DETECT_BYTES = 1 << 16
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# str.splitlines() と同じ区切り
+_line_break_pattern = re.compile(r'\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def _iter_chunks(file_stream):
+    # バイナリストリームは read() で、bytes / mmap は CHUNK_BYTES ずつ切り出して返す
+    if hasattr(file_stream, 'read'):
+        file_stream.seek(0)
+        while True:
+            chunk = file_stream.read(CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for start in range(0, len(file_stream), CHUNK_BYTES):
+            yield file_stream[start:start + CHUNK_BYTES]
+
+
+def guess_encoding(sample, final):
+    """
+    ASCII 以外を含むバイト列 sample が UTF-8 として正しければ 'utf-8'、そうでなければ 'cp932'。
+    final が False なら、末尾で途切れた UTF-8 の文字は正しいものとみなす。
+    """
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp932'
+
+
+def iter_text_chunks(file_stream):
+    """file_stream (バイナリストリーム / bytes / mmap) をデコードした文字列を、チャンクごとに返す。"""
+    chunks = _iter_chunks(file_stream)
+    decoder = None
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            for bom, encoding in _BOMS:
+                if chunk.startswith(bom):
+                    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                    break
+        if decoder is None:
+            if chunk.isascii():
+                yield chunk.decode('ascii')
+                continue
+            # 判定に足りるまで続きを読み、まとめてデコードする
+            pending = [chunk]
+            size = len(chunk)
+            at_end = False
+            while size < DETECT_BYTES:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    at_end = True
+                    break
+                pending.append(chunk)
+                size += len(chunk)
+            sample = b''.join(pending)
+            decoder = codecs.getincrementaldecoder(guess_encoding(sample, at_end))(errors='replace')
+            yield decoder.decode(sample)
+            continue
+        yield decoder.decode(chunk)
+    if decoder is not None:
+        tail = decoder.decode(b'', True)
+        if tail:
+            yield tail
+
+
+def iter_lines(file_stream):
+    """
+    file_stream をデコードし、str.splitlines() と同じ区切りで1行ずつ (改行を除いて) 返す。
+    """
+    carry = ''
+    for text in iter_text_chunks(file_stream):
+        if carry:
+            text = carry + text
+        pos = 0
+        for m in _line_break_pattern.finditer(text):
+            # 末尾の '\r' は次のチャンクの '\n' と合わせて1つの改行かもしれないので、次に回す
+            if m.end() == len(text) and m.group() == '\r':
+                break
+            yield text[pos:m.start()]
+            pos = m.end()
+        carry = text[pos:]
+    if carry.endswith('\r'):
+        yield carry[:-1] # 最後に次に回した '\r' は、そのまま1つの改行
+    elif carry:
+        yield carry
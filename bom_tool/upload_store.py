@@ -0,0 +1,74 @@
+# upload_store.py
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+
+class StoredUpload:
+    __slots__ = ('filename', 'source', 'size', 'last_used')
+
+    def __init__(self, filename, source):
+        self.filename = filename
+        self.source = source # FileSource (大きなファイルは一時ファイルのまま保持する)
+        self.size = source.size
+        self.last_used = time.monotonic()
+
+
+# --- アップロード済みファイルの一時保管 (トークンで再利用する) ---
+class UploadStore:
+    """
+    /sheets で受け取ったファイルをトークンに結び付けて保持し、続く /process で再送信せずに使えるようにする。
+    最後に使われてから ttl_seconds 秒たったもの、または合計が max_bytes を超えたときの古いものから捨てる。
+    捨てたファイルの一時ファイルは close() で削除する。
+    """
+
+    def __init__(self, ttl_seconds=1800, max_bytes=1024 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._uploads = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, filename, source):
+        """FileSource を預かってトークンを返す。以後、source の後始末はこのストアが行う。"""
+        upload = StoredUpload(filename, source)
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._purge_expired()
+            self._uploads[token] = upload
+            self._total_bytes += upload.size
+            # 容量を超えたら、最後に使われたのが古いものから捨てる (今入れたものは残す)
+            while self._total_bytes > self.max_bytes and len(self._uploads) > 1:
+                self._remove(next(iter(self._uploads)))
+        return token
+
+    def get(self, token):
+        """
+        トークンに対応する StoredUpload を返す。期限切れや不明なトークンなら None。
+        upload.source は参照を1つ増やして返すので、使い終わったら close() すること
+        (使っている間にストアから捨てられても、一時ファイルは消えない)。
+        """
+        with self._lock:
+            self._purge_expired()
+            upload = self._uploads.get(token)
+            if upload is not None:
+                upload.last_used = time.monotonic()
+                self._uploads.move_to_end(token)
+                upload.source.retain()
+            return upload
+
+    def _remove(self, token):
+        upload = self._uploads.pop(token)
+        self._total_bytes -= upload.size
+        # ストアの参照を手放す (処理中のリクエストやジョブが使っていれば、その close() で削除される)
+        upload.source.close()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        # 先頭ほど最後に使われたのが古いので、期限内のものに当たったら止める
+        while self._uploads:
+            token, upload = next(iter(self._uploads.items()))
+            if now - upload.last_used <= self.ttl_seconds:
+                break
+            self._remove(token)
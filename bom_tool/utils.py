@@ -1,5 +1,10 @@
 # utils.py
+import os
 import re
+import logging
+
+from matchers import HeaderMatcher
+from manufacturer_rules import ManufacturerRules, RULES_PATH as MANUFACTURER_RULES_PATH
 
 # --- 正規表現 ---
 ref_pattern = re.compile(r'[A-Z]+[0-9]+')
@@ -12,18 +17,34 @@ HEADER_KEYWORDS = {
     'mfg': ['メーカー', 'mfg', 'maker', 'manufacturer', '製造元','製造者']
 }
 
+logger = logging.getLogger(__name__)
+
+# ヘッダー行を探す範囲 (先頭から何行目までを候補にするか)
+# BOM_HEADER_SCAN_ROWS: 表題や注記が長く、ヘッダー行が既定の20行より下にあるBOM向けに広げられる (1 以上の整数)
+DEFAULT_HEADER_SCAN_ROWS = 20
+
+def read_header_scan_rows(environ=os.environ):
+    """BOM_HEADER_SCAN_ROWS を読む。未指定・整数でない・1 未満なら DEFAULT_HEADER_SCAN_ROWS を返す。"""
+    value = environ.get('BOM_HEADER_SCAN_ROWS')
+    if not value:
+        return DEFAULT_HEADER_SCAN_ROWS
+    try:
+        rows = int(value)
+    except ValueError:
+        rows = 0
+    if rows < 1:
+        logger.warning("BOM_HEADER_SCAN_ROWS の値が不正なため、既定の %d 行を使います (値: %r)", DEFAULT_HEADER_SCAN_ROWS, value)
+        return DEFAULT_HEADER_SCAN_ROWS
+    return rows
+
+HEADER_SCAN_ROWS = read_header_scan_rows()
+
+# HEADER_KEYWORDS は読み込み時に一度だけ1つのオートマトンにまとめておく
+header_matcher = HeaderMatcher(HEADER_KEYWORDS)
+
 # --- 型番からメーカーを推測する関数 ---
+# ルールは data/manufacturer_rules.csv (BOM_MANUFACTURER_RULES で変更可) から読み込み時に一度だけコンパイルする
+manufacturer_rules = ManufacturerRules.from_file(MANUFACTURER_RULES_PATH)
+
 def detect_manufacturer(part_number_string):
-    pn_upper = part_number_string.upper()
-    if pn_upper.startswith(('GRM', 'GCM', 'BLM')): return 'Murata'
-    if pn_upper.startswith('CGA'): return 'TDK'
-    if pn_upper.startswith('MCR'): return 'Rohm'
-    if pn_upper.startswith('CC'): return 'Yageo'
-    pn_lower = part_number_string.lower()
-    if 'murata' in pn_lower: return 'Murata'
-    if 'tdk' in pn_lower: return 'TDK'
-    if 'rohm' in pn_lower: return 'Rohm'
-    if 'yageo' in pn_lower: return 'Yageo'
-    if 'kyocera' in pn_lower: return 'Kyocera'
-
-    return ""
+    return manufacturer_rules.detect(part_number_string)
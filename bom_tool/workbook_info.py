@@ -0,0 +1,121 @@
+# workbook_info.py
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+import openpyxl
+import xlrd
+
+# --- 自作モジュールをインポート ---
+from file_source import as_file_source
+
+# --- ワークブックのメタデータだけを読む (シート一覧の表示用) ---
+# セルは1つも解析しない。.xlsx は zip の中の xl/workbook.xml と各シートの <dimension> だけを読む。
+
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_STRICT_REL_NS = 'http://purl.oclc.org/ooxml/officeDocument/relationships'
+_cell_ref_pattern = re.compile(r'^\$?([A-Z]+)\$?([0-9]+)$')
+
+
+def _local_name(tag):
+    # '{名前空間}sheet' -> 'sheet' (Strict OOXML の名前空間でも同じように扱う)
+    return tag.rsplit('}', 1)[-1]
+
+
+def _rel_id(element):
+    return element.get(f'{{{_REL_NS}}}id') or element.get(f'{{{_STRICT_REL_NS}}}id')
+
+
+def xlsx_sheet_parts(archive):
+    """
+    開いた .xlsx の zip から、ブック内の順序で [(シート名, 表示状態, zip内のパス or None), ...] を返す。
+    表示状態は 'visible' / 'hidden' / 'veryHidden'。
+    """
+    targets = {}
+    if 'xl/_rels/workbook.xml.rels' in archive.namelist():
+        rels_root = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        for rel in rels_root:
+            target = rel.get('Target', '')
+            # 相対パスは xl/ から、'/' で始まるものは zip のルートから
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = path
+
+    sheets = []
+    workbook_root = ET.fromstring(archive.read('xl/workbook.xml'))
+    for element in workbook_root.iter():
+        if _local_name(element.tag) == 'sheet':
+            sheets.append((element.get('name'), element.get('state') or 'visible', targets.get(_rel_id(element))))
+    return sheets
+
+
+def _column_number(letters):
+    number = 0
+    for ch in letters:
+        number = number * 26 + (ord(ch) - 64)
+    return number
+
+
+def _read_dimension(archive, part_path):
+    # シートXMLの先頭から <dimension ref="A1:F120"> を探し、<sheetData> に達したら読むのをやめる
+    if not part_path or part_path not in archive.namelist():
+        return None
+    with archive.open(part_path) as stream:
+        for _, element in ET.iterparse(stream, events=('start',)):
+            name = _local_name(element.tag)
+            if name == 'dimension':
+                return element.get('ref')
+            if name == 'sheetData':
+                return None
+    return None
+
+
+def _dimension_info(dimension):
+    # "A1:F120" -> (120, 6)。読めなければ (None, None)
+    if not dimension:
+        return None, None
+    last_cell = dimension.split(':')[-1].upper()
+    match = _cell_ref_pattern.match(last_cell)
+    if not match:
+        return None, None
+    return int(match.group(2)), _column_number(match.group(1))
+
+
+def _sheet_entry(name, dimension=None, hidden=False):
+    max_row, max_column = _dimension_info(dimension)
+    return {"name": name, "dimension": dimension, "max_row": max_row, "max_column": max_column, "hidden": hidden}
+
+
+def list_xlsx_sheets(source):
+    try:
+        with zipfile.ZipFile(source.file_or_path()) as archive:
+            return [_sheet_entry(name, _read_dimension(archive, part_path), state != 'visible')
+                    for name, state, part_path in xlsx_sheet_parts(archive)]
+    except (KeyError, ET.ParseError):
+        # workbook.xml が見つからない/壊れている変則的なファイルは openpyxl に任せる (シート名のみ)
+        workbook = openpyxl.load_workbook(source.file_or_path(), read_only=True)
+        try:
+            return [_sheet_entry(name) for name in workbook.sheetnames]
+        finally:
+            workbook.close()
+
+
+def list_xls_sheets(source):
+    # on_demand ならシート本体は読み込まない (.xls のシート一覧には寸法の情報が無い)
+    book = xlrd.open_workbook(file_contents=source.buffer(), on_demand=True)
+    try:
+        return [_sheet_entry(name) for name in book.sheet_names()]
+    finally:
+        book.release_resources()
+
+
+def list_sheets(filename, file_data):
+    """
+    file_data: bytes または FileSource
+    Excel ファイルのシート一覧を [{"name", "dimension", "max_row", "max_column", "hidden"}, ...] で返す。
+    .xls では dimension などは None になる。
+    """
+    source = as_file_source(file_data)
+    if filename.lower().endswith('.xlsx'):
+        return list_xlsx_sheets(source)
+    return list_xls_sheets(source)
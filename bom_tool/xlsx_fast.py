@@ -0,0 +1,439 @@
+# xlsx_fast.py
+import os
+import re
+import logging
+import zipfile
+import itertools
+import posixpath
+import xml.etree.ElementTree as ET
+
+import openpyxl
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, CALENDAR_MAC_1904
+
+# --- 自作モジュールをインポート ---
+from utils import ref_pattern
+from sheet_table import make_row
+from file_parsers import parse_single_excel_sheet_rich_text
+from workbook_info import xlsx_sheet_parts
+
+logger = logging.getLogger(__name__)
+
+# --- .xlsx の高速な読み込み (openpyxl.load_workbook(rich_text=True) の代わり) ---
+# openpyxl は選ばれていないシートも含めて全セルのオブジェクトを作るが、ここでは zip の中の XML を直接 iterparse する:
+#   sharedStrings.xml: 最初に1回だけ読み、文字列ごとに全体の文字列と、取り消し線のある部分の部品番号を求めておく
+#   styles.xml: cellXfs の各スタイルについて、取り消し線と日付の書式かどうかを最初に1回だけ求めておく
+#   シートのXML: 選ばれたシートだけを、1行ずつ読んでは捨てる
+# 行 (SheetRow) と cancellation_refs は openpyxl の経路 (parse_single_excel_sheet_rich_text) と同じになる。
+# workbook.xml が見つからない、シートの行の順序が不正など、扱えないファイル/シートは openpyxl で読む。
+# BOM_XLSX_ENGINE: 'fast' (既定) または 'openpyxl' (常に openpyxl で読む)
+XLSX_ENGINE = os.environ.get('BOM_XLSX_ENGINE', 'fast').lower()
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_SHARED_STRINGS_REL = '/sharedStrings'
+_STYLES_PATH = 'xl/styles.xml'
+
+_ROW = f'{{{_MAIN_NS}}}row'
+_CELL = f'{{{_MAIN_NS}}}c'
+_VALUE = f'{{{_MAIN_NS}}}v'
+_FORMULA = f'{{{_MAIN_NS}}}f'
+_INLINE_STRING = f'{{{_MAIN_NS}}}is'
+_STRING_ITEM = f'{{{_MAIN_NS}}}si'
+_TEXT = f'{{{_MAIN_NS}}}t'
+_RUN = f'{{{_MAIN_NS}}}r'
+_RUN_PROPERTIES = f'{{{_MAIN_NS}}}rPr'
+_STRIKE = f'{{{_MAIN_NS}}}strike'
+
+# 結合セルの範囲 (<mergeCell ref="A1:C1"/>) はシートデータの後ろにあるので、先に生のXMLから探しておく。
+# 同じパスで <row> の行番号が増えていくことも確かめる (行は読んだ順に返すので、順序が不正なシートは openpyxl で読む)
+_sheet_tag_pattern = re.compile(rb'<(?:[\w.-]+:)?(row|mergeCell)(\s[^>]*)?>')
+_merge_ref_pattern = re.compile(rb'\bref="([^"]+)"')
+_row_number_pattern = re.compile(rb'(?:^|\s)r="([^"]*)"')
+_READ_BYTES = 1 << 20
+_DIGITS = '0123456789'
+
+
+class UnsupportedXlsx(Exception):
+    """高速版では読めないファイル/シート (openpyxl で読み直す)。"""
+
+
+def _is_true(value):
+    # openpyxl の真偽値の属性と同じ解釈 (<strike/> は True、val が 'false' / 'f' / '0' なら False)
+    if value is None:
+        return True
+    return value not in ('false', 'f', '0') and bool(value)
+
+
+def _strike_of(element):
+    strike = element.find(_STRIKE)
+    return strike is not None and _is_true(strike.get('val'))
+
+
+def _cast_number(value):
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def _column_index(letters, cache={}):
+    # 'A' -> 0, 'AB' -> 27
+    index = cache.get(letters)
+    if index is None:
+        index = 0
+        for ch in letters.upper():
+            index = index * 26 + (ord(ch) - 64)
+        index = cache[letters] = index - 1
+    return index
+
+
+def _parse_string_item(element):
+    """
+    <si> / <is> の (文字列, リッチテキストの情報) を返す。
+    リッチテキストの情報は、openpyxl で CellRichText になる文字列なら (取り消し線の有無, 取り消し線の部分の部品番号)、
+    ただの文字列なら None (このときはセルのフォントの取り消し線を見る)。
+    """
+    text = element.find(_TEXT)
+    if text is not None and text.text:
+        return text.text.replace('x005F_', ''), None
+    runs = element.findall(_RUN)
+    rich = len(runs) > 1
+    parts = []
+    struck_text = ''
+    for run in runs:
+        run_text = run.find(_TEXT)
+        run_text = (run_text.text or '').replace('x005F_', '') if run_text is not None else ''
+        properties = run.find(_RUN_PROPERTIES)
+        if properties is not None:
+            rich = True
+            if run_text and _strike_of(properties):
+                struck_text += " " + run_text
+        parts.append(run_text)
+    if not rich:
+        return ''.join(parts), None
+    return ''.join(parts), (bool(struck_text), tuple(ref_pattern.findall(struck_text)))
+
+
+def _read_shared_strings(archive, path):
+    texts = []
+    rich = []
+    if path is None or path not in archive.namelist():
+        return texts, rich
+    with archive.open(path) as stream:
+        for _, element in ET.iterparse(stream):
+            if element.tag == _STRING_ITEM:
+                text, info = _parse_string_item(element)
+                texts.append(text)
+                rich.append(info)
+                element.clear()
+    return texts, rich
+
+
+def _read_styles(archive):
+    """cellXfs の番号ごとの (取り消し線の有無, 日付の書式か, 経過時間の書式か) のリスト。"""
+    if _STYLES_PATH not in archive.namelist():
+        return []
+    root = ET.fromstring(archive.read(_STYLES_PATH))
+    custom_formats = {}
+    fonts = []
+    xfs = []
+    for element in root:
+        name = element.tag
+        if name == f'{{{_MAIN_NS}}}numFmts':
+            for number_format in element:
+                custom_formats[int(number_format.get('numFmtId'))] = number_format.get('formatCode')
+        elif name == f'{{{_MAIN_NS}}}fonts':
+            fonts = [_strike_of(font) for font in element]
+        elif name == f'{{{_MAIN_NS}}}cellXfs':
+            xfs = list(element)
+
+    styles = []
+    for xf in xfs:
+        font_id = int(xf.get('fontId', 0))
+        number_format_id = int(xf.get('numFmtId', 0))
+        number_format = custom_formats.get(number_format_id) or builtin_format_code(number_format_id)
+        styles.append((font_id < len(fonts) and fonts[font_id],
+                       is_date_format(number_format), is_timedelta_format(number_format)))
+    return styles
+
+
+def _scan_sheet_part(archive, part_path):
+    # 結合セルの範囲 [(最初の行, 最初の列, 最後の行, 最後の列), ...] を返す (行は1始まり、列は0始まり)
+    # 行番号が前の行以下の <row> があれば UnsupportedXlsx (_iter_rows と同じく、r の無い行は前の行の次の行)
+    ranges = []
+    row_number = 0
+    next_row = 1
+    with archive.open(part_path) as stream:
+        carry = b''
+        while True:
+            chunk = stream.read(_READ_BYTES)
+            if not chunk:
+                break
+            data = carry + chunk
+            for match in _sheet_tag_pattern.finditer(data):
+                attributes = match.group(2) or b''
+                if match.group(1) == b'mergeCell':
+                    ref = _merge_ref_pattern.search(attributes)
+                    if ref is not None:
+                        min_col, min_row, max_col, max_row = range_boundaries(ref.group(1).decode('ascii'))
+                        ranges.append((min_row, min_col - 1, max_row, max_col - 1))
+                    continue
+                number = _row_number_pattern.search(attributes)
+                row_number = int(float(number.group(1))) if number is not None and number.group(1) else row_number + 1
+                # 空の行 (<row r="5"/>) は _iter_rows でも行の順序を確かめない
+                if attributes.endswith(b'/'):
+                    continue
+                if row_number < next_row:
+                    raise UnsupportedXlsx(f"シート '{part_path}' の行の順序が不正です (行 {row_number})")
+                next_row = row_number + 1
+            # 閉じていないタグはチャンクの境目で切れているかもしれないので、次のチャンクとつないで探し直す
+            start = data.rfind(b'<')
+            carry = data[start:] if start >= 0 and data.find(b'>', start) < 0 else b''
+    return ranges
+
+
+class FastXlsxWorkbook:
+    """
+    .xlsx を zip の中の XML から直接読む。シート名はブック内の順序 (openpyxl の sheetnames と同じ)。
+    共有文字列とスタイルは、最初にシートを読むときに1回だけ読み込む。
+    """
+
+    def __init__(self, file_or_path):
+        try:
+            self._archive = zipfile.ZipFile(file_or_path)
+            names = set(self._archive.namelist())
+            workbook_root = ET.fromstring(self._archive.read('xl/workbook.xml'))
+            if not workbook_root.tag.startswith(f'{{{_MAIN_NS}}}'):
+                raise UnsupportedXlsx("workbook.xml の名前空間に対応していません")
+            self._parts = {name: part_path for name, _, part_path in xlsx_sheet_parts(self._archive)
+                           if part_path in names}
+        except (KeyError, ET.ParseError, zipfile.BadZipFile) as e:
+            raise UnsupportedXlsx(str(e)) from e
+        self.sheet_names = list(self._parts)
+        properties = workbook_root.find(f'{{{_MAIN_NS}}}workbookPr')
+        date1904 = properties is not None and properties.get('date1904') is not None and _is_true(properties.get('date1904'))
+        self._epoch = CALENDAR_MAC_1904 if date1904 else WINDOWS_EPOCH
+        self._shared_strings = None
+        self._styles = None
+
+    def _shared_strings_path(self):
+        if 'xl/_rels/workbook.xml.rels' not in self._archive.namelist():
+            return None
+        for rel in ET.fromstring(self._archive.read('xl/_rels/workbook.xml.rels')):
+            if rel.get('Type', '').endswith(_SHARED_STRINGS_REL):
+                target = rel.get('Target', '')
+                return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+        return None
+
+    def _load_shared(self):
+        if self._shared_strings is None:
+            # 途中で失敗したときに半分だけ読み込んだ状態を残さない
+            shared_strings = _read_shared_strings(self._archive, self._shared_strings_path())
+            self._styles = _read_styles(self._archive)
+            self._shared_strings = shared_strings
+
+    def parse_sheet(self, sheet_name, projection=None):
+        """parse_single_excel_sheet_rich_text と同じ (行ジェネレータ, cancellation_refs) を返す。"""
+        part_path = self._parts.get(sheet_name)
+        if part_path is None:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+        # 高速版で読めないシート (XMLの誤り、行の順序が不正など) は、行を返し始める前に UnsupportedXlsx にする
+        try:
+            self._load_shared()
+            merged_ranges = _scan_sheet_part(self._archive, part_path)
+            cancellation_refs = set()
+            rows = self._iter_rows(part_path, merged_ranges, cancellation_refs, projection)
+            first_row = next(rows, None)
+        except (KeyError, IndexError, ValueError, ET.ParseError, zipfile.BadZipFile) as e:
+            raise UnsupportedXlsx(str(e)) from e
+        if first_row is None:
+            return rows, cancellation_refs
+        return itertools.chain((first_row,), rows), cancellation_refs
+
+    def _cell_value(self, cell, style, coordinate, shared_formulas):
+        # openpyxl の WorkSheetParser.parse_cell と同じ解釈で (値, リッチテキストの情報) を返す。値が無ければ (None, None)
+        # style は _read_styles() の要素 (スタイルが無ければ None)
+        data_type = cell.get('t', 'n')
+        value = formula = inline = None
+        for child in cell:
+            tag = child.tag
+            if tag == _VALUE:
+                value = child.text
+            elif tag == _FORMULA:
+                formula = child
+            elif tag == _INLINE_STRING:
+                inline = child
+        if data_type == 'inlineStr':
+            value = None
+
+        if formula is not None:
+            text = "=" + (formula.text or "")
+            if formula.get('t') == 'shared':
+                index = formula.get('si')
+                if index in shared_formulas:
+                    return shared_formulas[index].translate_formula(coordinate), None
+                if text != "=":
+                    shared_formulas[index] = Translator(text, coordinate)
+            # 配列数式/データテーブルも数式の文字列にする (openpyxl では数式オブジェクトになる)
+            return text, None
+        if value:
+            if data_type == 'n':
+                number = _cast_number(value)
+                if style and style[1]:
+                    try:
+                        return str(from_excel(number, self._epoch, timedelta=style[2])), None
+                    except (OverflowError, ValueError):
+                        return "#VALUE!", None
+                return str(number), None
+            if data_type == 's':
+                index = int(value)
+                return self._shared_strings[0][index], self._shared_strings[1][index]
+            if data_type == 'b':
+                return str(bool(int(value))), None
+            if data_type == 'd':
+                return str(from_ISO8601(value)), None
+            return value, None
+        if data_type == 'inlineStr' and inline is not None:
+            return _parse_string_item(inline)
+        return None, None
+
+    def _iter_rows(self, part_path, merged_ranges, cancellation_refs, projection):
+        merged_ranges = sorted(merged_ranges)
+        # openpyxl の iter_rows() と同じく、1行目からセル (結合セルを含む) のある最後の行までを返す
+        last_row = max((last_row for _, _, last_row, _ in merged_ranges), default=0)
+        next_row = 1
+        active_ranges = []
+        pending_ranges = 0
+        shared_formulas = {}
+        row_number = 0
+        styles = self._styles
+        default_style = styles[0] if styles else None
+
+        with self._archive.open(part_path) as stream:
+            for _, element in ET.iterparse(stream):
+                if element.tag != _ROW:
+                    continue
+                row_attr = element.get('r')
+                row_number = int(float(row_attr)) if row_attr else row_number + 1
+                if len(element) == 0:
+                    element.clear()
+                    continue
+
+                values = []
+                struck = 0
+                struck_refs = None # 列 -> 取り消し線のセルの部品番号 (同じセルが2回出てきたら後の方だけを使う)
+                column = -1
+                for cell in element:
+                    if cell.tag != _CELL:
+                        continue
+                    coordinate = cell.get('r')
+                    if coordinate:
+                        column = _column_index(coordinate.rstrip(_DIGITS))
+                    else:
+                        column += 1
+                    style_id = cell.get('s')
+                    if style_id:
+                        style_id = int(style_id)
+                        style = styles[style_id] if style_id < len(styles) else None
+                    else:
+                        style = default_style
+                    value, rich = self._cell_value(cell, style, coordinate, shared_formulas)
+                    if column >= len(values):
+                        values.extend([""] * (column + 1 - len(values)))
+                    bit = 1 << column
+                    if value is None:
+                        values[column] = ""
+                        refs = None
+                    elif rich is not None:
+                        values[column] = value
+                        refs = rich[1] if rich[0] else None
+                    else:
+                        values[column] = value
+                        refs = ref_pattern.findall(value) if style and style[0] else None
+                    if refs is not None:
+                        struck |= bit
+                        if struck_refs is None:
+                            struck_refs = {}
+                        struck_refs[column] = refs
+                    elif struck & bit:
+                        struck &= ~bit
+                        struck_refs.pop(column, None)
+                element.clear()
+
+                # 結合セルの左上以外は、openpyxl では値も書式も無いセルになる
+                while pending_ranges < len(merged_ranges) and merged_ranges[pending_ranges][0] <= row_number:
+                    active_ranges.append(merged_ranges[pending_ranges])
+                    pending_ranges += 1
+                if active_ranges:
+                    active_ranges = [merged for merged in active_ranges if merged[2] >= row_number]
+                    for first_row, first_col, _, last_col in active_ranges:
+                        for col in range(first_col, min(last_col + 1, len(values))):
+                            if row_number == first_row and col == first_col:
+                                continue
+                            values[col] = ""
+                            if struck >> col & 1:
+                                struck &= ~(1 << col)
+                                struck_refs.pop(col, None)
+
+                if row_number < next_row:
+                    raise ValueError(f"シート '{part_path}' の行の順序が不正です (行 {row_number})")
+                while next_row < row_number:
+                    yield make_row([])
+                    next_row += 1
+                if struck_refs:
+                    for refs in struck_refs.values():
+                        cancellation_refs.update(refs)
+                if projection is not None and projection.columns is not None:
+                    yield projection.project(len(values), values.__getitem__, struck)
+                else:
+                    yield make_row(values, struck)
+                next_row = row_number + 1
+
+        while next_row <= last_row:
+            yield make_row([])
+            next_row += 1
+
+    def close(self):
+        self._archive.close()
+
+
+class XlsxReader:
+    """
+    .xlsx のシート名の一覧と、シートごとの (行ジェネレータ, cancellation_refs) を返す。
+    XLSX_ENGINE が 'fast' なら FastXlsxWorkbook で、読めないファイル/シートや 'openpyxl' のときは openpyxl で読む。
+    """
+
+    def __init__(self, file_or_path, engine=None):
+        self._file_or_path = file_or_path
+        self._fast = None
+        self._workbook = None
+        if (engine or XLSX_ENGINE) == 'fast':
+            try:
+                self._fast = FastXlsxWorkbook(file_or_path)
+            except UnsupportedXlsx:
+                self._fast = None
+        if self._fast is not None:
+            self.sheet_names = self._fast.sheet_names
+        else:
+            # シート名だけなら read_only で読めば全シートを解析せずに済む
+            names_workbook = openpyxl.load_workbook(file_or_path, read_only=True)
+            self.sheet_names = list(names_workbook.sheetnames)
+            names_workbook.close()
+
+    def _openpyxl_workbook(self):
+        if self._workbook is None:
+            self._workbook = openpyxl.load_workbook(self._file_or_path, rich_text=True)
+        return self._workbook
+
+    def parse_sheet(self, sheet_name, projection=None):
+        if self._fast is not None:
+            try:
+                return self._fast.parse_sheet(sheet_name, projection)
+            except UnsupportedXlsx as e:
+                logger.info("シート '%s' を openpyxl で読み直します: %s", sheet_name, e)
+        return parse_single_excel_sheet_rich_text(self._openpyxl_workbook()[sheet_name], projection)
+
+    def close(self):
+        if self._fast is not None:
+            self._fast.close()